@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,6 +33,7 @@ ALLOWED_HOSTS = ['127.0.0.1', 'localhost', '192.168.1.181']
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver: WebSocket races and streamed live updates
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -47,6 +49,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.profiling.ProfilingMiddleware',
+    'app.traffic.TrafficCaptureMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,6 +73,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'PBMate.wsgi.application'
+ASGI_APPLICATION = 'PBMate.asgi.application'
+
+# Channels (Speed Run races). Race rooms live in the memory of the process
+# that serves them (app/races.py), so the in-process layer is all they need.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -82,6 +95,91 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Each alias is sized explicitly: past MAX_ENTRIES a LocMemCache culls a third
+# of its keys at random, and Django's default is only 300. Rendered pages and
+# fragments are numerous and cheap to rebuild, so they get caches of their own
+# and can't push sessions or rate-limit buckets out of 'default'.
+
+CACHES = {
+    # Sessions, user snapshots, rate-limit buckets, counter totals, cache version reads
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pbmate',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Page data keyed by a cache_versions counter (views.PAGE_DATA_CACHE_TIMEOUT)
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pbmate-pages',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    # {% cache %} fragments (problem cards, the filter bar)
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pbmate-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+
+# Sessions & authentication
+# cached_db is write-through: reads come from the cache, writes also go to
+# django_session. Set PBMATE_SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies
+# to keep sessions entirely client-side instead.
+
+SESSION_ENGINE = os.environ.get('PBMATE_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
+AUTHENTICATION_BACKENDS = ['app.auth_cache.CachedModelBackend']
+
+# Seconds a cached user snapshot stays valid. The cache is per process and a
+# change only clears the snapshot in the process that made it, so this is how
+# long another worker may still see a deactivated user or a demoted admin.
+USER_CACHE_TIMEOUT = 5
+
+
+# Rate limits for the answer-checking endpoints (app/ratelimit.py).
+# (bucket size, tokens refilled per second) per user, per IP and per process.
+
+RATE_LIMITS = {
+    'check_answer': {'user': (20, 1.0), 'ip': (300, 15.0), 'global': (1000, 200.0)},
+    'solve_map_problem': {'user': (20, 1.0), 'ip': (300, 15.0), 'global': (1000, 200.0)},
+    'check_daily_challenge': {'user': (5, 0.1), 'ip': (100, 5.0), 'global': (500, 100.0)},
+}
+
+
+# Recurring background jobs, queued by `manage.py run_workers` (app/jobs.py).
+# 'at': 'HH:MM' once a day in TIME_ZONE, or 'every': N seconds.
+
+PERIODIC_JOBS = {
+    'daily-challenge': {'command': 'create_daily_challenge', 'at': '00:00'},
+    'streaks': {'command': 'update_streaks', 'at': '00:05'},
+    'calibration': {'command': 'calibrate_problems', 'at': '03:00', 'kwargs': {'incremental': True}},
+    'deletions': {'command': 'process_deletions', 'every': 300, 'kwargs': {'max_seconds': 240}},
+    'rollups': {'command': 'update_rollups', 'every': 300},
+    'problem-counters': {'command': 'reconcile_problem_counters', 'at': '03:30'},
+}
+
+
+# Opt-in request profiling (app/profiling.py). Staff can profile a single request
+# by sending "X-Profile: 1"; a sample rate above 0 profiles that share of all requests.
+
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_SAMPLE_RATE = float(os.environ.get('PBMATE_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_KEEP = 1000  # Older profiles are deleted
+
+
+# Opt-in traffic capture (app/traffic.py) for `manage.py replay_traffic`.
+# Anonymised request traces go to hourly gzip files in TRAFFIC_DIR.
+
+TRAFFIC_CAPTURE = os.environ.get('PBMATE_TRAFFIC_CAPTURE', '') == '1'
+TRAFFIC_DIR = BASE_DIR / 'traffic'
+TRAFFIC_KEEP_HOURS = 48  # Older files are deleted
+TRAFFIC_USER_BUCKETS = 200  # Users are recorded as one of this many anonymous buckets per role
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,226 @@
+"""
+Adaptive difficulty: Elo-style ratings for users (per category) and problems.
+
+Every Submission is a "match" between the user and the problem. A correct
+answer moves the user's rating up and the problem's down, by how surprising
+the result was. Both updates touch a single row, so grading stays O(1).
+
+Problems are indexed by (category, rating_bucket, id), which lets
+pick_problems() read a few rows from a random point in each bucket around
+the user's rating, instead of sorting the table.
+"""
+import random
+
+from django.db import connection
+from django.db.models import Avg, Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast, Coalesce, Floor
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Problem, SkillRating, Submission
+
+DEFAULT_RATING = 1000.0
+
+# How far ratings move per submission. New users settle faster.
+USER_K_NEW = 40.0
+USER_K = 20.0
+USER_K_NEW_ATTEMPTS = 20
+PROBLEM_K = 8.0  # Problems see many more attempts, so they move slowly
+
+# How many buckets either side of the user's own to look at before giving up
+MAX_BUCKET_SPREAD = 8
+
+
+def expected_score(user_rating, problem_rating):
+    """Probability that a user at user_rating solves a problem at problem_rating."""
+    return 1.0 / (1.0 + 10 ** ((problem_rating - user_rating) / 400.0))
+
+
+def problem_rating(problem):
+    if problem.rating is not None:
+        return problem.rating
+    return Problem.DIFFICULTY_RATINGS.get(str(problem.difficulty).lower(), DEFAULT_RATING)
+
+
+def user_rating(user, category=None):
+    """The user's rating in one category, or their average across categories."""
+    ratings = SkillRating.objects.filter(user=user)
+    if category:
+        rating = ratings.filter(category=category).values_list('rating', flat=True).first()
+    else:
+        rating = ratings.aggregate(avg=Avg('rating'))['avg']
+    return rating if rating is not None else DEFAULT_RATING
+
+
+def difficulty_for(user, category='arithmetic'):
+    """Map the user's rating onto the generator's easy/medium/hard levels."""
+    rating = user_rating(user, category)
+    easy, medium, hard = (Problem.DIFFICULTY_RATINGS[d] for d in ('easy', 'medium', 'hard'))
+    if rating < (easy + medium) / 2:
+        return 'easy'
+    if rating < (medium + hard) / 2:
+        return 'medium'
+    return 'hard'
+
+
+def record_submission(submission):
+    """Update the user's and the problem's rating for one graded answer."""
+    problem = submission.problem
+    skill, _ = SkillRating.objects.get_or_create(
+        user_id=submission.user_id,
+        category=problem.category,
+        defaults={'rating': DEFAULT_RATING},
+    )
+    current_problem_rating = problem_rating(problem)
+    surprise = (1.0 if submission.was_correct else 0.0) - expected_score(skill.rating, current_problem_rating)
+
+    k = USER_K_NEW if skill.attempts < USER_K_NEW_ATTEMPTS else USER_K
+    skill.rating += k * surprise
+    skill.attempts += 1
+    skill.save(update_fields=['rating', 'attempts', 'updated_at'])
+
+    # update() rather than save(): the rating isn't shown anywhere, so this
+    # must not count as a catalog change (see cache_versions.py). The change
+    # is applied in SQL (rating = rating - delta) so two answers graded at
+    # once both count; the bucket is computed from the same expression.
+    delta = PROBLEM_K * surprise
+    Problem.objects.filter(pk=problem.pk).update(**_rating_changes(Value(current_problem_rating), Value(delta)))
+    # Keep the instance roughly current for anything else grading it in this request
+    problem.rating = current_problem_rating - delta
+    problem.rating_bucket = Problem.bucket_for(problem.rating)
+
+
+def record_submissions(submissions):
+    """
+    record_submission() for several answers by one user, in order (the batch
+    check-answer API): one SkillRating read and one write for all of them,
+    and one UPDATE for all the problems.
+    """
+    if not submissions:
+        return
+    user_id = submissions[0].user_id
+    categories = {submission.problem.category for submission in submissions}
+    skills = SkillRating.objects.filter(user_id=user_id, category__in=categories)
+    by_category = {skill.category: skill for skill in skills}
+    if len(by_category) < len(categories):
+        # First answers in a category; another request may be creating the same rows
+        SkillRating.objects.bulk_create(
+            [SkillRating(user_id=user_id, category=c, rating=DEFAULT_RATING) for c in categories - set(by_category)],
+            ignore_conflicts=True,
+        )
+        by_category = {skill.category: skill for skill in skills.all()}
+
+    starts, deltas = {}, {}
+    for submission in submissions:
+        problem, skill = submission.problem, by_category[submission.problem.category]
+        current_problem_rating = problem_rating(problem)
+        starts.setdefault(problem.pk, current_problem_rating)
+        surprise = (1.0 if submission.was_correct else 0.0) - expected_score(skill.rating, current_problem_rating)
+
+        k = USER_K_NEW if skill.attempts < USER_K_NEW_ATTEMPTS else USER_K
+        skill.rating += k * surprise
+        skill.attempts += 1
+
+        delta = PROBLEM_K * surprise
+        deltas[problem.pk] = deltas.get(problem.pk, 0.0) + delta
+        problem.rating = current_problem_rating - delta
+        problem.rating_bucket = Problem.bucket_for(problem.rating)
+
+    now = timezone.now()
+    for skill in by_category.values():
+        skill.updated_at = now  # bulk_update() skips auto_now
+    SkillRating.objects.bulk_update(by_category.values(), ['rating', 'attempts', 'updated_at'])
+
+    def per_problem(values):
+        return Case(*[When(pk=pk, then=Value(value)) for pk, value in values.items()], output_field=FloatField())
+
+    Problem.objects.filter(pk__in=deltas).update(**_rating_changes(per_problem(starts), per_problem(deltas)))
+
+
+def _rating_changes(default, delta):
+    """update() arguments taking `delta` off a problem's rating (`default` if it has none yet), and its bucket."""
+    new_rating = Coalesce(F('rating'), default) - delta
+    return {
+        'rating': new_rating,
+        'rating_bucket': Cast(Floor(new_rating / Value(float(Problem.RATING_BUCKET_WIDTH))), IntegerField()),
+    }
+
+
+@receiver(post_save, sender=Submission)
+def update_ratings(sender, instance, created, **kwargs):
+    if created:
+        record_submission(instance)
+
+
+def pick_problems(user, count=10, category=None):
+    """
+    Problems rated close to the user's level, nearest buckets first.
+    Unsolved problems are preferred; solved ones fill in if there aren't enough.
+
+    Always four queries, however many buckets are empty or solved. The window
+    is read with one UNION ALL of small index range reads (see _candidates),
+    at most a few hundred rows, which are ranked here: nothing sorts the
+    window itself.
+    """
+    target = Problem.bucket_for(user_rating(user, category))
+
+    # A random point in the id range, from two primary key seeks. Separate
+    # queries, because MIN and MAX together defeat SQLite's min/max shortcut.
+    ids = Problem.objects.values_list('id', flat=True)
+    low = ids.order_by('id').first()
+    if low is None:
+        return []
+    start = random.randint(low, ids.order_by('-id').first())
+
+    # Unsolved first, then bucket distance, then ids from the random start, wrapping around
+    def rank(problem):
+        return problem.pick_rank == 2, abs(problem.rating_bucket - target), problem.pick_rank, problem.id
+
+    return sorted(_candidates(user.pk, target, start, count, category), key=rank)[:count]
+
+
+def _candidates(user_id, target, start, count, category=None):
+    """
+    Everything pick_problems() chooses from, in one statement: for every
+    bucket around `target`, the first `count` unsolved problems from `start`
+    on (pick_rank 0) and the first `count` before it (1), each one seek into
+    (category, rating_bucket, id) / (rating_bucket, id); plus the `count`
+    nearest problems the user has solved (2), found from the user's side.
+
+    Raw SQL because the ORM can't put a LIMIT on the parts of a UNION on SQLite.
+    """
+    quote = connection.ops.quote_name
+    through = Problem.solved_by.through._meta
+    table, pk, bucket = quote(Problem._meta.db_table), quote(Problem._meta.pk.column), quote('rating_bucket')
+    solved_table = quote(through.db_table)
+    solved_problem, solved_user = quote(through.get_field('problem').column), quote(through.get_field('user').column)
+
+    visible = f'{table}.{quote("is_quarantined")} = %s AND {table}.{quote("deleted_at")} IS NULL'
+    visible_params = [False]
+    if category:
+        visible += f' AND {table}.{quote("category")} = %s'
+        visible_params.append(category)
+    columns = f'{table}.{pk} AS id, {table}.{bucket} AS bucket'
+
+    parts, params = [], []
+    for bucket_number in range(target - MAX_BUCKET_SPREAD, target + MAX_BUCKET_SPREAD + 1):
+        for pick_rank, op in ((0, '>='), (1, '<')):
+            parts.append(
+                f'SELECT * FROM (SELECT {columns}, {pick_rank} AS pick_rank FROM {table} '
+                f'WHERE {table}.{bucket} = %s AND {table}.{pk} {op} %s AND {visible} AND NOT EXISTS '
+                f'(SELECT 1 FROM {solved_table} WHERE {solved_problem} = {table}.{pk} AND {solved_user} = %s) '
+                f'ORDER BY {table}.{pk} LIMIT %s) AS part{len(parts)}'
+            )
+            params += [bucket_number, start, *visible_params, user_id, count]
+    parts.append(
+        # CROSS JOIN makes SQLite start from the user's solves rather than the whole window
+        f'SELECT * FROM (SELECT {columns}, 2 AS pick_rank FROM {solved_table} CROSS JOIN {table} '
+        f'WHERE {solved_user} = %s AND {table}.{pk} = {solved_problem} '
+        f'AND {table}.{bucket} BETWEEN %s AND %s AND {visible} '
+        f'ORDER BY ABS({table}.{bucket} - %s), {table}.{pk} LIMIT %s) AS solved'
+    )
+    params += [user_id, target - MAX_BUCKET_SPREAD, target + MAX_BUCKET_SPREAD, *visible_params, target, count]
+
+    sql = f'SELECT {table}.*, picks.pick_rank FROM {table} JOIN ({" UNION ALL ".join(parts)}) AS picks ON picks.id = {table}.{pk}'
+    return Problem.objects.raw(sql, params)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Problem, Submission, DailyChallenge, UserProfile, SpeedRunAttempt # Import UserProfile
+from .models import (
+    Problem, Submission, DailyChallenge, UserProfile, SpeedRunAttempt, StudyGroup, GroupMembership, Job, PendingDeletion,
+)
 from django.contrib.auth.models import User
 
 # Register your models here.
@@ -7,11 +9,17 @@ from django.contrib.auth.models import User
 def register(model_class):
     admin.site.register(model_class)
 
-register(Problem)
 register(Submission)
 register(UserProfile) # <-- ADD THIS LINE
 register(SpeedRunAttempt)
 
+@admin.register(Problem)
+class ProblemAdmin(admin.ModelAdmin):
+    list_display = ('question', 'answer', 'category', 'difficulty', 'attempt_count', 'unique_solvers', 'is_quarantined', 'deleted_at')
+    list_filter = ('is_quarantined', 'category', 'difficulty')  # Quarantined = flagged by verify_problems
+    search_fields = ('question',)
+
+
 # Register DailyChallenge with custom admin
 @admin.register(DailyChallenge)
 class DailyChallengeAdmin(admin.ModelAdmin):
@@ -24,5 +32,41 @@ class DailyChallengeAdmin(admin.ModelAdmin):
         return obj.completed_by.count()
     get_completions_count.short_description = 'Completions'
 
+
+class GroupMembershipInline(admin.TabularInline):
+    model = GroupMembership
+    extra = 0
+    raw_id_fields = ('user',)
+
+
+@admin.register(StudyGroup)
+class StudyGroupAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'owner', 'join_code', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('name', 'join_code', 'owner__username')
+    raw_id_fields = ('owner',)
+    inlines = [GroupMembershipInline]
+
+
 # User is already registered by Django's auth system
-# If you want to customize it, use: admin.site.unregister(User) then re-register
\ No newline at end of file
+# If you want to customize it, use: admin.site.unregister(User) then re-register
+
+
+@admin.register(PendingDeletion)
+class PendingDeletionAdmin(admin.ModelAdmin):
+    """Progress of deletions queued from the dashboard (worked off by process_deletions)."""
+    list_display = ('kind', 'label', 'status', 'current_step', 'rows_deleted', 'requested_by', 'requested_at', 'finished_at')
+    list_filter = ('kind', ('finished_at', admin.EmptyFieldListFilter))
+    search_fields = ('label',)
+    readonly_fields = [f.name for f in PendingDeletion._meta.fields]
+
+    def has_add_permission(self, request):
+        return False  # Queued by the dashboard delete buttons only
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Background jobs (see jobs.py); the dashboard's Background Jobs page has the same list."""
+    list_display = ('command', 'status', 'periodic', 'attempts', 'run_at', 'started_at', 'finished_at', 'worker')
+    list_filter = ('status', 'command', 'periodic')
+    readonly_fields = ('worker', 'created_at', 'started_at', 'finished_at', 'output', 'error')
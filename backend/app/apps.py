@@ -10,20 +10,23 @@ class AppConfig(AppConfig):
         """
         Run code once when the server starts.
         """
+        from . import adaptive, auth_cache, cache_versions, counters, groups, live, reviews  # noqa: F401  (register signal receivers)
+
         # We check for 'RUN_MAIN' to avoid this running twice (once for main,
         # once for the reloader process).
         if os.environ.get('RUN_MAIN'):
             print("--- PBMate App Ready ---")
             
             from django.core.management import call_command
+            from . import jobs
             from .models import Problem
 
-            # 1. Ensure today's daily challenge exists
+            # 1. Ensure today's daily challenge exists (run_workers does it, then every midnight)
             try:
-                print("Checking for today's daily challenge...")
-                call_command('create_daily_challenge')
+                print("Queueing today's daily challenge...")
+                jobs.enqueue('create_daily_challenge', unique=True)
             except Exception as e:
-                print(f"Error creating daily challenge: {e}")
+                print(f"Error queueing daily challenge: {e}")
 
             # 2. Check if the problem database is empty
             if not Problem.objects.exists():
@@ -37,12 +40,12 @@ class AppConfig(AppConfig):
                     print(f"Error running populate_problems: {e}")
 
                 try:
-                    # Second, run the AI generator for 10 problems
-                    print("Running generate_ai_problems...")
-                    call_command('generate_ai_problems', count=10, difficulty='easy')
-                    call_command('generate_ai_problems', count=10, difficulty='medium')
+                    # Second, queue the (slow) AI generator for 10 problems; run_workers picks it up
+                    print("Queueing generate_ai_problems...")
+                    jobs.enqueue('generate_ai_problems', unique=True, count=10, difficulty='easy')
+                    jobs.enqueue('generate_ai_problems', unique=True, count=10, difficulty='medium')
                 except Exception as e:
-                    print(f"Error running generate_ai_problems: {e}")
+                    print(f"Error queueing generate_ai_problems: {e}")
                 
                 print("Database population complete.")
             else:
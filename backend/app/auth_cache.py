@@ -0,0 +1,65 @@
+"""
+Cache-backed user lookup for authenticated requests.
+
+AuthenticationMiddleware loads ``request.user`` through the backend stored in
+the session. CachedModelBackend keeps a snapshot of the ``auth_user`` row in
+the local cache so AJAX endpoints don't hit the database just to find out who
+is asking. The snapshot is dropped whenever the user row changes (promote,
+demote, password change, edit), is deleted, or the user logs out.
+
+Those invalidations only reach the local cache of the process that made the
+change, so snapshots also expire after settings.USER_CACHE_TIMEOUT (a few
+seconds): long enough to cover a burst of AJAX calls from one page, short
+enough that a deactivated user or a demoted admin doesn't keep their access
+in the other workers.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# Columns kept in the snapshot, in model order so User.from_db() can rebuild it.
+# The password hash is needed because Django verifies the session auth hash.
+SNAPSHOT_FIELDS = [f.attname for f in User._meta.concrete_fields]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    """Forget the cached snapshot so the next request reloads the user row."""
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() is served from the cache when possible."""
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, [getattr(user, name) for name in SNAPSHOT_FIELDS],
+                          settings.USER_CACHE_TIMEOUT)
+            return user
+
+        user = User.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, values)
+        return user if self.user_can_authenticate(user) else None
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_on_change(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
@@ -0,0 +1,142 @@
+"""
+Cheap version counters for cached pages.
+
+Each counter is the time it was last bumped, kept in the CacheVersion table
+so a change made by a worker or a management command reaches every web
+process. Reads go through the local cache for VERSION_CACHE_SECONDS, so a
+page asks the database at most once a second per counter; a bump is one
+upsert, however many counters it moves, and is seen straight away by the
+process that made it and within a second by the others. Views use it
+for ETag/Last-Modified (see conditional GET in views.py) and as part of
+template fragment cache keys, so nothing has to be invalidated explicitly:
+bumping the counter makes every old key unreachable.
+
+    catalog      -> the Problem table (problems page cards and filter bar)
+    catalog_stats -> the attempt/solve counters on the cards (counters.py, at most once a minute)
+    leaderboard  -> points, usernames and correct-submission totals
+    history      -> correct submissions (global solved history)
+    user:<id>    -> one user's own row/profile (username, avatar in the navbar)
+    solved:<id>  -> the set of problems one user has solved
+"""
+import time
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.views.decorators.http import condition
+
+from .models import CacheVersion, Problem, Submission, UserProfile
+
+VERSION_CACHE_SECONDS = 1  # How stale another process's bump may look
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def get_versions(*names):
+    """{name: counter} for `names`, starting any that don't exist yet now. At most two queries."""
+    found = {name[len('version:'):]: value for name, value in cache.get_many([_key(n) for n in names]).items()}
+    missing = [name for name in dict.fromkeys(names) if name not in found]
+    if missing:
+        stored = dict(CacheVersion.objects.filter(name__in=missing).values_list('name', 'version'))
+        new = [CacheVersion(name=name, version=time.time()) for name in missing if name not in stored]
+        if new:
+            CacheVersion.objects.bulk_create(new, ignore_conflicts=True)  # Another process may start it first
+            stored.update((row.name, row.version) for row in new)
+        cache.set_many({_key(name): value for name, value in stored.items()}, VERSION_CACHE_SECONDS)
+        found.update(stored)
+    return found
+
+
+def get_version(name):
+    """Return the counter for `name`, starting it now if it doesn't exist yet."""
+    return get_versions(name)[name]
+
+
+def bump_version(*names):
+    """Move the given counters to now, in one upsert."""
+    now = time.time()
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(name=name, version=now) for name in dict.fromkeys(names)],
+        update_conflicts=True, unique_fields=['name'], update_fields=['version'],
+    )
+    cache.set_many({_key(name): now for name in names}, VERSION_CACHE_SECONDS)
+
+
+def last_modified(*names):
+    """The newest of the given counters as a datetime (for Last-Modified)."""
+    newest = max(get_versions(*names).values())
+    return datetime.fromtimestamp(newest, tz=timezone.utc)
+
+
+def etag(*names):
+    versions = get_versions(*names)
+    return '-'.join(f'{versions[name]:.6f}' for name in names)
+
+
+def page_versions(request, *names):
+    """Counters a page depends on, plus the viewer's own ones (navbar, solved marks)."""
+    if request.user.is_authenticated:
+        return (*names, f'user:{request.user.pk}', f'solved:{request.user.pk}')
+    return names
+
+
+def conditional_page(*names):
+    """
+    View decorator adding ETag/Last-Modified from the given counters, so the
+    view answers 304 Not Modified without rendering when nothing changed.
+    """
+    def etag_func(request, *args, **kwargs):
+        return f'{request.user.pk}:{etag(*page_versions(request, *names))}'
+
+    def last_modified_func(request, *args, **kwargs):
+        return last_modified(*page_versions(request, *names))
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def bump_catalog(sender, **kwargs):
+    # The leaderboard shows the total problem count, the history problem questions
+    bump_version('catalog', 'leaderboard', 'history')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user(sender, instance, **kwargs):
+    bump_version(f'user:{instance.pk}', 'leaderboard', 'history')  # The history shows usernames
+
+
+@receiver(post_save, sender=UserProfile)
+def bump_profile(sender, instance, **kwargs):
+    bump_version(f'user:{instance.user_id}', 'leaderboard')
+
+
+@receiver(post_save, sender=Submission)
+def bump_on_submission(sender, instance, created, **kwargs):
+    if created:
+        bump_for_submissions([instance])
+
+
+def bump_for_submissions(submissions):
+    """bump_on_submission() for several new Submissions (the batch check-answer API)."""
+    if any(submission.was_correct for submission in submissions):
+        bump_version('history', 'leaderboard')  # The leaderboard shows the correct-submission total
+
+
+@receiver(m2m_changed, sender=Problem.solved_by.through)
+def bump_solved(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # user.solved_problems.add(...): instance is the user
+        bump_version(f'solved:{instance.pk}')
+    elif pk_set:
+        bump_version(*(f'solved:{user_id}' for user_id in pk_set))
+    else:
+        # problem.solved_by.clear(): we don't know who was affected
+        bump_version('catalog')
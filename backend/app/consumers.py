@@ -0,0 +1,104 @@
+"""
+WebSocket consumer for multiplayer Speed Run races (ws/race/<code>/).
+
+Messages from the browser:   {"type": "start"} (host only), {"type": "answer", "answer": "42"}
+Messages to the browser:     lobby, start, result, progress, finished, error
+
+Room state lives in races.py; the channel layer group race.<code> is only
+used to fan events out to every player in the room.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+
+from . import races
+
+
+def group_name(code):
+    return f'race.{code}'
+
+
+async def broadcast(code, payload):
+    await get_channel_layer().group_send(group_name(code), {'type': 'race.event', 'payload': payload})
+
+
+async def finish_race(room):
+    """End the race, write the results once and tell everyone."""
+    if room.state != 'running':
+        return
+    room.finish()
+    await database_sync_to_async(races.save_results)(room)
+    await broadcast(room.code, {'type': 'finished', 'results': room.scoreboard()})
+    # While the results were being saved the code may have been reused for a new room
+    if races.ROOMS.get(room.code) is room:
+        del races.ROOMS[room.code]
+
+
+class RaceConsumer(AsyncJsonWebsocketConsumer):
+
+    async def connect(self):
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.code = self.scope['url_route']['kwargs']['code']
+        query = parse_qs(self.scope['query_string'].decode())
+        try:
+            self.room = races.join(self.code, user.id, user.username, query.get('difficulty', ['easy'])[0])
+        except races.RaceError as e:
+            self.room = None
+            await self.accept()
+            await self.send_json({'type': 'error', 'message': str(e)})
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(group_name(self.code), self.channel_name)
+        await self.accept()
+        await broadcast(self.code, self.room.lobby_state())
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'room', None) is None:
+            return
+        await self.channel_layer.group_discard(group_name(self.code), self.channel_name)
+        room = races.leave(self.code, self.scope['user'].id)
+        if room is not None and room.state == 'lobby':
+            await broadcast(self.code, room.lobby_state())
+        elif room is not None and room.state == 'running':
+            await broadcast(self.code, {'type': 'progress', 'players': room.scoreboard()})
+
+    async def receive_json(self, content):
+        user_id = self.scope['user'].id
+        try:
+            if content.get('type') == 'start':
+                await self.start_race(user_id)
+            elif content.get('type') == 'answer':
+                correct, question = self.room.answer(user_id, content.get('answer', ''))
+                await self.send_json({'type': 'result', 'correct': correct, 'question': question})
+                if correct:
+                    await broadcast(self.code, {'type': 'progress', 'players': self.room.scoreboard()})
+        except races.RaceError as e:
+            await self.send_json({'type': 'error', 'message': str(e)})
+
+    async def start_race(self, user_id):
+        room = self.room
+        room.start(user_id)
+        # One timer per room ends the race even if nobody answers
+        loop = asyncio.get_running_loop()
+        room.end_timer = loop.call_at(
+            loop.time() + races.COUNTDOWN_SECONDS + races.RACE_SECONDS,
+            lambda: asyncio.ensure_future(finish_race(room)),
+        )
+        await broadcast(self.code, {
+            'type': 'start',
+            'starts_in': races.COUNTDOWN_SECONDS,
+            'duration': races.RACE_SECONDS,
+            'question': room.problem(0)['question'],
+            'players': room.scoreboard(),
+        })
+
+    async def race_event(self, event):
+        await self.send_json(event['payload'])
@@ -0,0 +1,242 @@
+"""
+Per-problem stats for the catalog: Problem.attempt_count, solve_count and
+unique_solvers.
+
+Counting submissions for every card would be a GROUP BY per page, so the
+totals live on the Problem row instead and are bumped as answers come in,
+with UPDATE ... SET n = n + 1 (an F() expression) so two workers grading the
+same problem can't overwrite each other. update() skips Problem's post_save,
+so a new answer doesn't count as a catalog change (see cache_versions.py).
+
+Instead the counters bump the 'catalog_stats' version, at most once every
+STATS_PUBLISH_SECONDS, which the problems page adds to its cache keys and
+ETag. The cards show stats that are up to a minute old, and a busy problem
+doesn't throw away the catalog cache on every answer.
+
+Anything that skips the signals (deleting a user's rows in process_deletions,
+raw SQL, a crash between the insert and the increment) makes the counters
+drift. reconcile() recounts a batch of problems from scratch. The
+reconcile_problem_counters job runs it over every problem each night.
+
+Sharded counters
+----------------
+Counting today's challenge completions means a COUNT over the M2M table on
+every daily challenge page view. A single counter row doesn't help either:
+on the morning rush every completion would queue up to update it. A sharded
+counter is SHARDS CounterShard rows. increment() picks one at random, so
+writers rarely wait on each other. total() sums the stripes and caches the
+sum for TOTAL_CACHE_SECONDS.
+
+    counters.increment(completions_key(challenge.pk))
+    counters.total(completions_key(challenge.pk))  # A few seconds stale at most
+"""
+import random
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache_versions
+from .models import CounterShard, DailyChallenge, Problem, Submission
+
+STATS_PUBLISH_SECONDS = 60
+COUNTERS = ('attempt_count', 'solve_count', 'unique_solvers')
+SHARDS = 16
+TOTAL_CACHE_SECONDS = 5
+
+
+def publish():
+    """Bump the 'catalog_stats' version, unless it was bumped in the last STATS_PUBLISH_SECONDS."""
+    if cache.add('catalog_stats:published', True, STATS_PUBLISH_SECONDS):
+        cache_versions.bump_version('catalog_stats')
+
+
+@receiver(post_save, sender=Submission)
+def count_submission(sender, instance, created, **kwargs):
+    if not created:
+        return
+    changes = {'attempt_count': F('attempt_count') + 1}
+    if instance.was_correct:
+        changes['solve_count'] = F('solve_count') + 1
+    Problem.objects.filter(pk=instance.problem_id).update(**changes)
+    publish()
+
+
+def count_submissions(submissions):
+    """count_submission() for several new Submissions (the batch check-answer API), in one UPDATE."""
+    attempts, solves = Counter(), Counter()
+    for submission in submissions:
+        attempts[submission.problem_id] += 1
+        solves[submission.problem_id] += submission.was_correct
+
+    def per_problem(counts):
+        return Case(*[When(pk=pk, then=Value(n)) for pk, n in counts.items()], default=Value(0))
+
+    if attempts:
+        Problem.objects.filter(pk__in=attempts).update(
+            attempt_count=F('attempt_count') + per_problem(attempts),
+            solve_count=F('solve_count') + per_problem(solves),
+        )
+        publish()
+
+
+@receiver(m2m_changed, sender=Problem.solved_by.through)
+def count_solvers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # user.solved_problems.clear(): remember which problems lose a solver
+        instance._cleared_problem_ids = list(instance.solved_problems.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        if reverse:
+            Problem.objects.filter(pk__in=instance.__dict__.pop('_cleared_problem_ids', [])).update(
+                unique_solvers=F('unique_solvers') - 1
+            )
+        else:
+            Problem.objects.filter(pk=instance.pk).update(unique_solvers=0)
+        publish()
+        return
+    # For post_add, pk_set only holds the rows that were really inserted
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    sign = 1 if action == 'post_add' else -1
+    if reverse:
+        # user.solved_problems.add(p1, p2): instance is the user, one more solver each
+        Problem.objects.filter(pk__in=pk_set).update(unique_solvers=F('unique_solvers') + sign)
+    else:
+        Problem.objects.filter(pk=instance.pk).update(unique_solvers=F('unique_solvers') + sign * len(pk_set))
+    publish()
+
+
+def reconcile(problem_ids):
+    """
+    Recount the stats of `problem_ids` and fix the ones that drifted.
+    Returns {problem id: {field: (stored, actual)}} for what was fixed.
+
+    The rows are locked while they're counted, so an answer graded meanwhile
+    waits instead of being counted twice (or not at all).
+    """
+    drift = {}
+    with transaction.atomic():
+        stored = {
+            row[0]: dict(zip(COUNTERS, row[1:]))
+            for row in Problem.objects.select_for_update().filter(pk__in=problem_ids).values_list('id', *COUNTERS)
+        }
+        actual = {problem_id: dict.fromkeys(COUNTERS, 0) for problem_id in stored}
+        submissions = (
+            Submission.objects.filter(problem_id__in=stored).order_by().values('problem_id')
+            .annotate(attempts=Count('id'), solves=Count('id', filter=Q(was_correct=True)))
+        )
+        for row in submissions:
+            actual[row['problem_id']].update(attempt_count=row['attempts'], solve_count=row['solves'])
+        solvers = (
+            Problem.solved_by.through.objects.filter(problem_id__in=stored).order_by().values('problem_id')
+            .annotate(solvers=Count('id'))
+        )
+        for row in solvers:
+            actual[row['problem_id']]['unique_solvers'] = row['solvers']
+
+        for problem_id, counts in actual.items():
+            if counts != stored[problem_id]:
+                drift[problem_id] = {
+                    field: (stored[problem_id][field], counts[field])
+                    for field in COUNTERS if counts[field] != stored[problem_id][field]
+                }
+                Problem.objects.filter(pk=problem_id).update(**counts)
+    if drift:
+        publish()
+    return drift
+
+
+# --- Sharded counters ---
+
+def increment(name, amount=1):
+    """
+    Add `amount` to a random stripe of counter `name`. One upsert, so a
+    stripe's first increment costs the same as any other and can't race
+    another worker creating it.
+    """
+    quote = connection.ops.quote_name
+    meta = CounterShard._meta
+    table, name_column, shard_column, count_column = (
+        quote(meta.db_table), *(quote(meta.get_field(field).column) for field in ('name', 'shard', 'count'))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({name_column}, {shard_column}, {count_column}) VALUES (%s, %s, %s) '
+            f'ON CONFLICT ({name_column}, {shard_column}) '
+            f'DO UPDATE SET {count_column} = {table}.{count_column} + excluded.{count_column}',
+            [name, random.randrange(SHARDS), amount],
+        )
+
+
+def total(name, cache_seconds=TOTAL_CACHE_SECONDS):
+    """Sum of the stripes, cached for `cache_seconds` (0 reads the rows every time)."""
+    key = f'counter:{name}'
+    value = cache.get(key) if cache_seconds else None
+    if value is None:
+        value = CounterShard.objects.filter(name=name).aggregate(total=Sum('count'))['total'] or 0
+        if cache_seconds:
+            cache.set(key, value, cache_seconds)
+    return value
+
+
+def set_total(name, value):
+    """Replace the counter with `value` (all on stripe 0), e.g. after a recount."""
+    with transaction.atomic():
+        CounterShard.objects.filter(name=name).delete()
+        if value:
+            CounterShard.objects.create(name=name, shard=0, count=value)
+    cache.delete(f'counter:{name}')
+
+
+def completions_key(challenge_id):
+    return f'challenge:{challenge_id}:completions'
+
+
+def reconcile_completions(challenge):
+    """Recount one challenge's completions. Returns (counted before, actual) if they differed, else None."""
+    name = completions_key(challenge.pk)
+    with transaction.atomic():
+        # A completion inserts into completed_by, which locks this row (FOR KEY SHARE
+        # on PostgreSQL) until it commits along with its increment(). Holding the
+        # row FOR UPDATE makes new completions wait and waits for ones in flight,
+        # even while the stripe they'll go to doesn't exist yet.
+        DailyChallenge.objects.select_for_update().only('pk').get(pk=challenge.pk)
+        stored = total(name, cache_seconds=0)
+        actual = challenge.completed_by.count()
+        if stored == actual:
+            return None
+        set_total(name, actual)
+    return stored, actual
+
+
+@receiver(m2m_changed, sender=DailyChallenge.completed_by.through)
+def count_completions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # user.completed_challenges.clear(): remember which challenges lose a completion
+        instance._cleared_challenge_ids = list(instance.completed_challenges.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        if reverse:
+            for challenge_id in instance.__dict__.pop('_cleared_challenge_ids', []):
+                increment(completions_key(challenge_id), -1)
+        else:
+            set_total(completions_key(instance.pk), 0)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    sign = 1 if action == 'post_add' else -1
+    if reverse:
+        # user.completed_challenges.add(c1, c2): instance is the user, one more completion each
+        for challenge_id in pk_set:
+            increment(completions_key(challenge_id), sign)
+    else:
+        increment(completions_key(instance.pk), sign * len(pk_set))
+
+
+@receiver(post_delete, sender=DailyChallenge)
+def drop_completion_counter(sender, instance, **kwargs):
+    CounterShard.objects.filter(name=completions_key(instance.pk)).delete()
@@ -0,0 +1,156 @@
+"""
+Deleting users and problems without blocking the request.
+
+A plain .delete() makes Django's collector load every dependent Submission,
+SpeedRunAttempt, DailyChallenge and M2M row into memory first, which for a
+prolific user or a popular problem takes seconds. Instead the dashboard only
+hides the object (user.is_active = False / problem.deleted_at), records a
+PendingDeletion and queues a process_deletions job (jobs.py; it also runs
+every few minutes from PERIODIC_JOBS). That job empties the big dependent
+tables with raw
+
+    DELETE FROM t WHERE id IN (SELECT id FROM t WHERE <owner> LIMIT n)
+
+statements, one short transaction per batch, hands a user's study groups
+over to another member, and finally deletes the object itself through the
+ORM. By then only a handful of rows are left, and the usual post_delete
+receivers (caches, auth snapshot) still run.
+
+Every step can simply be run again, so a crash or a --max-seconds timeout
+just means the next run picks the deletion up where it stopped.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import groups, jobs
+from .models import (DailyChallenge, GroupMembership, GroupScore, PendingDeletion, Problem, ReviewItem,
+                     SkillRating, SpeedRunAttempt, Submission)
+
+BATCH_SIZE = 2000
+
+
+def request_user_deletion(user, requested_by=None):
+    """Deactivate `user` now (they can't log in and drop off the leaderboard) and queue the cleanup."""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        deletion, _ = PendingDeletion.objects.get_or_create(
+            kind='user', object_id=user.pk, finished_at=None,
+            defaults={'label': user.username, 'requested_by': requested_by},
+        )
+        queue_cleanup()
+    from . import live
+    live.FEEDS['leaderboard'].publish()
+    return deletion
+
+
+def request_problem_deletion(problem, requested_by=None):
+    """Hide `problem` from players now and queue the cleanup."""
+    with transaction.atomic():
+        problem.deleted_at = timezone.now()
+        problem.save(update_fields=['deleted_at'])
+        deletion, _ = PendingDeletion.objects.get_or_create(
+            kind='problem', object_id=problem.pk, finished_at=None,
+            defaults={'label': problem.question[:255], 'requested_by': requested_by},
+        )
+        queue_cleanup()
+    return deletion
+
+
+def queue_cleanup():
+    jobs.enqueue('process_deletions', unique=True, max_seconds=240)
+
+
+def _step(name, model, where, *params):
+    meta = model._meta
+    return name, meta.db_table, meta.pk.column, where, params
+
+
+def user_steps(user_id):
+    """(step name, table, pk column, WHERE clause, params) for everything big a user owns."""
+    return [
+        _step('submissions', Submission, 'user_id = %s', user_id),
+        _step('speed run attempts', SpeedRunAttempt, 'user_id = %s', user_id),
+        _step('review items', ReviewItem, 'user_id = %s', user_id),
+        _step('skill ratings', SkillRating, 'user_id = %s', user_id),
+        _step('group scores', GroupScore, 'user_id = %s', user_id),
+        _step('group memberships', GroupMembership, 'user_id = %s', user_id),
+        _step('solved problems', Problem.solved_by.through, 'user_id = %s', user_id),
+        _step('daily challenge completions', DailyChallenge.completed_by.through, 'user_id = %s', user_id),
+    ]
+
+
+def problem_steps(problem_id):
+    """Same for a problem. Its DailyChallenge rows go with the final ORM delete (one per day at most)."""
+    challenges = f'SELECT id FROM {DailyChallenge._meta.db_table} WHERE problem_id = %s'
+    return [
+        _step('submissions', Submission, 'problem_id = %s', problem_id),
+        _step('review items', ReviewItem, 'problem_id = %s', problem_id),
+        _step('solvers', Problem.solved_by.through, 'problem_id = %s', problem_id),
+        _step('daily challenge completions', DailyChallenge.completed_by.through,
+              f'dailychallenge_id IN ({challenges})', problem_id),
+    ]
+
+
+STEPS = {'user': user_steps, 'problem': problem_steps}
+MODELS = {'user': User, 'problem': Problem}
+
+
+def delete_batch(table, pk, where, params, batch_size):
+    """Delete up to `batch_size` matching rows in one statement. Returns how many went."""
+    quote = connection.ops.quote_name
+    sql = (
+        f'DELETE FROM {quote(table)} WHERE {quote(pk)} IN '
+        f'(SELECT {quote(pk)} FROM {quote(table)} WHERE {where} LIMIT %s)'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [*params, batch_size])
+        return cursor.rowcount
+
+
+def process(deletion, batch_size=BATCH_SIZE, deadline=None):
+    """
+    Work through one PendingDeletion, saving progress after every batch.
+    Returns True when it's finished, False if `deadline` (time.monotonic()) passed first.
+    """
+    if deletion.started_at is None:
+        deletion.started_at = timezone.now()
+    deletion.error = ''
+    deletion.save(update_fields=['started_at', 'error'])
+
+    for name, table, pk, where, params in STEPS[deletion.kind](deletion.object_id):
+        deletion.current_step = name
+        while True:
+            deleted = delete_batch(table, pk, where, params, batch_size)
+            deletion.rows_deleted += deleted
+            deletion.save(update_fields=['current_step', 'rows_deleted'])
+            if deleted < batch_size:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+
+    if deletion.kind == 'user':
+        # Otherwise the final delete would take the user's groups (and everyone's scores in them) along
+        deletion.current_step = 'hand over groups'
+        deletion.save(update_fields=['current_step'])
+        groups.hand_over_groups(deletion.object_id)
+
+    # Only small leftovers now (profile, progress, groups nobody else is in, daily challenge rows...)
+    deletion.current_step = 'final delete'
+    deletion.save(update_fields=['current_step'])
+    obj = MODELS[deletion.kind].objects.filter(pk=deletion.object_id).first()
+    if obj is not None:
+        _, counts = obj.delete()
+        deletion.rows_deleted += sum(counts.values())
+
+    deletion.current_step = ''
+    deletion.finished_at = timezone.now()
+    deletion.save(update_fields=['current_step', 'rows_deleted', 'finished_at'])
+    return True
+
+
+def pending_user_ids():
+    return PendingDeletion.objects.filter(kind='user', finished_at__isnull=True).values_list('object_id', flat=True)
@@ -0,0 +1,265 @@
+"""
+Streaming bulk export of submissions and progress data.
+
+Rows are read with QuerySet.iterator() (a server-side cursor on PostgreSQL)
+and turned into output bytes one chunk at a time, so memory stays flat no
+matter how many rows are exported. Used by the staff export view and the
+export_data management command.
+
+Under ASGI Django buffers a StreamingHttpResponse fed by a plain generator
+into memory before sending it, so under ASGI the view wraps the generator
+in stream_async(), which pulls one chunk at a time on the sync thread. WSGI
+iterates the plain generator as it is (an async one would be buffered there).
+
+Formats: csv, ndjson (gzip-compressed) and parquet (needs pyarrow).
+"""
+import csv
+import datetime
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+
+from .models import SpeedRunAttempt, Submission, UserProfile, UserProgress
+
+CHUNK_SIZE = 2000
+
+# name -> (model, exported fields, date field used by from/to, category field or None)
+DATASETS = {
+    'submissions': (
+        Submission,
+        ['id', 'user_id', 'user__username', 'problem_id', 'problem__category', 'problem__difficulty',
+         'submitted_answer', 'was_correct', 'submitted_at'],
+        'submitted_at',
+        'problem__category',
+    ),
+    'profiles': (
+        UserProfile,
+        ['user_id', 'user__username', 'points', 'current_streak', 'last_daily_challenge_date',
+         'user__date_joined'],
+        'user__date_joined',
+        None,
+    ),
+    'progress': (
+        UserProgress,
+        ['user_id', 'user__username', 'current_checkpoint__checkpoint_number', 'problems_solved_at_current',
+         'total_checkpoints_completed', 'total_map_problems_solved', 'journey_started_at', 'last_activity'],
+        'last_activity',
+        None,
+    ),
+    'speed_runs': (
+        SpeedRunAttempt,
+        ['id', 'user_id', 'user__username', 'score', 'created_at'],
+        'created_at',
+        None,
+    ),
+}
+
+FORMATS = {
+    # name -> (content type, file extension)
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/gzip', 'ndjson.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportError(ValueError):
+    """Bad export parameters (unknown dataset/format, unsupported filter...)."""
+
+
+def parse_day(value):
+    """'YYYY-MM-DD' -> date; empty/None -> None."""
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f'Invalid date "{value}", expected YYYY-MM-DD')
+
+
+def build_queryset(dataset, date_from=None, date_to=None, category=None, users=None):
+    """
+    The rows to export, as a values_list queryset ordered for stable output.
+    date_from/date_to are inclusive dates; users is a list of usernames.
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f'Unknown dataset "{dataset}". Choose from: {", ".join(DATASETS)}')
+    model, fields, date_field, category_field = DATASETS[dataset]
+
+    queryset = model.objects.all()
+    date_lookup = f'{date_field}__date' if _is_datetime(model, date_field) else date_field
+    if date_from:
+        queryset = queryset.filter(**{f'{date_lookup}__gte': date_from})
+    if date_to:
+        queryset = queryset.filter(**{f'{date_lookup}__lte': date_to})
+    if category:
+        if category_field is None:
+            raise ExportError(f'The {dataset} dataset cannot be filtered by category')
+        queryset = queryset.filter(**{category_field: category})
+    if users:
+        queryset = queryset.filter(user__username__in=users)
+
+    return queryset.order_by('pk').values_list(*fields)
+
+
+def stream_export(dataset, fmt, **filters):
+    """Generator of output bytes for `dataset` in `fmt`."""
+    if fmt not in FORMATS:
+        raise ExportError(f'Unknown format "{fmt}". Choose from: {", ".join(FORMATS)}')
+    if fmt == 'parquet':
+        _import_pyarrow()  # Fail before the response starts, not halfway through it
+    queryset = build_queryset(dataset, **filters)
+    fields = DATASETS[dataset][1]
+    writer = {'csv': _stream_csv, 'ndjson': _stream_ndjson, 'parquet': _stream_parquet}[fmt]
+    return writer(dataset, fields, _chunks(queryset))
+
+
+async def stream_async(content):
+    """Async iterator over a stream_export() generator, for StreamingHttpResponse under ASGI."""
+    # Every chunk is read on the one sync thread, like the view that opened the cursor
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    content = iter(content)
+    while (chunk := await next_chunk(content, None)) is not None:
+        yield chunk
+
+
+def _is_datetime(model, path):
+    return _resolve_field(model, path).get_internal_type() == 'DateTimeField'
+
+
+def _resolve_field(model, path):
+    """The model field at the end of a lookup path like 'user__username'."""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    field = model._meta.get_field(name.removesuffix('_id') if name.endswith('_id') else name)
+    return field.target_field if name.endswith('_id') and field.is_relation else field
+
+
+def _chunks(queryset):
+    chunk = []
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _plain(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+class _Buffer:
+    """Write target for csv.writer that hands back what was written."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self):
+        data = ''.join(self.parts)
+        self.parts = []
+        return data.encode('utf-8')
+
+
+def _stream_csv(dataset, fields, chunks):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.drain()
+    for chunk in chunks:
+        writer.writerows([_plain(v) for v in row] for row in chunk)
+        yield buffer.drain()
+
+
+def _stream_ndjson(dataset, fields, chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        lines = ''.join(
+            json.dumps(dict(zip(fields, map(_plain, row))), ensure_ascii=False) + '\n' for row in chunk
+        )
+        data = compressor.compress(lines.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only file for ParquetWriter that lets us take the bytes out as they come."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _parquet_schema(pa, model, fields):
+    types = {
+        'BooleanField': pa.bool_(),
+        'DateField': pa.date32(),
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+        'FloatField': pa.float64(),
+    }
+    columns = []
+    for name in fields:
+        internal_type = _resolve_field(model, name).get_internal_type()
+        if internal_type in types:
+            columns.append(pa.field(name, types[internal_type]))
+        elif internal_type.endswith(('IntegerField', 'AutoField')):
+            columns.append(pa.field(name, pa.int64()))
+        else:
+            columns.append(pa.field(name, pa.string()))
+    return pa.schema(columns)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError('Parquet export needs the pyarrow package (pip install pyarrow)')
+    return pyarrow, pyarrow.parquet
+
+
+def _stream_parquet(dataset, fields, chunks):
+    pa, pq = _import_pyarrow()
+    schema = _parquet_schema(pa, DATASETS[dataset][0], fields)
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))  # Each chunk becomes one row group
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_filename(dataset, fmt):
+    return f'pbmate-{dataset}-{datetime.date.today():%Y%m%d}.{FORMATS[fmt][1]}'
@@ -0,0 +1,203 @@
+"""
+Exact arithmetic on Problem questions and answers.
+
+Expressions such as "3/4 ÷ 1/2", "(12 + 8) × (5 - 3)" or "4(b - 1)" are
+parsed once with Python's own parser, checked against a small whitelist
+(numbers, single-letter variables, + - × ÷ and parentheses) and turned
+into a tree of closures that computes exactly (ints, and Fractions once
+anything is divided), so 1/3 + 1/6 is exactly 1/2 and nothing is ever
+eval()'d. Compiled expressions are cached by their text, so grading the
+same problem again only runs the closures.
+
+User answers are stricter: parse_number() only accepts a plain number
+("12", "-0.5", "3/2"), otherwise typing the question back in would count
+as the right answer.
+"""
+import ast
+import operator
+import re
+from fractions import Fraction
+from functools import lru_cache
+
+MAX_LENGTH = 200  # Longer input is rejected before parsing
+CACHE_SIZE = 65536
+
+# A written fraction like 3/4 binds tighter than × and ÷: "3/4 ÷ 1/2" is (3/4) ÷ (1/2)
+_FRACTION_LITERAL = re.compile(r'(?<![\w.)])(\d+)\s*/\s*(\d+)(?![\w.(])')
+GLYPHS = str.maketrans({'×': '*', '·': '*', '÷': '/', '∶': '/', '−': '-', '–': '-'})
+_IMPLICIT_AFTER_VALUE = re.compile(r'(?<=[0-9.)a-zA-Z])\s*(?=[(a-zA-Z])')  # 2x, 4(b - 1), (a)(b)
+_IMPLICIT_AFTER_PAREN = re.compile(r'(?<=\))\s*(?=[0-9.])')  # (b + 1)5
+_PROMPT = re.compile(r'^[^\d:]*:\s*')  # "Solve for x: " (but not the "3:" in "3:4")
+_LEAD_IN = re.compile(r'^\s*(what\s+is|what\'s|calculate|compute|evaluate|simplify)\b\s*', re.IGNORECASE)  # "What is 3/4 * 8/9?"
+_NUMBER = re.compile(r'[+-]?(\d+(\.\d*)?|\.\d+)(/[+-]?\d+)?')
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: lambda a, b: Fraction(a, b) if type(a) is int and type(b) is int else a / b,
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class ExpressionError(ValueError):
+    """Text that isn't a supported expression (or divides by zero)."""
+
+
+class Expression:
+    """A compiled expression. Call it with values for its variables, get a Fraction."""
+
+    __slots__ = ('source', 'variables', '_function')
+
+    def __init__(self, source, variables, function):
+        self.source = source
+        self.variables = variables
+        self._function = function
+
+    def __call__(self, **values):
+        try:
+            value = self._function(values)
+        except ZeroDivisionError:
+            raise ExpressionError(f'Division by zero in "{self.source}"')
+        except KeyError as e:
+            raise ExpressionError(f'No value given for {e.args[0]} in "{self.source}"')
+        return value if type(value) is Fraction else Fraction(value)
+
+    def __repr__(self):
+        return f'Expression({self.source!r})'
+
+
+def normalize(text):
+    """Math glyphs to Python operators, implicit products made explicit, trailing '= ?' dropped."""
+    text = _FRACTION_LITERAL.sub(r'(\1/\2)', text).translate(GLYPHS).strip()
+    text = re.sub(r'\s*=\s*\??\s*$|\s*\?\s*$', '', text)
+    text = _IMPLICIT_AFTER_VALUE.sub('*', text)
+    return _IMPLICIT_AFTER_PAREN.sub('*', text)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text):
+    """Parse and compile `text`. Raises ExpressionError for anything outside the whitelist."""
+    if len(text) > MAX_LENGTH:
+        raise ExpressionError('Expression is too long')
+    source = normalize(text)
+    try:
+        tree = ast.parse(source, mode='eval')
+    except (SyntaxError, ValueError):
+        raise ExpressionError(f'Not a valid expression: "{text}"')
+    variables = set()
+    function = _compile(tree.body, variables)
+    return Expression(text, frozenset(variables), function)
+
+
+def _compile(node, variables):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        # Whole numbers stay ints (much faster than Fraction) until something divides them;
+        # str() keeps 0.1 as exactly 1/10
+        try:
+            value = node.value if type(node.value) is int else Fraction(str(node.value))
+        except (ValueError, OverflowError):
+            raise ExpressionError(f'Number out of range: {node.value}')  # A literal too big for a float is inf
+        return lambda values: value
+
+    if isinstance(node, ast.Name) and len(node.id) == 1:
+        name = node.id
+        variables.add(name)
+        return lambda values: values[name]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        op = BINARY_OPERATORS[type(node.op)]
+        left, right = _compile(node.left, variables), _compile(node.right, variables)
+        return lambda values: op(left(values), right(values))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        op = UNARY_OPERATORS[type(node.op)]
+        operand = _compile(node.operand, variables)
+        return lambda values: op(operand(values))
+
+    raise ExpressionError(f'Unsupported syntax: {type(node).__name__}')
+
+
+def evaluate(text):
+    """Exact value of an expression with no variables."""
+    expression = compile_expression(text)
+    if expression.variables:
+        raise ExpressionError(f'"{text}" has unknowns: {", ".join(sorted(expression.variables))}')
+    return expression()
+
+
+def solve_linear(equation):
+    """
+    Solve a linear equation in one unknown, e.g. "2x + 4 = 10" -> ('x', Fraction(3)).
+    Raises ExpressionError if it isn't one (no unknown, two unknowns, x², x in a denominator...).
+    """
+    sides = equation.split('=')
+    if len(sides) != 2:
+        raise ExpressionError(f'Not an equation: "{equation}"')
+    left, right = (compile_expression(side.strip()) for side in sides)
+    variables = left.variables | right.variables
+    if len(variables) != 1:
+        raise ExpressionError(f'Expected one unknown in "{equation}", found {len(variables)}')
+    (name,) = variables
+
+    # f(v) = left - right is linear iff its slope is the same between any two points.
+    # Sampling at 1, 2, 3 (not 0) keeps "a / x" from dividing by zero before we can reject it.
+    def f(value):
+        return left(**{name: value}) - right(**{name: value})
+
+    f1, f2, f3 = f(1), f(2), f(3)
+    slope = f2 - f1
+    if f3 - f2 != slope:
+        raise ExpressionError(f'"{equation}" is not linear in {name}')
+    if slope == 0:
+        raise ExpressionError(f'"{equation}" has no single solution')
+    return name, 1 - f1 / slope
+
+
+def solve_question(question):
+    """
+    The exact answer to a problem's question, worked out from the question alone.
+    Handles plain expressions ("3/4 ÷ 1/2") and linear equations, optionally with a
+    prompt before a colon ("Solve for x: 2x + 4 = 10") or a lead-in ("What is 3/4 * 8/9?").
+    Raises ExpressionError for anything else (word problems...).
+    """
+    text = _LEAD_IN.sub('', _PROMPT.sub('', question))
+    text = re.sub(r'\s*=\s*\??\s*$|\s*\?\s*$', '', text)  # "5 + 3 = ?" is an expression, not an equation
+    if '=' in text:
+        return solve_linear(text)[1]
+    return evaluate(text)
+
+
+def parse_number(text):
+    """A user's answer as a Fraction: '12', '-0.5', '3/2'. Raises ExpressionError otherwise."""
+    text = text.translate(GLYPHS).replace(' ', '')
+    if len(text) > MAX_LENGTH or not _NUMBER.fullmatch(text):
+        raise ExpressionError(f'Not a number: "{text}"')
+    try:
+        return Fraction(text)
+    except (ValueError, ZeroDivisionError):
+        raise ExpressionError(f'Not a number: "{text}"')
+
+
+def format_number(value):
+    """'5', '3/2' or '-1/4' - the way answers are written in the problem bank."""
+    return str(value.numerator) if value.denominator == 1 else f'{value.numerator}/{value.denominator}'
+
+
+def check_answer(user_answer, expected):
+    """
+    Grade `user_answer` against a stored answer. Returns (is_correct, expected for display).
+    Numeric answers are compared exactly ("1.5" == "3/2" == "6/4"); answers that aren't
+    numbers fall back to a case-insensitive text comparison.
+    """
+    try:
+        expected_value = evaluate(expected)
+    except ExpressionError:
+        return user_answer.strip().lower() == expected.strip().lower(), expected.strip()
+    try:
+        return parse_number(user_answer) == expected_value, format_number(expected_value)
+    except ExpressionError:
+        return False, format_number(expected_value)
@@ -0,0 +1,93 @@
+"""
+Grading several catalog answers in one request (the batch check-answer API).
+
+The problems page can send every filled-in answer at once instead of one
+request each. grade_batch() fetches the problems and the user's solved set
+with one query each, bulk-inserts the Submissions, adds all the new solves
+with one solved_problems.add() and the points with one add_points().
+
+bulk_create() doesn't send post_save, and sending it by hand would run
+every Submission receiver once per answer. Instead the batch runs each
+receiver's batch version once: one SkillRating pass per batch
+(adaptive.record_submissions), one review queue update
+(reviews.record_answers), one UPDATE of the problem counters
+(counters.count_submissions) and one round of cache version bumps.
+"""
+from django.db import connection, transaction
+
+from . import adaptive, cache_versions, counters, expressions, reviews
+from .models import Problem, Submission, UserProfile
+
+MAX_BATCH = 10  # Answers per request; each one still costs a check_answer rate-limit token
+DIFFICULTY_POINTS = {'easy': 5, 'medium': 10, 'hard': 20}
+
+
+def points_for(problem):
+    """Points for solving `problem` for the first time."""
+    # Prefer points calibrated from real submissions (calibrate_problems)
+    if problem.suggested_points is not None:
+        return problem.suggested_points
+    return DIFFICULTY_POINTS.get(problem.difficulty.lower(), 0)
+
+
+def parse_item(item):
+    """(problem id, answer) from one {"problem_id": ..., "answer": ...} item, or None if it's malformed."""
+    if not isinstance(item, dict):
+        return None
+    answer = item.get('answer')
+    try:
+        problem_id = int(item.get('problem_id'))
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(answer, str) or not answer.strip():
+        return None
+    return problem_id, answer.strip()
+
+
+def grade_batch(user, items):
+    """
+    Grade [(problem id, answer) or None] for `user`, all in one transaction.
+    Returns (one result dict per item, points awarded).
+    """
+    with transaction.atomic():
+        # An id the primary key can't hold is just not found (in_bulk would raise OverflowError)
+        low, high = connection.ops.integer_field_range(Problem._meta.pk.get_internal_type())
+        ids = {item[0] for item in items if item and low <= item[0] <= high}
+        problems = Problem.objects.filter(deleted_at__isnull=True).in_bulk(ids)
+        already_solved = set(user.solved_problems.filter(id__in=ids).values_list('id', flat=True))
+
+        results, submissions, newly_solved = [], [], []
+        points = 0
+        for item in items:
+            if item is None:
+                results.append({'error': 'Missing data'})
+                continue
+            problem_id, answer = item
+            problem = problems.get(problem_id)
+            if problem is None:
+                results.append({'problem_id': problem_id, 'error': 'Problem not found'})
+                continue
+            is_correct, correct_answer = expressions.check_answer(answer, problem.answer)
+            submissions.append(Submission(user=user, problem=problem, submitted_answer=answer, was_correct=is_correct))
+            if is_correct and problem_id not in already_solved:
+                already_solved.add(problem_id)  # The same problem twice in one batch only counts once
+                newly_solved.append(problem)
+                points += points_for(problem)
+            results.append({
+                'problem_id': problem_id,
+                'correct': is_correct,
+                'message': '🎉 Correct!' if is_correct else '❌ Incorrect. Try again!',
+                'correct_answer': correct_answer if not is_correct else None,
+            })
+
+        Submission.objects.bulk_create(submissions)
+        adaptive.record_submissions(submissions)
+        reviews.record_answers(user.pk, [(s.problem_id, s.was_correct, s.submitted_at) for s in submissions])
+        counters.count_submissions(submissions)
+        cache_versions.bump_for_submissions(submissions)
+        if newly_solved:
+            user.solved_problems.add(*newly_solved)  # One INSERT, and m2m_changed still fires
+        if points:
+            profile, _ = UserProfile.objects.get_or_create(user=user)
+            profile.add_points(points)
+    return results, points
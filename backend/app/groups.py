@@ -0,0 +1,149 @@
+"""
+Class/team leaderboards, kept incrementally.
+
+Every time a user earns points (UserProfile.add_points) the matching
+GroupScore rows for each of their groups are bumped for the 'all', current
+week and current month periods. Reading a board is then a slice of the
+(group, period, -points) index and a rank is one COUNT over the same
+index, so nothing is grouped or summed when a page is shown. The COUNT
+reads one index entry per member ahead, so it stops at RANK_COUNT_LIMIT:
+further down, a member is just "outside the top RANK_COUNT_LIMIT".
+"""
+import secrets
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import GroupMembership, GroupScore, StudyGroup, UserProfile, points_awarded
+
+PERIOD_CHOICES = [
+    ('week', 'This week'),
+    ('month', 'This month'),
+    ('all', 'All time'),
+]
+BOARD_SIZE = 50
+RANK_COUNT_LIMIT = 1000  # Members counted past at most when working out one member's rank
+JOIN_CODE_ATTEMPTS = 5
+
+
+def period_key(period, day=None):
+    """Stored period for 'all'/'week'/'month' on `day` (default: today)."""
+    day = day or timezone.localdate()
+    if period == 'week':
+        year, week, _ = day.isocalendar()
+        return f'week:{year}-W{week:02}'
+    if period == 'month':
+        return f'month:{day:%Y-%m}'
+    return 'all'
+
+
+def current_periods(day=None):
+    return [period_key(period, day) for period, _ in PERIOD_CHOICES]
+
+
+@receiver(points_awarded)
+def record_points(sender, user_id, amount, **kwargs):
+    """Add `amount` to the user's score in every group they belong to."""
+    group_ids = list(GroupMembership.objects.filter(user_id=user_id).values_list('group_id', flat=True))
+    if not group_ids or not amount:
+        return
+
+    periods = current_periods()
+    with transaction.atomic():
+        # Make sure this period's rows exist (a no-op except on the first
+        # points of a new week/month), then bump them all in one UPDATE
+        GroupScore.objects.bulk_create(
+            [GroupScore(group_id=g, user_id=user_id, period=p) for g in group_ids for p in periods],
+            ignore_conflicts=True,
+        )
+        GroupScore.objects.filter(
+            user_id=user_id, group_id__in=group_ids, period__in=periods,
+        ).update(points=F('points') + amount)
+
+
+def create_group(owner, name, kind='class'):
+    for attempt in range(JOIN_CODE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                group = StudyGroup.objects.create(
+                    name=name, kind=kind, owner=owner, join_code=secrets.token_hex(4).upper(),
+                )
+            break
+        except IntegrityError:
+            if attempt == JOIN_CODE_ATTEMPTS - 1:
+                raise  # Not a one-in-four-billion collision after all
+    join_group(group, owner)
+    return group
+
+
+def join_group(group, user):
+    """Add a member; their all-time group score starts from their current points."""
+    with transaction.atomic():
+        _, created = GroupMembership.objects.get_or_create(group=group, user=user)
+        if created:
+            points = UserProfile.objects.filter(user=user).values_list('points', flat=True).first() or 0
+            GroupScore.objects.get_or_create(
+                group=group, user=user, period='all', defaults={'points': points},
+            )
+    return created
+
+
+def leave_group(group, user):
+    with transaction.atomic():
+        GroupMembership.objects.filter(group=group, user=user).delete()
+        GroupScore.objects.filter(group=group, user=user).delete()
+
+
+def hand_over_groups(user_id):
+    """
+    Give every group `user_id` owns to its longest-standing other active
+    member, so deleting the owner (StudyGroup.owner cascades) doesn't delete
+    the group. Groups with nobody else in them go with the owner.
+    Returns how many groups changed hands.
+    """
+    moved = 0
+    for group_id in StudyGroup.objects.filter(owner_id=user_id).values_list('id', flat=True):
+        heir = (
+            GroupMembership.objects
+            .filter(group_id=group_id, user__is_active=True)
+            .exclude(user_id=user_id)
+            .order_by('joined_at', 'id')
+            .values_list('user_id', flat=True)
+            .first()
+        )
+        if heir is not None:
+            moved += StudyGroup.objects.filter(pk=group_id).update(owner_id=heir)
+    return moved
+
+
+def leaderboard(group, period='all', limit=BOARD_SIZE):
+    """Top `limit` (rank, username, points) rows, ties share a rank."""
+    rows = list(
+        GroupScore.objects
+        .filter(group=group, period=period_key(period))
+        .order_by('-points', 'user_id')
+        .values_list('user__username', 'points')[:limit]
+    )
+    board = []
+    for position, (username, points) in enumerate(rows, start=1):
+        rank = board[-1][0] if board and board[-1][2] == points else position
+        board.append((rank, username, points))
+    return board
+
+
+def rank_of(group, user, period='all'):
+    """
+    (rank, points) for one member, or None if they have no score yet this
+    period. The rank is None outside the top RANK_COUNT_LIMIT.
+    """
+    key = period_key(period)
+    points = GroupScore.objects.filter(group=group, user=user, period=key).values_list('points', flat=True).first()
+    if points is None:
+        return None
+    ahead = (
+        GroupScore.objects.filter(group=group, period=key, points__gt=points)
+        .values('pk')[:RANK_COUNT_LIMIT].count()
+    )
+    return (ahead + 1 if ahead < RANK_COUNT_LIMIT else None), points
@@ -0,0 +1,168 @@
+"""
+A small job queue kept in the database, for work that shouldn't run inside a
+request or at server start: AI problem generation, deletions, nightly jobs.
+
+    jobs.enqueue('generate_ai_problems', count=10, difficulty='easy')
+
+queues a Job row; `manage.py run_workers --concurrency N` runs N worker
+processes that claim jobs and run them with call_command(). No broker needed.
+
+Claiming: on PostgreSQL a worker takes the oldest due job with
+SELECT ... FOR UPDATE SKIP LOCKED, so workers never wait on each other.
+SQLite has no row locks, but it runs one write at a time, so there a worker
+claims a job with a conditional UPDATE (... WHERE status = 'queued') and only
+owns it if that changed a row.
+
+A job that raises is retried after RETRY_DELAY, doubling each time, until
+it has used max_attempts. A job still 'running' after STALE_AFTER belonged
+to a worker that died, and is put back in the queue. PERIODIC_JOBS in
+settings are queued again by the workers after each run.
+"""
+import io
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+POLL_SECONDS = 1.0  # How long an idle worker waits before looking again
+RETRY_DELAY = timedelta(seconds=30)
+STALE_AFTER = timedelta(hours=2)
+OUTPUT_LIMIT = 20000  # Characters of command output kept on the job
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(command, run_at=None, max_attempts=3, unique=False, **kwargs):
+    """
+    Queue `manage.py <command>` with call_command() keyword options (JSON-able).
+    With unique=True nothing is added if the same call is already waiting.
+    """
+    if unique:
+        for job in Job.objects.filter(command=command, status='queued', periodic=''):
+            if job.kwargs == kwargs:
+                return job
+    return Job.objects.create(
+        command=command, kwargs=kwargs, max_attempts=max_attempts, run_at=run_at or timezone.now(),
+    )
+
+
+def next_run(schedule, now):
+    """When a PERIODIC_JOBS entry runs next: {'every': seconds} or {'at': 'HH:MM'} local time."""
+    if 'every' in schedule:
+        return now + timedelta(seconds=schedule['every'])
+    hour, minute = (int(part) for part in schedule['at'].split(':'))
+    local = timezone.localtime(now)
+    run_at = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= local:
+        run_at += timedelta(days=1)
+    return run_at
+
+
+def schedule_periodic(now=None):
+    """Queue the next run of every PERIODIC_JOBS entry that has none waiting. Returns how many were added."""
+    now = now or timezone.now()
+    waiting = set(
+        Job.objects.filter(status__in=['queued', 'running']).exclude(periodic='').values_list('periodic', flat=True)
+    )
+    added = 0
+    for name, schedule in settings.PERIODIC_JOBS.items():
+        if name in waiting:
+            continue
+        try:
+            with transaction.atomic():
+                Job.objects.create(
+                    command=schedule['command'], kwargs=schedule.get('kwargs', {}), periodic=name,
+                    run_at=next_run(schedule, now),
+                )
+            added += 1
+        except IntegrityError:
+            pass  # Another worker queued it first
+    return added
+
+
+def requeue_stale(now=None):
+    """Put back jobs whose worker died mid-run (or fail them if they're out of attempts)."""
+    now = now or timezone.now()
+    stale = Job.objects.filter(status='running', started_at__lt=now - STALE_AFTER)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, error='Worker stopped while running the job',
+    )
+    return stale.update(status='queued', worker='', run_at=now)
+
+
+def claim(worker, now=None):
+    """Take the oldest due job for `worker`, or None if there's nothing to do."""
+    now = now or timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+    claimed = {'status': 'running', 'worker': worker, 'started_at': now, 'attempts': F('attempts') + 1}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job_id = due.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            Job.objects.filter(pk=job_id).update(**claimed)
+        return Job.objects.get(pk=job_id)
+
+    for job_id in due.values_list('id', flat=True)[:10]:
+        if Job.objects.filter(pk=job_id, status='queued').update(**claimed):
+            return Job.objects.get(pk=job_id)
+    return None  # Nothing due, or other workers took all of it
+
+
+def run(job):
+    """Run a claimed job and record how it went."""
+    output = io.StringIO()
+    try:
+        call_command(job.command, stdout=output, stderr=output, **job.kwargs)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_at = timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+    else:
+        job.status = 'done'
+        job.error = ''
+        job.finished_at = timezone.now()
+    job.output = output.getvalue()[-OUTPUT_LIMIT:]
+    job.save(update_fields=['status', 'run_at', 'finished_at', 'output', 'error'])
+    return job
+
+
+def retry(job):
+    """Queue a failed job again with a fresh set of attempts."""
+    Job.objects.filter(pk=job.pk, status='failed').update(
+        status='queued', attempts=0, run_at=timezone.now(), finished_at=None, error='',
+    )
+
+
+def work(stop, poll=POLL_SECONDS, drain=False):
+    """
+    Worker loop: claim and run jobs until `stop` (a threading/multiprocessing
+    Event) is set, or with drain=True until nothing is due. Returns jobs run.
+    """
+    name = worker_name()
+    count = 0
+    while not stop.is_set():
+        job = claim(name)
+        if job is None:
+            if drain:
+                break
+            stop.wait(poll)
+            continue
+        run(job)
+        count += 1
+    return count
@@ -0,0 +1,151 @@
+"""
+Live leaderboard / daily-challenge counters pushed with Server-Sent Events.
+
+Grading code only flips a "dirty" flag on a feed (publish()). While anyone
+is listening, each feed runs one background task that, at most once every
+MIN_INTERVAL seconds and only if something was published, recomputes the
+payload and wakes every open stream. So a thousand open tabs still cost
+one query per second, and nothing at all when nobody solves anything.
+
+Feeds live in process memory: each server process computes its own
+payloads, which is one aggregate per process per second at worst. Streams
+are async generators, so this needs the ASGI server (daphne / runserver).
+Under WSGI an endless stream would hold a worker for as long as the tab
+is open, so there the view sends snapshot() instead: the current payload
+and a retry delay, after which EventSource reconnects and polls again.
+"""
+import asyncio
+import json
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from . import counters
+from .models import DailyChallenge, UserProfile, points_awarded
+
+MIN_INTERVAL = 1.0  # Seconds between two messages on the same feed
+HEARTBEAT_SECONDS = 15  # Comment line sent when idle so proxies keep the stream open
+LEADERBOARD_SIZE = 100
+
+
+class Feed:
+    def __init__(self, name, compute):
+        self.name = name
+        self.compute = compute  # Sync function returning the JSON-able payload
+        self.dirty = True
+        self.payload = None
+        self.version = 0
+        self.listeners = 0
+        self._updated = None  # asyncio.Event, replaced after every update
+        self._task = None
+
+    def publish(self):
+        """Mark the feed as changed. Safe to call from any thread; costs nothing."""
+        self.dirty = True
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._updated = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        try:
+            while self.listeners:
+                if self.dirty:
+                    self.dirty = False
+                    self.payload = await sync_to_async(self.compute)()
+                    self.version += 1
+                    updated, self._updated = self._updated, asyncio.Event()
+                    updated.set()
+                await asyncio.sleep(MIN_INTERVAL)
+        finally:
+            self.dirty = True  # Nobody kept it up to date, recompute for the next listener
+
+    async def listen(self):
+        """Yield the current payload, then every new one (None as an idle heartbeat)."""
+        self.listeners += 1
+        self._ensure_running()
+        seen = 0
+        try:
+            while True:
+                updated = self._updated
+                if self.version != seen:
+                    seen = self.version
+                    yield self.payload
+                    continue
+                try:
+                    await asyncio.wait_for(updated.wait(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.listeners -= 1
+
+
+def leaderboard_payload():
+    profiles = (
+        UserProfile.objects.select_related('user').filter(user__is_active=True).order_by('-points')[:LEADERBOARD_SIZE]
+    )
+    return {
+        'leaderboard': [
+            {
+                'username': profile.user.username,
+                'points': profile.points,
+                'is_staff': profile.user.is_staff,
+                'joined': profile.user.date_joined.strftime('%b %d, %Y'),
+            }
+            for profile in profiles
+        ],
+    }
+
+
+def daily_payload():
+    today = date.today()  # Same day DailyChallenge.get_today_challenge uses
+    challenge_id = DailyChallenge.objects.filter(date=today).values_list('pk', flat=True).first()
+    completions = 0
+    if challenge_id is not None:
+        # Uncached: this already runs at most once a second, and must show the completion it was woken for
+        completions = counters.total(counters.completions_key(challenge_id), cache_seconds=0)
+    return {'date': today.isoformat(), 'total_completions': completions}
+
+
+FEEDS = {
+    'leaderboard': Feed('leaderboard', leaderboard_payload),
+    'daily': Feed('daily', daily_payload),
+}
+
+
+RETRY_MS = 5000  # EventSource reconnect delay after a dropped stream
+SNAPSHOT_RETRY_MS = 15000  # ...and between two WSGI snapshots
+
+
+def _event(name, payload):
+    return f'event: {name}\ndata: {json.dumps(payload)}\n\n'.encode()
+
+
+async def event_stream(name):
+    """SSE bytes for one browser tab listening to FEEDS[name]."""
+    yield f'retry: {RETRY_MS}\n\n'.encode()
+    async for payload in FEEDS[name].listen():
+        if payload is None:
+            yield b': ping\n\n'
+        else:
+            yield _event(name, payload)
+
+
+def snapshot(name):
+    """SSE bytes with just the current payload of FEEDS[name], for a WSGI worker."""
+    return f'retry: {SNAPSHOT_RETRY_MS}\n\n'.encode() + _event(name, FEEDS[name].compute())
+
+
+@receiver(points_awarded)
+def publish_leaderboard(sender, **kwargs):
+    FEEDS['leaderboard'].publish()
+
+
+@receiver(m2m_changed, sender=DailyChallenge.completed_by.through)
+def publish_daily(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        FEEDS['daily'].publish()
@@ -0,0 +1,80 @@
+"""
+Django management command to seed the spaced-repetition review queues from
+existing submission history.
+Run with: python manage.py backfill_reviews
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from app.models import ReviewItem, Submission
+from app.reviews import apply_answer
+
+
+class Command(BaseCommand):
+    help = 'Builds ReviewItem queues from past wrong (and later right) submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Submissions read per database round-trip (default: 5000)',
+        )
+
+    def handle(self, *args, **kwargs):
+        chunk_size = kwargs['chunk_size']
+
+        # Only (user, problem) pairs with at least one wrong answer can end up
+        # in a queue. Ordering by pair means each pair's history arrives in
+        # one run, so only the current item is held in memory.
+        failed_pairs = Submission.objects.filter(
+            user_id=OuterRef('user_id'), problem_id=OuterRef('problem_id'), was_correct=False,
+        )
+        history = (
+            Submission.objects
+            .filter(Exists(failed_pairs))
+            .order_by('user_id', 'problem_id', 'submitted_at', 'id')
+            .values_list('user_id', 'problem_id', 'was_correct', 'submitted_at')
+            .iterator(chunk_size=chunk_size)
+        )
+
+        pending = []
+        item = None
+        seen = written = 0
+        for user_id, problem_id, was_correct, submitted_at in history:
+            seen += 1
+            if item is None or (item.user_id, item.problem_id) != (user_id, problem_id):
+                if item is not None:
+                    pending.append(item)
+                item = None
+
+            if item is None:
+                if was_correct:
+                    continue  # Right answers before the first wrong one don't schedule anything
+                item = ReviewItem(user_id=user_id, problem_id=problem_id)
+            apply_answer(item, was_correct, submitted_at)
+
+            if len(pending) >= chunk_size:
+                written += self.flush(pending)
+                self.stdout.write(f'  ... {seen} submissions read, {written} review items written')
+
+        if item is not None:
+            pending.append(item)
+        written += self.flush(pending)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Backfilled {written} review items from {seen} submissions'
+        ))
+
+    def flush(self, items):
+        """Upsert a batch, so re-running the backfill is safe."""
+        count = len(items)
+        if items:
+            ReviewItem.objects.bulk_create(
+                items,
+                update_conflicts=True,
+                unique_fields=['user', 'problem'],
+                update_fields=['repetitions', 'interval_days', 'ease', 'lapses', 'due_at', 'last_reviewed_at'],
+            )
+            items.clear()
+        return count
@@ -0,0 +1,72 @@
+"""
+Django management command that counts the queries an authenticated AJAX
+request costs with the old DB session/auth path and with the cached one.
+Run with: python manage.py benchmark_auth_queries
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+CONFIGURATIONS = [
+    ('before: db sessions + ModelBackend', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ('after: cached_db sessions + CachedModelBackend', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': ['app.auth_cache.CachedModelBackend'],
+    }),
+    ('after: signed cookies + CachedModelBackend', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'AUTHENTICATION_BACKENDS': ['app.auth_cache.CachedModelBackend'],
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = 'Measures queries per authenticated request before and after the session/auth cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Number of requests to time per configuration (default: 50)',
+        )
+
+    def handle(self, *args, **kwargs):
+        num_requests = kwargs['requests']
+        # An endpoint that does no DB work of its own, so every query is auth overhead.
+        url = reverse('get_generated_problem_api')
+
+        # Everything happens inside a rolled-back transaction so the benchmark
+        # user and sessions never reach the real database.
+        with transaction.atomic():
+            user = User.objects.create_user(username='__benchmark_auth__', password='Benchmark123')
+
+            for label, overrides in CONFIGURATIONS:
+                with override_settings(ALLOWED_HOSTS=['testserver'], **overrides):
+                    cache.clear()
+                    client = Client()
+                    client.force_login(user)
+                    client.get(url)  # Warm-up request fills the caches
+
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        for _ in range(num_requests):
+                            client.get(url)
+                        elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f'{label:<50} {len(queries) / num_requests:5.2f} queries/request  '
+                    f'{elapsed / num_requests * 1000:6.2f} ms/request'
+                )
+
+            transaction.set_rollback(True)
+        cache.clear()
@@ -0,0 +1,82 @@
+"""
+Django management command that extracts the {% bundle %} blocks from the
+app templates into minified, content-hashed static files.
+Run after editing template CSS/JS with: python manage.py build_bundles
+"""
+import hashlib
+import json
+import re
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+
+from app.templatetags.bundles import BUNDLE_DIR, MANIFEST_PATH, BundleNode
+
+TEMPLATE_DIR = Path(__file__).resolve().parents[2] / 'templates'
+
+
+def minify_css(source):
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    # Only the space after ":" goes; "a :hover" and "a:hover" are different selectors
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    # Line-based on purpose: dropping indentation, blank lines and full-line
+    # comments is safe without a JS parser (strings/regexes stay untouched).
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+MINIFIERS = {'css': minify_css, 'js': minify_js}
+
+
+class Command(BaseCommand):
+    help = 'Builds hashed, minified CSS/JS bundles from {% bundle %} blocks in the templates'
+
+    def handle(self, *args, **kwargs):
+        engine = engines['django']
+        manifest = {}
+
+        BUNDLE_DIR.mkdir(parents=True, exist_ok=True)
+        for path in sorted(TEMPLATE_DIR.rglob('*.html')):
+            template_name = path.relative_to(TEMPLATE_DIR).as_posix()
+            nodelist = engine.get_template(template_name).template.nodelist
+
+            for node in nodelist.get_nodes_by_type(BundleNode):
+                if node.source is None:
+                    self.stdout.write(self.style.WARNING(
+                        f'Skipping {node.name} in {template_name}: block contains template tags'
+                    ))
+                    continue
+                if node.name in manifest:
+                    raise CommandError(f'Bundle name "{node.name}" is used more than once ({template_name})')
+
+                content = MINIFIERS[node.kind](node.source)
+                content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+                stem = node.name.rsplit('.', 1)[0]
+                filename = f'{stem}.{content_hash}.{node.kind}'
+                (BUNDLE_DIR / filename).write_text(content, encoding='utf-8')
+
+                manifest[node.name] = {'file': filename, 'source': node.digest}
+                self.stdout.write(
+                    f'  {node.name:<28} -> {filename} '
+                    f'({len(node.source.encode()) // 1024} KB -> {len(content.encode()) // 1024} KB)'
+                )
+
+        # Remove bundles from previous builds that nothing points to anymore
+        current = {entry['file'] for entry in manifest.values()}
+        for stale in BUNDLE_DIR.glob('*.*'):
+            if stale.suffix in ('.css', '.js') and stale.name not in current:
+                stale.unlink()
+
+        MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'✅ Built {len(manifest)} bundles into {BUNDLE_DIR}'))
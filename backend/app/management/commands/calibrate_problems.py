@@ -0,0 +1,190 @@
+"""
+Django management command that calibrates problem difficulty and points from
+submission history with a vectorised IRT fit (see app/calibration.py).
+Run with: python manage.py calibrate_problems [--incremental]
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from app import calibration
+from app.models import CalibrationRun, Problem, ProblemCalibration, Submission, UserCalibration
+
+# Keeps "IN (...)" lists under SQLite's bound-parameter limit
+LOOKUP_BATCH_SIZE = 500
+WRITE_BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = 'Calibrates Problem difficulty and suggested points from Submission history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only read submissions newer than the last run and update the estimates in place',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100000,
+            help='Submission rows fetched per round-trip (default: 100000)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=25,
+            help='Fitting iterations for a full run (default: 25)',
+        )
+        parser.add_argument(
+            '--min-attempts',
+            type=int,
+            default=20,
+            help='Attempts a problem needs before its calibration is written to Problem (default: 20)',
+        )
+
+    def handle(self, *args, **kwargs):
+        started_at = timezone.now()
+        clock = time.perf_counter()
+
+        last_run = CalibrationRun.objects.first()
+        incremental = kwargs['incremental']
+        if incremental and last_run is None:
+            self.stdout.write(self.style.WARNING('No previous calibration run, doing a full run instead.'))
+            incremental = False
+        since = last_run.last_submission_id if incremental else 0
+
+        last_id, user_ids, problem_ids, correct = self.read_submissions(since, kwargs['chunk_size'])
+        self.stdout.write(f'📥 Read {len(correct)} submissions in {time.perf_counter() - clock:.1f}s')
+        if not len(correct):
+            self.stdout.write(self.style.SUCCESS('✅ Nothing new to calibrate.'))
+            return
+
+        user_keys, users = np.unique(user_ids, return_inverse=True)
+        problem_keys, problems = np.unique(problem_ids, return_inverse=True)
+
+        if incremental:
+            user_stats = self.load_stats(UserCalibration, 'user_id', 'ability', user_keys)
+            problem_stats = self.load_stats(ProblemCalibration, 'problem_id', 'difficulty', problem_keys)
+            ability, user_information, difficulty, problem_information = calibration.update_rasch(
+                users, problems, correct,
+                user_stats['estimate'], user_stats['information'],
+                problem_stats['estimate'], problem_stats['information'],
+            )
+            user_attempts, user_correct = user_stats['attempts'], user_stats['correct']
+            problem_attempts, problem_correct = problem_stats['attempts'], problem_stats['correct']
+        else:
+            ability, user_information, difficulty, problem_information = calibration.fit_rasch(
+                users, problems, correct, len(user_keys), len(problem_keys), kwargs['iterations'],
+            )
+            user_attempts = np.zeros(len(user_keys), dtype=np.int64)
+            user_correct = np.zeros(len(user_keys), dtype=np.int64)
+            problem_attempts = np.zeros(len(problem_keys), dtype=np.int64)
+            problem_correct = np.zeros(len(problem_keys), dtype=np.int64)
+
+        user_attempts = user_attempts + np.bincount(users, minlength=len(user_keys))
+        user_correct = user_correct + np.bincount(users, correct, len(user_keys)).astype(np.int64)
+        problem_attempts = problem_attempts + np.bincount(problems, minlength=len(problem_keys))
+        problem_correct = problem_correct + np.bincount(problems, correct, len(problem_keys)).astype(np.int64)
+        self.stdout.write(f'🧮 Fitted {len(user_keys)} users / {len(problem_keys)} problems '
+                          f'({time.perf_counter() - clock:.1f}s)')
+
+        with transaction.atomic():
+            self.save_stats(
+                UserCalibration, 'user_id', 'ability',
+                user_keys, user_attempts, user_correct, ability, user_information,
+            )
+            self.save_stats(
+                ProblemCalibration, 'problem_id', 'difficulty',
+                problem_keys, problem_attempts, problem_correct, difficulty, problem_information,
+            )
+            updated = self.write_back(
+                problem_keys, problem_attempts, difficulty, kwargs['min_attempts'],
+            )
+            CalibrationRun.objects.create(
+                mode='incremental' if incremental else 'full',
+                last_submission_id=last_id,
+                rows_read=len(correct),
+                problems_updated=updated,
+                started_at=started_at,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Calibrated {updated} problems in {time.perf_counter() - clock:.1f}s '
+            f'(up to submission #{last_id})'
+        ))
+
+    def read_submissions(self, since, chunk_size):
+        """Stream (id, user, problem, correct) rows after `since` into NumPy arrays."""
+        table = Submission._meta.db_table
+        chunks = []
+        # chunked_cursor() is a server-side cursor where the backend supports it
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(
+                f'SELECT id, user_id, problem_id, was_correct FROM {table} WHERE id > %s ORDER BY id',
+                [since],
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                chunks.append(np.array(rows, dtype=np.int64))
+
+        if not chunks:
+            empty = np.zeros(0, dtype=np.int64)
+            return since, empty, empty, empty
+        data = np.concatenate(chunks)
+        return int(data[-1, 0]), data[:, 1], data[:, 2], data[:, 3]
+
+    def load_stats(self, model, key_field, estimate_field, keys):
+        """Stored stats for `keys` as arrays aligned with them (new keys start at the prior)."""
+        position = {key: i for i, key in enumerate(keys.tolist())}
+        stats = {
+            'attempts': np.zeros(len(keys), dtype=np.int64),
+            'correct': np.zeros(len(keys), dtype=np.int64),
+            'estimate': np.zeros(len(keys)),
+            'information': np.full(len(keys), 1.0 / calibration.PRIOR_VARIANCE),
+        }
+        fields = (key_field, 'attempts', 'correct', estimate_field, 'information')
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + LOOKUP_BATCH_SIZE].tolist()
+            rows = model.objects.filter(**{f'{key_field}__in': batch}).values_list(*fields)
+            for key, attempts, correct, estimate, information in rows:
+                i = position[key]
+                stats['attempts'][i] = attempts
+                stats['correct'][i] = correct
+                stats['estimate'][i] = estimate
+                stats['information'][i] = information
+        return stats
+
+    def save_stats(self, model, key_field, estimate_field, keys, attempts, correct, estimate, information):
+        rows = zip(keys.tolist(), attempts.tolist(), correct.tolist(), estimate.tolist(), information.tolist())
+        objects = [
+            model(**{key_field: key, 'attempts': a, 'correct': c, estimate_field: e, 'information': i})
+            for key, a, c, e, i in rows
+        ]
+        model.objects.bulk_create(
+            objects,
+            batch_size=WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=[key_field.removesuffix('_id')],
+            update_fields=['attempts', 'correct', estimate_field, 'information'],
+        )
+
+    def write_back(self, problem_keys, attempts, difficulty, min_attempts):
+        """Copy trusted estimates onto Problem.calibrated_difficulty / suggested_points."""
+        trusted = attempts >= min_attempts
+        points = calibration.suggested_points(difficulty[trusted])
+        problems = [
+            Problem(id=problem_id, calibrated_difficulty=b, suggested_points=pts)
+            for problem_id, b, pts in zip(
+                problem_keys[trusted].tolist(), difficulty[trusted].tolist(), points.tolist()
+            )
+        ]
+        Problem.objects.bulk_update(
+            problems, ['calibrated_difficulty', 'suggested_points'], batch_size=WRITE_BATCH_SIZE,
+        )
+        return len(problems)
@@ -18,11 +18,11 @@ class Command(BaseCommand):
             return
         
         # Get a random hard problem
-        hard_problems = Problem.objects.filter(difficulty='hard')
+        hard_problems = Problem.objects.filter(difficulty='hard', is_quarantined=False, deleted_at__isnull=True)
         
         if not hard_problems.exists():
             # Fallback to any difficulty
-            hard_problems = Problem.objects.all()
+            hard_problems = Problem.objects.filter(is_quarantined=False, deleted_at__isnull=True)
         
         if not hard_problems.exists():
             self.stdout.write(
@@ -18,11 +18,11 @@ class Command(BaseCommand):
         today = datetime.date.today()
         
         # Get all hard problems once to avoid re-querying in loop
-        hard_problems = list(Problem.objects.filter(difficulty='hard'))
+        hard_problems = list(Problem.objects.filter(difficulty='hard', is_quarantined=False, deleted_at__isnull=True))
         
         if not hard_problems:
             # Fallback to any difficulty
-            hard_problems = list(Problem.objects.all())
+            hard_problems = list(Problem.objects.filter(is_quarantined=False, deleted_at__isnull=True))
         
         if not hard_problems:
             self.stdout.write(
@@ -0,0 +1,53 @@
+"""
+Django management command that streams a dataset to a file (or stdout) as
+CSV, gzip-compressed NDJSON or Parquet. See app/exports.py.
+Run with: python manage.py export_data submissions --format ndjson --output subs.ndjson.gz
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import exports
+
+
+class Command(BaseCommand):
+    help = 'Exports submissions, profiles, progress or speed runs without loading them all into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(exports.DATASETS))
+        parser.add_argument('--format', choices=list(exports.FORMATS), default='csv')
+        parser.add_argument(
+            '--output',
+            help='File to write (default: stdout)',
+        )
+        parser.add_argument('--from', dest='date_from', help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--category', help='Problem category (submissions only)')
+        parser.add_argument('--users', help='Comma-separated usernames')
+
+
+    def handle(self, *args, **kwargs):
+        users = [name.strip() for name in (kwargs['users'] or '').split(',') if name.strip()]
+        try:
+            content = exports.stream_export(
+                kwargs['dataset'], kwargs['format'],
+                date_from=exports.parse_day(kwargs['date_from']),
+                date_to=exports.parse_day(kwargs['date_to']),
+                category=kwargs['category'],
+                users=users,
+            )
+        except exports.ExportError as e:
+            raise CommandError(str(e))
+
+        output = open(kwargs['output'], 'wb') if kwargs['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for data in content:
+                output.write(data)
+                written += len(data)
+        finally:
+            if kwargs['output']:
+                output.close()
+
+        if kwargs['output']:
+            self.stdout.write(self.style.SUCCESS(f'✅ Wrote {written} bytes to {kwargs["output"]}'))
@@ -0,0 +1,59 @@
+"""
+Django management command that finishes deletions queued from the dashboard
+(see app/deletions.py).
+Queued by the delete buttons and every few minutes (PERIODIC_JOBS), or by hand:
+python manage.py process_deletions --max-seconds 240
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import deletions
+from app.models import PendingDeletion
+
+
+class Command(BaseCommand):
+    help = 'Removes queued users/problems and their rows in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=deletions.BATCH_SIZE,
+            help=f'Rows per DELETE statement (default: {deletions.BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--max-seconds',
+            type=float,
+            default=None,
+            help='Stop after about this long; unfinished deletions resume on the next run',
+        )
+
+    def handle(self, *args, **kwargs):
+        deadline = None
+        if kwargs['max_seconds'] is not None:
+            deadline = time.monotonic() + kwargs['max_seconds']
+
+        queue = PendingDeletion.objects.filter(finished_at__isnull=True).order_by('requested_at')
+        finished = 0
+        for deletion in queue:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            self.stdout.write(f'🗑️  Deleting {deletion.kind} "{deletion.label}" (#{deletion.object_id})...')
+            try:
+                done = deletions.process(deletion, kwargs['batch_size'], deadline)
+            except Exception as e:
+                # Keep going with the others; this one is retried next run
+                deletion.error = str(e)
+                deletion.save(update_fields=['error'])
+                self.stdout.write(self.style.ERROR(f'❌ {e}'))
+                continue
+            if not done:
+                self.stdout.write(self.style.WARNING(
+                    f'⏸️  Out of time at "{deletion.current_step}" ({deletion.rows_deleted} rows so far)'
+                ))
+                break
+            finished += 1
+            self.stdout.write(f'   {deletion.rows_deleted} rows removed')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Finished {finished} deletions'))
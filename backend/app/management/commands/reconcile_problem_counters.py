@@ -0,0 +1,58 @@
+"""
+Django management command that recounts every problem's attempt_count,
+solve_count and unique_solvers, and the completions of the last few daily
+challenges (see app/counters.py), and fixes the ones that drifted.
+Runs every night from PERIODIC_JOBS, or by hand:
+python manage.py reconcile_problem_counters [--batch-size 500]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import counters
+from app.models import DailyChallenge, Problem
+
+BATCH_SIZE = 500
+RECENT_CHALLENGES = 3  # Older completion counts aren't shown anywhere
+
+
+class Command(BaseCommand):
+    help = 'Recounts the per-problem attempt/solve counters and challenge completions, and repairs any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Problems recounted (and locked) at a time (default: {BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **kwargs):
+        clock = time.perf_counter()
+        batch_size = kwargs['batch_size']
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            # Keyset pagination: each batch is an index range scan, however far in
+            ids = list(Problem.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+            drift = counters.reconcile(ids)
+            fixed += len(drift)
+            for problem_id, fields in drift.items():
+                changes = ', '.join(f'{field} {stored} -> {actual}' for field, (stored, actual) in fields.items())
+                self.stdout.write(f'🔧 Problem #{problem_id}: {changes}')
+
+        challenges = list(DailyChallenge.objects.order_by('-date')[:RECENT_CHALLENGES])
+        for challenge in challenges:
+            drift = counters.reconcile_completions(challenge)
+            if drift:
+                fixed += 1
+                self.stdout.write(f'🔧 Daily challenge {challenge.date}: completions {drift[0]} -> {drift[1]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Checked {checked} problems and {len(challenges)} challenges, fixed {fixed} '
+            f'({time.perf_counter() - clock:.1f}s)'
+        ))
@@ -0,0 +1,254 @@
+"""
+Django management command that plays traffic recorded by
+app.traffic.TrafficCaptureMiddleware back against a running server, keeping
+the original timing (optionally sped up), and reports latencies per endpoint.
+Run with: python manage.py replay_traffic --base-url http://127.0.0.1:8000 --speed 5 --concurrency 16
+
+Every recorded user bucket ("student:17") gets its own replay user
+(replay-student-17) and session. The sessions are created in this project's
+database, so point it at a server that uses the same one - a local copy, not
+production. Logouts, logins, signups, form posts and the live streams aren't
+replayed (they'd change accounts or never finish).
+"""
+import http.client
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.utils.crypto import get_random_string
+
+from app import traffic
+
+SKIP_VIEWS = {'logout', 'login', 'signup', 'live_events'}
+MAX_SPEED = 20
+STRING_SHAPE = re.compile(r'^<str:(\d+)>$')
+
+
+def materialize(shape):
+    """Turn a recorded body shape back into a body: every "<str:N>" becomes N digits."""
+    if isinstance(shape, dict):
+        return {key: materialize(value) for key, value in shape.items()}
+    if isinstance(shape, list):
+        return [materialize(value) for value in shape]
+    if isinstance(shape, str):
+        match = STRING_SHAPE.match(shape)
+        if match:
+            return '1' * int(match.group(1))
+    return shape
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class NoRedirects(urllib.request.HTTPRedirectHandler):
+    """The recorded status is the redirect itself, so don't follow it."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Replays recorded traffic against a running server and reports latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files',
+            nargs='*',
+            help='Trace files to replay (default: everything in TRAFFIC_DIR)',
+        )
+        parser.add_argument(
+            '--base-url',
+            default='http://127.0.0.1:8000',
+            help='Server to send the requests to (default: http://127.0.0.1:8000)',
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=1.0,
+            help=f'Replay speed, 1 to {MAX_SPEED} times the recorded rate (default: 1)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Requests in flight at once (default: 8)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Only replay the first N requests',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30.0,
+            help='Seconds before a request counts as failed (default: 30)',
+        )
+
+    def handle(self, *args, **kwargs):
+        speed = kwargs['speed']
+        if not 1 <= speed <= MAX_SPEED:
+            raise CommandError(f'--speed must be between 1 and {MAX_SPEED}')
+        if kwargs['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+
+        files = kwargs['files'] or traffic.trace_files()
+        if not files:
+            raise CommandError(f'No traces in {settings.TRAFFIC_DIR}. Record some with PBMATE_TRAFFIC_CAPTURE=1.')
+        lines, skipped = self.replayable(traffic.read(files))
+        if kwargs['limit']:
+            lines = lines[:kwargs['limit']]
+        if not lines:
+            raise CommandError('Nothing to replay')
+        for reason, count in skipped.items():
+            self.stdout.write(f'⏭️  Skipping {count} {reason}')
+
+        self.base_url = kwargs['base_url'].rstrip('/')
+        self.timeout = kwargs['timeout']
+        self.opener = urllib.request.build_opener(NoRedirects)
+        self.sessions = self.log_in({line['user'] for line in lines})
+
+        span = (lines[-1]['t'] - lines[0]['t']) / speed
+        self.stdout.write(
+            f'▶️  Replaying {len(lines)} requests from {len(files)} files at {speed:g}x '
+            f'(~{span:.0f}s) with {kwargs["concurrency"]} in flight...'
+        )
+        results = self.replay(lines, speed, kwargs['concurrency'])
+        self.report(lines, results)
+
+    def replayable(self, lines):
+        kept, skipped = [], Counter()
+        for line in lines:
+            if line['view'] in SKIP_VIEWS:
+                skipped[f'{line["view"]} requests'] += 1
+            elif line.get('form') or line['method'] not in ('GET', 'POST'):
+                skipped['form posts'] += 1
+            else:
+                kept.append(line)
+        return kept, skipped
+
+    def log_in(self, buckets):
+        """{bucket: (session cookie, csrf token)}, with a replay user per bucket."""
+        sessions = {'anonymous': (None, get_random_string(32))}
+        for bucket in sorted(buckets - {'anonymous'}):
+            role, number = bucket.split(':')
+            user, created = User.objects.get_or_create(
+                username=f'replay-{role}-{number}',
+                defaults={'email': f'replay-{role}-{number}@example.com', 'is_staff': role == 'staff'},
+            )
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=['password'])
+            client = Client()
+            client.force_login(user)  # Creates the session the same way login() would
+            sessions[bucket] = (client.cookies[settings.SESSION_COOKIE_NAME].value, get_random_string(32))
+        self.stdout.write(f'👥 {len(sessions) - 1} replay users logged in')
+        return sessions
+
+    def replay(self, lines, speed, concurrency):
+        """Send every line at its (scaled) recorded time. Returns [(view, status, ms, lag ms)]."""
+        results = []
+        results_lock = threading.Lock()
+        slots = threading.Semaphore(concurrency * 4)  # Bounded backlog when the server can't keep up
+        first = lines[0]['t']
+        start = time.monotonic()
+
+        def send(line, due):
+            try:
+                lag_ms = (time.monotonic() - due) * 1000
+                status, ms = self.send(line)
+                with results_lock:
+                    results.append((line['view'], status, ms, lag_ms))
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for line in lines:
+                due = start + (line['t'] - first) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                slots.acquire()
+                pool.submit(send, line, due)
+        return results
+
+    def send(self, line):
+        """(status code or 'error', milliseconds) for one request."""
+        session, csrf = self.sessions[line['user']]
+        cookies = [f'{settings.CSRF_COOKIE_NAME}={csrf}']
+        if session:
+            cookies.append(f'{settings.SESSION_COOKIE_NAME}={session}')
+        headers = {'Cookie': '; '.join(cookies), 'X-CSRFToken': csrf, 'X-Traffic-Replay': '1'}
+
+        url = self.base_url + line['path']
+        if line['query']:
+            url += '?' + urllib.parse.urlencode(line['query'])
+        data = None
+        if line['method'] == 'POST':
+            data = json.dumps(materialize(line['body'])).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(url, data=data, headers=headers, method=line['method'])
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code  # 3xx/4xx/5xx all land here
+        except (urllib.error.URLError, http.client.HTTPException, OSError):
+            status = 'error'
+        return status, (time.perf_counter() - start) * 1000
+
+    def report(self, lines, results):
+        recorded = defaultdict(list)
+        for line in lines:
+            recorded[line['view']].append(line['ms'])
+        by_view = defaultdict(list)
+        statuses = defaultdict(Counter)
+        for view, status, ms, _ in results:
+            by_view[view].append(ms)
+            statuses[view][status] += 1
+
+        header = f'{"endpoint":<28} {"reqs":>6} {"errors":>6} {"p50":>8} {"p90":>8} {"p99":>8} {"max":>8} {"was p50":>8}'
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for view, times in sorted(by_view.items(), key=lambda item: -len(item[1])):
+            times.sort()
+            errors = sum(count for status, count in statuses[view].items() if status == 'error' or status >= 500)
+            was = percentile(sorted(recorded[view]), 0.5)
+            self.stdout.write(
+                f'{view:<28} {len(times):>6} {errors:>6} {percentile(times, 0.5):>6.1f}ms '
+                f'{percentile(times, 0.9):>6.1f}ms {percentile(times, 0.99):>6.1f}ms {times[-1]:>6.1f}ms {was:>6.1f}ms'
+            )
+
+        all_statuses = Counter()
+        for counts in statuses.values():
+            all_statuses.update(counts)
+        lags = sorted(lag for *_, lag in results)
+        self.stdout.write('')
+        self.stdout.write('📊 Status codes: ' + ', '.join(
+            f'{status}: {count}' for status, count in sorted(all_statuses.items(), key=lambda item: str(item[0]))
+        ))
+        self.stdout.write(f'⏱️  Sent late by p50 {percentile(lags, 0.5):.0f}ms, max {lags[-1]:.0f}ms '
+                          f'(high values mean --concurrency is too low for this speed)')
+        failed = sum(count for status, count in all_statuses.items() if status == 'error' or status >= 500)
+        if failed:
+            self.stdout.write(self.style.ERROR(f'⚠️  Replayed {len(results)} requests, {failed} failed'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ Replayed {len(results)} requests'))
@@ -0,0 +1,102 @@
+"""
+Django management command that runs queued jobs (see app/jobs.py).
+Run with: python manage.py run_workers --concurrency 4
+Or, from cron / by hand: python manage.py run_workers --once
+"""
+import multiprocessing
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app import jobs
+
+SCHEDULER_SECONDS = 10  # How often the main process queues periodic jobs and checks for dead workers
+
+
+def worker_process(stop, poll):
+    # Each forked worker opens its own database connection on first use
+    connections.close_all()
+    # The main process decides when to stop (Ctrl+C / kill reach the whole process group)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        jobs.work(stop, poll)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=2,
+            help='Worker processes (default: 2)',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=jobs.POLL_SECONDS,
+            help=f'Seconds an idle worker waits before checking again (default: {jobs.POLL_SECONDS})',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run every job that is due in this process, then exit',
+        )
+
+    def handle(self, *args, **kwargs):
+        jobs.requeue_stale()
+        added = jobs.schedule_periodic()
+        if added:
+            self.stdout.write(f'🗓️  Scheduled {added} periodic jobs')
+
+        if kwargs['once']:
+            count = jobs.work(threading.Event(), drain=True)
+            self.stdout.write(self.style.SUCCESS(f'✅ Ran {count} jobs'))
+            return
+
+        if kwargs['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('Worker processes need fork(); use --once on this platform')
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+
+        def start_worker():
+            connections.close_all()  # Don't share the main process's connection with the child
+            process = context.Process(target=worker_process, args=(stop, kwargs['poll']))
+            process.start()
+            return process
+
+        workers = [start_worker() for _ in range(kwargs['concurrency'])]
+        self.stdout.write(self.style.SUCCESS(f'👷 Started {len(workers)} workers'))
+
+        # Only set a flag in the handler: stop.set() there could deadlock with stop.wait()
+        stopping = []
+        signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+        next_tick = time.monotonic() + SCHEDULER_SECONDS
+        while not stopping:
+            time.sleep(0.5)
+            if time.monotonic() < next_tick:
+                continue
+            next_tick = time.monotonic() + SCHEDULER_SECONDS
+            jobs.requeue_stale()
+            jobs.schedule_periodic()
+            for i, process in enumerate(workers):
+                if not process.is_alive():
+                    self.stdout.write(self.style.WARNING(f'⚠️  Worker {process.pid} died, starting a new one'))
+                    workers[i] = start_worker()
+
+        self.stdout.write('🛑 Stopping after the current jobs...')
+        stop.set()
+        for process in workers:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('✅ All workers stopped'))
@@ -0,0 +1,52 @@
+"""
+Django management command that brings the hourly/daily submission rollups
+(see app/rollups.py) up to date, or rebuilds them from the first submission.
+Runs every few minutes from PERIODIC_JOBS, or by hand:
+python manage.py update_rollups [--rebuild] [--chunk-days 7]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import rollups
+from app.models import Submission, SubmissionRollup
+
+
+class Command(BaseCommand):
+    help = 'Updates the submission rollups used by the analytics charts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute all of history instead of just the days since the last run',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=rollups.CHUNK_DAYS,
+            help=f'Days of submissions per chunk (default: {rollups.CHUNK_DAYS})',
+        )
+
+    def handle(self, *args, **kwargs):
+        clock = time.perf_counter()
+        since = None
+        if kwargs['rebuild']:
+            first = Submission.objects.order_by('submitted_at').values_list('submitted_at', flat=True).first()
+            if first is None:
+                SubmissionRollup.objects.all().delete()
+                self.stdout.write(self.style.SUCCESS('✅ No submissions yet, nothing to roll up.'))
+                return
+            # Rows from before the first submission can only be leftovers of deleted history
+            SubmissionRollup.objects.filter(start__lt=rollups.day_start(first)).delete()
+            since = first
+
+        chunks = rows = 0
+        for start, end, written in rollups.catch_up(since, kwargs['chunk_days']):
+            chunks += 1
+            rows += written
+            self.stdout.write(f'📊 {start:%Y-%m-%d} - {end:%Y-%m-%d}: {written} rollup rows')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Wrote {rows} rollup rows in {chunks} chunks ({time.perf_counter() - clock:.1f}s)'
+        ))
@@ -0,0 +1,93 @@
+"""
+Django management command to keep daily-challenge streaks honest.
+Run nightly with: python manage.py update_streaks
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from app.models import DailyChallenge, UserProfile
+
+
+# Turns a DATE column into a plain day number so consecutive days differ by 1.
+DAY_NUMBER_SQL = {
+    'sqlite': 'CAST(julianday({column}) AS INTEGER)',
+    'postgresql': "({column} - DATE '2000-01-01')",
+}
+
+# Gaps-and-islands: within one user's completed days, "day number - row number"
+# is constant along a run of consecutive days. The most recent island is the
+# user's streak, as long as it reaches yesterday or today.
+REBUILD_SQL = """
+WITH days AS (
+    SELECT cb.user_id AS user_id,
+           dc.date AS day,
+           {day_number} - ROW_NUMBER() OVER (PARTITION BY cb.user_id ORDER BY dc.date) AS island
+    FROM {completed_by} cb
+    JOIN {challenge} dc ON dc.id = cb.dailychallenge_id
+    WHERE dc.date <= %s
+),
+islands AS (
+    SELECT user_id,
+           COUNT(*) AS length,
+           MAX(day) AS last_day,
+           ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY MAX(day) DESC) AS recency
+    FROM days
+    GROUP BY user_id, island
+)
+UPDATE {profile} SET
+    current_streak = CASE WHEN islands.last_day >= %s THEN islands.length ELSE 0 END,
+    last_daily_challenge_date = islands.last_day
+FROM islands
+WHERE islands.user_id = {profile}.user_id AND islands.recency = 1
+"""
+
+
+class Command(BaseCommand):
+    help = 'Resets lapsed daily-challenge streaks and optionally rebuilds them from history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute every streak from DailyChallenge completions before resetting lapsed ones',
+        )
+        parser.add_argument(
+            '--date',
+            type=datetime.date.fromisoformat,
+            default=None,
+            help='Treat this day (YYYY-MM-DD) as today (default: today)',
+        )
+
+    def handle(self, *args, **kwargs):
+        today = kwargs['date'] or datetime.date.today()
+        yesterday = today - datetime.timedelta(days=1)
+
+        with transaction.atomic():
+            if kwargs['rebuild']:
+                self.rebuild_streaks(today, yesterday)
+                self.stdout.write('🔁 Rebuilt streaks from daily challenge history')
+
+            # A streak survives while the last completion was yesterday or today.
+            reset = UserProfile.objects.filter(current_streak__gt=0).filter(
+                Q(last_daily_challenge_date__lt=yesterday) | Q(last_daily_challenge_date__isnull=True)
+            ).update(current_streak=0)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Reset {reset} lapsed streaks (as of {today})'))
+
+    def rebuild_streaks(self, today, yesterday):
+        """Set current_streak/last_daily_challenge_date from completions in one statement."""
+        day_number = DAY_NUMBER_SQL.get(connection.vendor)
+        if day_number is None:
+            raise CommandError(f'--rebuild is not supported on the {connection.vendor} backend')
+
+        sql = REBUILD_SQL.format(
+            day_number=day_number.format(column='dc.date'),
+            completed_by=DailyChallenge.completed_by.through._meta.db_table,
+            challenge=DailyChallenge._meta.db_table,
+            profile=UserProfile._meta.db_table,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [today, yesterday])
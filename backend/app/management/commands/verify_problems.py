@@ -0,0 +1,150 @@
+"""
+Django management command that checks every Problem's stored answer against
+the answer worked out from its question (see app/expressions.py), using a
+pool of worker processes.
+Run with: python manage.py verify_problems [--quarantine] [--report wrong.csv]
+"""
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from app import cache_versions, expressions
+from app.models import Problem
+
+UPDATE_BATCH_SIZE = 500
+
+
+def check_chunk(rows):
+    """
+    Worker: verify (id, question, answer) rows. Returns (counts, problems, ok_ids) where
+    problems lists (id, status, question, stored answer, expected answer) for every
+    checkable row that isn't right. Plain data in and out, so it pickles cheaply.
+    """
+    counts = {'ok': 0, 'mismatch': 0, 'bad_answer': 0, 'unverifiable': 0}
+    problems = []
+    ok_ids = []
+    for problem_id, question, answer in rows:
+        try:
+            expected = expressions.solve_question(question)
+        except expressions.ExpressionError:
+            counts['unverifiable'] += 1  # Word problems etc.
+            continue
+        try:
+            status = 'ok' if expressions.evaluate(answer) == expected else 'mismatch'
+        except expressions.ExpressionError:
+            status = 'bad_answer'  # The question is checkable but the stored answer isn't a number
+        counts[status] += 1
+        if status == 'ok':
+            ok_ids.append(problem_id)
+        else:
+            problems.append((problem_id, status, question, answer, expressions.format_number(expected)))
+    return counts, problems, ok_ids
+
+
+class Command(BaseCommand):
+    help = 'Checks Problem answers against their questions and reports (or quarantines) wrong keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quarantine',
+            action='store_true',
+            help='Flag problems with wrong answers (and unflag ones that are now right)',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write every wrong problem to this CSV file',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (default: one per CPU; 1 runs in this process)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Problems per worker task (default: 5000)',
+        )
+
+    def handle(self, *args, **kwargs):
+        clock = time.perf_counter()
+        totals = {'ok': 0, 'mismatch': 0, 'bad_answer': 0, 'unverifiable': 0}
+        wrong = []  # (id, status, question, answer, expected)
+        ok_ids = []  # Checked and right, so --quarantine can release them
+
+        for counts, problems, chunk_ok_ids in self.run(kwargs['workers'], kwargs['chunk_size']):
+            for status, count in counts.items():
+                totals[status] += count
+            wrong += problems
+            ok_ids += chunk_ok_ids
+
+        for problem_id, status, question, answer, expected in wrong[:20]:
+            self.stdout.write(self.style.WARNING(
+                f'  #{problem_id} {question!r}: stored {answer!r}, expected {expected} ({status})'
+            ))
+        if len(wrong) > 20:
+            self.stdout.write(f'  ... and {len(wrong) - 20} more')
+
+        if kwargs['report']:
+            with open(kwargs['report'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['id', 'status', 'question', 'stored_answer', 'expected_answer'])
+                writer.writerows(wrong)
+            self.stdout.write(f'📝 Report written to {kwargs["report"]}')
+
+        if kwargs['quarantine']:
+            flagged = self.set_quarantine([row[0] for row in wrong], True)
+            released = self.set_quarantine(ok_ids, False)
+            if flagged or released:
+                # update() sends no signals; the shared counter makes every web process drop its catalog pages
+                cache_versions.bump_version('catalog')
+            self.stdout.write(f'🚧 Quarantined {flagged} problems, released {released}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Checked {sum(totals.values())} problems in {time.perf_counter() - clock:.1f}s: '
+            f'{totals["ok"]} ok, {totals["mismatch"]} wrong answers, '
+            f'{totals["bad_answer"]} unreadable answers, {totals["unverifiable"]} not checkable'
+        ))
+
+    def chunks(self, chunk_size):
+        rows = Problem.objects.order_by('id').values_list('id', 'question', 'answer').iterator(chunk_size=chunk_size)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, workers, chunk_size):
+        """Yield check_chunk() results chunk by chunk, with at most 2 chunks per worker in flight."""
+        if workers <= 1:
+            for chunk in self.chunks(chunk_size):
+                yield check_chunk(chunk)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in self.chunks(chunk_size):
+                pending.append(pool.submit(check_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def set_quarantine(self, ids, value):
+        updated = 0
+        for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+            updated += (
+                Problem.objects
+                .filter(id__in=ids[start:start + UPDATE_BATCH_SIZE])
+                .exclude(is_quarantined=value)
+                .update(is_quarantined=value)
+            )
+        return updated
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_mapcheckpoint_userprogress'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='last_daily_challenge_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+DIFFICULTY_RATINGS = {'easy': 800.0, 'medium': 1000.0, 'hard': 1200.0}
+RATING_BUCKET_WIDTH = 50
+
+
+def seed_problem_ratings(apps, schema_editor):
+    """Start existing problems at the rating matching their hand-set difficulty."""
+    Problem = apps.get_model('app', 'Problem')
+    for difficulty, rating in DIFFICULTY_RATINGS.items():
+        Problem.objects.filter(difficulty__iexact=difficulty).update(
+            rating=rating, rating_bucket=int(rating // RATING_BUCKET_WIDTH)
+        )
+    Problem.objects.filter(rating__isnull=True).update(
+        rating=1000.0, rating_bucket=int(1000.0 // RATING_BUCKET_WIDTH)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_userprofile_last_daily_challenge_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('arithmetic', 'Arithmetic'), ('algebra', 'Algebra'), ('fractions', 'Fractions')], max_length=50)),
+                ('rating', models.FloatField(default=1000.0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='rating',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='rating_bucket',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['category', 'rating_bucket', 'id'], name='problem_category_bucket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['rating_bucket', 'id'], name='problem_bucket_idx'),
+        ),
+        migrations.AddField(
+            model_name='skillrating',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_ratings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='skillrating',
+            unique_together={('user', 'category')},
+        ),
+        migrations.RunPython(seed_problem_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_reviewitem'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalibrationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('full', 'Full'), ('incremental', 'Incremental')], max_length=20)),
+                ('last_submission_id', models.BigIntegerField(default=0)),
+                ('rows_read', models.BigIntegerField(default=0)),
+                ('problems_updated', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-finished_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProblemCalibration',
+            fields=[
+                ('problem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calibration', serialize=False, to='app.problem')),
+                ('attempts', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('difficulty', models.FloatField(default=0.0)),
+                ('information', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserCalibration',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calibration', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('attempts', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('ability', models.FloatField(default=0.0)),
+                ('information', models.FloatField(default=0.0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='calibrated_difficulty',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='suggested_points',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_study_groups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='is_quarantined',
+            field=models.BooleanField(default=False),
+        ),
+    ]
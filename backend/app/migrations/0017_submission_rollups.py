@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_job_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('difficulty', models.CharField(blank=True, max_length=50)),
+                ('submissions', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('unique_users', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['period', 'start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['submitted_at'], name='submission_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='submissionrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'start', 'category', 'difficulty'), name='one_rollup_per_bucket'),
+        ),
+    ]
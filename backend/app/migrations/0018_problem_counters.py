@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing(apps, schema_editor):
+    """Start the counters from the submissions and solves already there (one UPDATE)."""
+    Problem = apps.get_model('app', 'Problem')
+    Submission = apps.get_model('app', 'Submission')
+    Solved = Problem.solved_by.through
+
+    def counted(queryset, **count):
+        rows = queryset.filter(problem_id=OuterRef('pk')).order_by().values('problem_id').annotate(**count)
+        return Coalesce(Subquery(rows.values('n')), 0, output_field=IntegerField())
+
+    Problem.objects.update(
+        attempt_count=counted(Submission.objects, n=Count('id')),
+        solve_count=counted(Submission.objects, n=Count('id', filter=Q(was_correct=True))),
+        unique_solvers=counted(Solved.objects, n=Count('id')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_submission_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='attempt_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='solve_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='unique_solvers',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['-attempt_count', 'id'], name='problem_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['-unique_solvers', 'id'], name='problem_solvers_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:24
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_completion_counters(apps, schema_editor):
+    """Existing challenges start with their completions so far on stripe 0."""
+    DailyChallenge = apps.get_model('app', 'DailyChallenge')
+    CounterShard = apps.get_model('app', 'CounterShard')
+    CounterShard.objects.bulk_create(
+        [
+            CounterShard(name=f"challenge:{row['pk']}:completions", shard=0, count=row['completions'])
+            for row in DailyChallenge.objects.annotate(completions=Count('completed_by')).values('pk', 'completions')
+            if row['completions']
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_problem_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'shard'), name='one_row_per_counter_shard')],
+            },
+        ),
+        migrations.RunPython(seed_completion_counters, migrations.RunPython.noop),
+    ]
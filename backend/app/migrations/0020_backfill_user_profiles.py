@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:33
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    """
+    Users from before UserProfile existed used to get one the next time they
+    were saved (usually at login). Profiles are now only created with the
+    user, so give the stragglers theirs here.
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserProfile = apps.get_model('app', 'UserProfile')
+    missing = User.objects.filter(userprofile__isnull=True).values_list('id', flat=True)
+    UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in missing.iterator()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_counter_shards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,7 @@ from django.utils import timezone
 from datetime import date
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 
 # Create your models here.
 class Problem(models.Model):
@@ -30,16 +30,81 @@ class Problem(models.Model):
 
     solved_by = models.ManyToManyField('auth.User', related_name='solved_problems', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # --- ADAPTIVE DIFFICULTY (see adaptive.py) ---
+    # Starting Elo-style rating for each hand-set difficulty
+    DIFFICULTY_RATINGS = {'easy': 800.0, 'medium': 1000.0, 'hard': 1200.0}
+    RATING_BUCKET_WIDTH = 50
+
+    rating = models.FloatField(null=True, blank=True)
+    rating_bucket = models.IntegerField(null=True, blank=True)
+    # ---------------------------------------------
+
+    # --- CALIBRATION (written by manage.py calibrate_problems) ---
+    calibrated_difficulty = models.FloatField(null=True, blank=True)  # IRT difficulty in logits, 0 = average
+    suggested_points = models.IntegerField(null=True, blank=True)  # Used by check_answer instead of 5/10/20
+    # -------------------------------------------------------------
+
+    # --- ANSWER-KEY CHECK (written by manage.py verify_problems) ---
+    # Quarantined problems have an answer that doesn't match their question
+    # and are left out of the catalog, practice picks and daily challenges.
+    is_quarantined = models.BooleanField(default=False)
+    # ---------------------------------------------------------------
+
+    # --- SOFT DELETE (see deletions.py) ---
+    # Set when an admin deletes the problem; process_deletions removes it for real later
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # --------------------------------------
+
+    # --- STATS (kept by counters.py, repaired by reconcile_problem_counters) ---
+    attempt_count = models.IntegerField(default=0)  # Submissions
+    solve_count = models.IntegerField(default=0)  # Correct submissions
+    unique_solvers = models.IntegerField(default=0)  # Rows in solved_by
+    # ---------------------------------------------------------------------------
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'rating_bucket', 'id'], name='problem_category_bucket_idx'),
+            models.Index(fields=['rating_bucket', 'id'], name='problem_bucket_idx'),
+            models.Index(fields=['-attempt_count', 'id'], name='problem_popularity_idx'),
+            models.Index(fields=['-unique_solvers', 'id'], name='problem_solvers_idx'),
+        ]
+
     def __str__(self):
         # --- UPDATE STR METHOD ---
         return f"[{self.get_category_display()}] {self.question} = {self.answer} ({self.difficulty})"
 
+    @property
+    def success_rate(self):
+        """Percent of answers that were right, or None before the first one."""
+        if not self.attempt_count:
+            return None
+        return 100 * self.solve_count / self.attempt_count
+
+    @classmethod
+    def bucket_for(cls, rating):
+        """Index bucket used to find problems near a rating."""
+        return int(rating // cls.RATING_BUCKET_WIDTH)
+
+    def save(self, *args, **kwargs):
+        # New problems start at the rating matching their hand-set difficulty
+        if self.rating is None:
+            self.rating = self.DIFFICULTY_RATINGS.get(str(self.difficulty).lower(), 1000.0)
+        self.rating_bucket = self.bucket_for(self.rating)
+        super().save(*args, **kwargs)
+
 class Submission(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
     submitted_answer = models.CharField(max_length=255)
     was_correct = models.BooleanField()
     submitted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['submitted_at'], name='submission_time_idx'),  # Time ranges for the rollups
+        ]
+
     def __str__(self):
         return f"Submission by {self.user.username} for Problem {self.problem.id}: {'✓' if self.was_correct else '✗'}"
 
@@ -68,10 +133,10 @@ class DailyChallenge(models.Model):
         except cls.DoesNotExist:
             from random import choice
             # Ensure we only pick from 'hard' problems as per the original management command
-            hard_problems = Problem.objects.filter(difficulty='hard')
+            hard_problems = Problem.objects.filter(difficulty='hard', is_quarantined=False, deleted_at__isnull=True)
             if not hard_problems.exists():
                 # Fallback to any problem if no hard ones exist
-                hard_problems = Problem.objects.all()
+                hard_problems = Problem.objects.filter(is_quarantined=False, deleted_at__isnull=True)
 
             if hard_problems.exists():
                 problem = choice(hard_problems)
@@ -80,7 +145,7 @@ class DailyChallenge(models.Model):
 
     def is_completed_by(self, user):
         """Check if user has completed this challenge"""
-        return user in self.completed_by.all()
+        return self.completed_by.filter(pk=user.pk).exists()
 
 
 # --- NEW FEATURE: User Profile & Points System ---
@@ -94,7 +159,7 @@ class UserProfile(models.Model):
 
     # --- ADDED FOR STREAKS ---
     current_streak = models.IntegerField(default=0)
-    last_daily_challenge_date = models.DateField(null=True, blank=True)
+    last_daily_challenge_date = models.DateField(null=True, blank=True, db_index=True)
     # -------------------------
 
     # --- ADDED FOR AVATAR ---
@@ -104,20 +169,165 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile ({self.points} points)"
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    """Create a UserProfile whenever a new User is created."""
-    if created:
-        UserProfile.objects.create(user=instance)
+    def add_points(self, amount):
+        """Atomically add points and tell listeners (group leaderboards) about it."""
+        self.points = models.F('points') + amount
+        self.save(update_fields=['points'])
+        self.refresh_from_db(fields=['points'])
+        points_awarded.send(sender=UserProfile, user_id=self.user_id, amount=amount)
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Save the UserProfile whenever the User is saved."""
-    try:
-        instance.userprofile.save()
-    except UserProfile.DoesNotExist:
-        # This handles users created before the UserProfile model existed
-        UserProfile.objects.create(user=instance)
+
+# Sent by UserProfile.add_points (see groups.py)
+points_awarded = Signal()
+
+
+class StudyGroup(models.Model):
+    """
+    A class or team with its own leaderboards. Scores are kept in GroupScore.
+    """
+    KIND_CHOICES = [
+        ('class', 'Class'),
+        ('team', 'Team'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='class')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_groups')
+    members = models.ManyToManyField(User, through='GroupMembership', related_name='study_groups')
+    join_code = models.CharField(max_length=12, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.get_kind_display()})"
+
+
+class GroupMembership(models.Model):
+    group = models.ForeignKey(StudyGroup, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='group_memberships')
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('group', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} in {self.group.name}"
+
+
+class GroupScore(models.Model):
+    """
+    Points a member earned in a group for one period ('all', 'week:2025-W07',
+    'month:2025-02'). The (group, period, -points) index is the ranking, so a
+    board is an index range scan whatever the group size.
+    """
+    group = models.ForeignKey(StudyGroup, on_delete=models.CASCADE, related_name='scores')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='group_scores')
+    period = models.CharField(max_length=16)
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('group', 'period', 'user')
+        indexes = [
+            models.Index(fields=['group', 'period', '-points'], name='groupscore_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.group.name} [{self.period}]: {self.points}"
+
+
+class ProblemCalibration(models.Model):
+    """
+    Running submission statistics for one problem, kept by calibrate_problems.
+    `information` is the accumulated Fisher information of the difficulty
+    estimate, which lets --incremental take one Newton step per batch of rows.
+    """
+    problem = models.OneToOneField(Problem, on_delete=models.CASCADE, primary_key=True, related_name='calibration')
+    attempts = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    difficulty = models.FloatField(default=0.0)
+    information = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Problem {self.problem_id}: {self.correct}/{self.attempts} correct, b={self.difficulty:.2f}"
+
+    @property
+    def solve_rate(self):
+        return self.correct / self.attempts if self.attempts else None
+
+    @property
+    def attempts_per_solve(self):
+        return self.attempts / self.correct if self.correct else None
+
+
+class UserCalibration(models.Model):
+    """Per-user ability estimate that goes with ProblemCalibration."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='calibration')
+    attempts = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    ability = models.FloatField(default=0.0)
+    information = models.FloatField(default=0.0)
+
+    def __str__(self):
+        return f"{self.user_id}: ability {self.ability:.2f}"
+
+
+class CalibrationRun(models.Model):
+    """One run of calibrate_problems; the latest one says where --incremental resumes."""
+    MODE_CHOICES = [('full', 'Full'), ('incremental', 'Incremental')]
+
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES)
+    last_submission_id = models.BigIntegerField(default=0)
+    rows_read = models.BigIntegerField(default=0)
+    problems_updated = models.IntegerField(default=0)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-finished_at']
+
+    def __str__(self):
+        return f"{self.get_mode_display()} calibration up to submission {self.last_submission_id}"
+
+
+class SkillRating(models.Model):
+    """
+    A user's Elo-style skill in one problem category, updated on every submission.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='skill_ratings')
+    category = models.CharField(max_length=50, choices=Problem.CATEGORY_CHOICES)
+    rating = models.FloatField(default=1000.0)
+    attempts = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'category')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.category}: {self.rating:.0f}"
+
+
+class ReviewItem(models.Model):
+    """
+    A problem a user got wrong, scheduled for spaced-repetition review (SM-2).
+    See reviews.py for how the schedule moves.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_items')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='review_items')
+    repetitions = models.IntegerField(default=0)  # Correct reviews in a row
+    interval_days = models.IntegerField(default=0)
+    ease = models.FloatField(default=2.5)
+    lapses = models.IntegerField(default=0)  # Times answered wrong
+    due_at = models.DateTimeField()
+    last_reviewed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'problem')
+        indexes = [
+            models.Index(fields=['user', 'due_at'], name='review_user_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - Problem {self.problem_id} due {self.due_at:%Y-%m-%d %H:%M}"
 
 
 # --- ADD THIS NEW MODEL FOR FEATURE 4 ---
@@ -172,6 +382,13 @@ class MapCheckpoint(models.Model):
     def __str__(self):
         return f"#{self.checkpoint_number}: {self.name} ({self.emoji})"
     
+    @classmethod
+    def first_id(cls):
+        """Id of checkpoint #1, or None. One lookup on the unique checkpoint_number index."""
+        # Not cached: populate_pirate_map recreates the checkpoints, and a stale
+        # id in another process would point new users' progress at a deleted row
+        return cls.objects.filter(checkpoint_number=1).values_list('id', flat=True).first()
+
     @property
     def next_checkpoint(self):
         """Get the next checkpoint in sequence"""
@@ -234,8 +451,7 @@ class UserProgress(models.Model):
         next_checkpoint = self.current_checkpoint.next_checkpoint
         if next_checkpoint:
             # Award points for completing checkpoint
-            self.user.userprofile.points += self.current_checkpoint.points_reward
-            self.user.userprofile.save()
+            self.user.userprofile.add_points(self.current_checkpoint.points_reward)
             
             # Move to next checkpoint
             self.current_checkpoint = next_checkpoint
@@ -258,9 +474,163 @@ class UserProgress(models.Model):
 
 
 @receiver(post_save, sender=User)
-def create_user_progress(sender, instance, created, **kwargs):
-    """Create UserProgress when a new User is created."""
+def create_user_rows(sender, instance, created, **kwargs):
+    """
+    Give a new User their profile and map progress. Later saves (every
+    login() updates last_login) don't touch either table.
+    """
     if created:
-        # Get the first checkpoint or create user progress without checkpoint
-        first_checkpoint = MapCheckpoint.objects.filter(checkpoint_number=1).first()
-        UserProgress.objects.create(user=instance, current_checkpoint=first_checkpoint)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+        UserProgress.objects.create(user=instance, current_checkpoint_id=MapCheckpoint.first_id())
+
+
+class PendingDeletion(models.Model):
+    """
+    A user or problem that was deleted from the dashboard and is waiting for
+    process_deletions to remove its rows (see deletions.py). The object is
+    hidden straight away; the counters show how far the cleanup got.
+    """
+    KIND_CHOICES = [
+        ('user', 'User'),
+        ('problem', 'Problem'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    label = models.CharField(max_length=255)  # Username / question, kept for the admin once the row is gone
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    current_step = models.CharField(max_length=100, blank=True)
+    rows_deleted = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-requested_at']
+        constraints = [
+            # One open request per object; finished ones stay as a log
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                condition=models.Q(finished_at__isnull=True),
+                name='one_open_deletion_per_object',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Delete {self.kind} {self.label}: {self.status}"
+
+    @property
+    def status(self):
+        if self.finished_at:
+            return 'done'
+        if self.error:
+            return 'failed'
+        return 'running' if self.started_at else 'pending'
+
+
+class Job(models.Model):
+    """
+    A management command waiting to run in `manage.py run_workers` (see jobs.py).
+    Periodic jobs (settings.PERIODIC_JOBS) have `periodic` set to their schedule
+    name; the workers queue the next one when the last one is done.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    command = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)  # Passed to call_command()
+    periodic = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    worker = models.CharField(max_length=100, blank=True)  # host:pid that claimed it
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    output = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_queue_idx'),
+        ]
+        constraints = [
+            # Only one upcoming run per schedule, however many workers are queueing them
+            models.UniqueConstraint(
+                fields=['periodic'],
+                condition=models.Q(status__in=['queued', 'running']) & ~models.Q(periodic=''),
+                name='one_open_job_per_schedule',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.command} ({self.status})"
+
+
+class SubmissionRollup(models.Model):
+    """
+    Submission counts per hour and per day, by problem category and difficulty,
+    so the analytics charts read a few hundred rows instead of grouping the
+    whole Submission table. Rows with an empty category and difficulty are the
+    totals: unique users can't be added up across categories.
+    Kept up to date by the update_rollups job (see app/rollups.py).
+    """
+    PERIOD_CHOICES = [('hour', 'Hour'), ('day', 'Day')]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateTimeField()
+    category = models.CharField(max_length=50, blank=True)
+    difficulty = models.CharField(max_length=50, blank=True)
+    submissions = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    unique_users = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['period', 'start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'start', 'category', 'difficulty'],
+                name='one_rollup_per_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_period_display()} {self.start:%Y-%m-%d %H:%M} {self.category or 'all'}: {self.submissions}"
+
+
+class CounterShard(models.Model):
+    """
+    One stripe of a sharded counter (see app/counters.py). Increments go to a
+    random stripe, so concurrent writers rarely wait on the same row; the
+    value is the sum of a counter's stripes.
+    """
+    name = models.CharField(max_length=100)
+    shard = models.PositiveSmallIntegerField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'shard'], name='one_row_per_counter_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}[{self.shard}] = {self.count}"
+
+
+class CacheVersion(models.Model):
+    """
+    A cache version counter (see app/cache_versions.py): the time `name` last
+    changed. In the database so every process sees the same value.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    version = models.FloatField()
+
+    def __str__(self):
+        return f"{self.name} = {self.version}"
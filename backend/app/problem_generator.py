@@ -1,26 +1,27 @@
 import random
 
-def generate_arithmetic_problem(difficulty='easy'):
+def generate_arithmetic_problem(difficulty='easy', rng=random):
     """
     Generates a simple arithmetic problem (addition, subtraction, multiplication).
     Ensures answers are non-negative.
+    Pass a seeded random.Random as `rng` to get a repeatable sequence (races).
     """
     if difficulty == 'easy':
-        num1 = random.randint(1, 10)
-        num2 = random.randint(1, 10)
-        operator = random.choice(['+', '-', '*'])
+        num1 = rng.randint(1, 10)
+        num2 = rng.randint(1, 10)
+        operator = rng.choice(['+', '-', '*'])
     elif difficulty == 'medium':
-        num1 = random.randint(10, 50)
-        num2 = random.randint(5, 25)
-        operator = random.choice(['+', '-', '*', '+', '-']) # More + and -
+        num1 = rng.randint(10, 50)
+        num2 = rng.randint(5, 25)
+        operator = rng.choice(['+', '-', '*', '+', '-']) # More + and -
     elif difficulty == 'hard':
-        num1 = random.randint(20, 100)
-        num2 = random.randint(10, 50)
-        operator = random.choice(['+', '-', '*', '*', '*']) # More *
+        num1 = rng.randint(20, 100)
+        num2 = rng.randint(10, 50)
+        operator = rng.choice(['+', '-', '*', '*', '*']) # More *
     else: # Default to easy
-        num1 = random.randint(1, 10)
-        num2 = random.randint(1, 10)
-        operator = random.choice(['+', '-', '*'])
+        num1 = rng.randint(1, 10)
+        num2 = rng.randint(1, 10)
+        operator = rng.choice(['+', '-', '*'])
 
     # Ensure subtraction doesn't result in negative numbers easily
     if operator == '-':
@@ -29,7 +30,7 @@ def generate_arithmetic_problem(difficulty='easy'):
             num1, num2 = num2, num1 
         # For easy, ensure result isn't negative
         if difficulty == 'easy' and num1 == num2:
-             num1 += random.randint(1, 5) # Avoid zero answer often
+             num1 += rng.randint(1, 5) # Avoid zero answer often
 
     question = f"{num1} {operator} {num2}"
     
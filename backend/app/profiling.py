@@ -0,0 +1,191 @@
+"""
+Opt-in cProfile for live requests.
+
+ProfilingMiddleware profiles a request when
+
+    - a staff user sends the header "X-Profile: 1", or
+    - it's picked by settings.PROFILE_SAMPLE_RATE (0.01 = one request in a hundred)
+
+and writes the stats to PROFILE_DIR as <time>_<view>_<ms>.prof, so the
+view name and duration can be read without opening the file. Everything
+else pays one random() call. The Profiles page on the dashboard merges all
+samples of a view with pstats and lists the functions with the most
+cumulative time, per request.
+
+Only one request is profiled at a time per process (the interpreter has a
+single profiling hook); a request that arrives meanwhile just isn't
+profiled. Streaming responses are profiled up to the first byte.
+
+Under ASGI a request runs on two threads: async code on the event loop,
+sync views and middleware on the request's sync thread. Each gets its own
+profiler and the two are merged into one file. The event loop half can
+include other requests' coroutines that ran in the meantime.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+HEADER = 'HTTP_X_PROFILE'
+_lock = threading.Lock()
+_UNSAFE = re.compile(r'[^A-Za-z0-9._-]+')
+_FILENAME = re.compile(r'^(\d+)_(.+)_(\d+)ms\.prof$')
+
+
+def wants_profile(request):
+    if request.META.get(HEADER) == '1' and request.user.is_authenticated and request.user.is_staff:
+        return True
+    return sampled()
+
+
+async def awants_profile(request):
+    if request.META.get(HEADER) == '1':
+        user = await request.auser()
+        if user.is_authenticated and user.is_staff:
+            return True
+    return sampled()
+
+
+def sampled():
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or f'{match.func.__module__}.{match.func.__name__}'
+
+
+class ProfilingMiddleware:
+    """Put it after AuthenticationMiddleware, so the staff check can see request.user."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not wants_profile(request) or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        finally:
+            _lock.release()
+
+        path = save([profiler], view_name(request), elapsed_ms)
+        response['X-Profile-Id'] = path.name
+        return response
+
+    async def __acall__(self, request):
+        if not await awants_profile(request) or not _lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            loop_profiler, sync_profiler = cProfile.Profile(), cProfile.Profile()
+            start = time.perf_counter()
+            # Runs on the request's sync thread, where Django will run its sync views
+            await sync_to_async(sync_profiler.enable)()
+            loop_profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                loop_profiler.disable()
+                await sync_to_async(sync_profiler.disable)()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        finally:
+            _lock.release()
+
+        path = await sync_to_async(save)([loop_profiler, sync_profiler], view_name(request), elapsed_ms)
+        response['X-Profile-Id'] = path.name
+        return response
+
+
+def save(profilers, view, elapsed_ms):
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{time.time_ns() // 1000}_{_UNSAFE.sub("-", view)}_{elapsed_ms:.0f}ms.prof'
+    stats = pstats.Stats()
+    for profiler in profilers:
+        if profiler.getstats():  # pstats refuses an empty profile
+            stats.add(profiler)
+    stats.dump_stats(path)
+    prune(directory)
+    return path
+
+
+def prune(directory):
+    """Keep only the newest settings.PROFILE_KEEP profiles."""
+    files = sorted(directory.glob('*.prof'))  # Names start with the time, so this is oldest first
+    for old in files[:max(0, len(files) - settings.PROFILE_KEEP)]:
+        try:
+            old.unlink()
+        except FileNotFoundError:
+            pass  # Another process pruned it first
+
+
+def samples():
+    """{view: [(path, elapsed ms), ...]} for every saved profile."""
+    by_view = {}
+    directory = Path(settings.PROFILE_DIR)
+    if not directory.is_dir():
+        return by_view
+    for entry in os.scandir(directory):
+        match = _FILENAME.match(entry.name)
+        if match:
+            by_view.setdefault(match.group(2), []).append((Path(entry.path), int(match.group(3))))
+    return by_view
+
+
+def summary():
+    """One row per profiled view, slowest on average first."""
+    rows = []
+    for view, files in samples().items():
+        times = [ms for _, ms in files]
+        rows.append({
+            'view': view,
+            'samples': len(times),
+            'avg_ms': sum(times) / len(times),
+            'max_ms': max(times),
+        })
+    return sorted(rows, key=lambda row: row['avg_ms'], reverse=True)
+
+
+def top_functions(view, limit=30, project_only=False):
+    """Functions with the most cumulative time across all samples of `view`, per request."""
+    files = samples().get(view, [])
+    if not files:
+        return []
+    stats = pstats.Stats(*(str(path) for path, _ in files))
+    base = str(settings.BASE_DIR)
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        if project_only and not filename.startswith(base):
+            continue
+        rows.append({
+            'function': pstats.func_std_string((filename, line, function)).replace(base + os.sep, ''),
+            'calls': calls / len(files),
+            'own_ms': own * 1000 / len(files),
+            'cumulative_ms': cumulative * 1000 / len(files),
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
@@ -0,0 +1,154 @@
+"""
+In-memory rooms for multiplayer Speed Run races (see consumers.py).
+
+A room holds everything about a race in plain Python objects: the players,
+their scores and the shared problem sequence, which comes from a
+random.Random seeded once per room so every player gets the same problems
+in the same order. Answers are graded here, never in the browser. The only
+database write is save_results() when the race is over.
+
+Rooms live in this process (ROOMS), so a race has to be served by a single
+worker; that's what lets a process run thousands of them without touching
+the database or a shared cache on every answer.
+"""
+import random
+import secrets
+import time
+
+from . import problem_generator
+from .models import SpeedRunAttempt
+
+RACE_SECONDS = 60
+COUNTDOWN_SECONDS = 3
+MAX_PLAYERS = 8
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+ROOMS = {}  # code -> Room
+
+
+class RaceError(Exception):
+    """Something a player tried that the room doesn't allow (sent back as an error message)."""
+
+
+class Player:
+    __slots__ = ('user_id', 'username', 'position', 'score')
+
+    def __init__(self, user_id, username):
+        self.user_id = user_id
+        self.username = username
+        self.position = 0  # Index of the problem the player is on
+        self.score = 0
+
+
+class Room:
+    def __init__(self, code, difficulty='easy', seed=None):
+        if difficulty not in DIFFICULTIES:
+            difficulty = 'easy'
+        self.code = code
+        self.difficulty = difficulty
+        self.seed = seed if seed is not None else secrets.randbits(32)
+        self._rng = random.Random(self.seed)
+        self.problems = []  # Shared sequence, generated as the leader needs it
+        self.players = {}  # user_id -> Player, in join order
+        self.host_id = None
+        self.state = 'lobby'  # lobby -> running -> finished
+        self.starts_at = self.ends_at = None
+        self.end_timer = None  # Set by the consumer that starts the race
+
+    def problem(self, position):
+        while len(self.problems) <= position:
+            self.problems.append(problem_generator.generate_arithmetic_problem(self.difficulty, rng=self._rng))
+        return self.problems[position]
+
+    def join(self, user_id, username):
+        if user_id in self.players:
+            return self.players[user_id]
+        if self.state != 'lobby':
+            raise RaceError('This race has already started.')
+        if len(self.players) >= MAX_PLAYERS:
+            raise RaceError('This race is full.')
+        player = self.players[user_id] = Player(user_id, username)
+        if self.host_id is None:
+            self.host_id = user_id
+        return player
+
+    def leave(self, user_id):
+        self.players.pop(user_id, None)
+        if self.host_id == user_id:
+            self.host_id = next(iter(self.players), None)
+
+    def start(self, user_id, now=None):
+        if self.state != 'lobby':
+            raise RaceError('This race has already started.')
+        if user_id != self.host_id:
+            raise RaceError('Only the host can start the race.')
+        now = time.monotonic() if now is None else now
+        self.state = 'running'
+        self.starts_at = now + COUNTDOWN_SECONDS
+        self.ends_at = self.starts_at + RACE_SECONDS
+
+    def answer(self, user_id, answer, now=None):
+        """Grade the player's answer to their current problem. Returns (correct, next question)."""
+        now = time.monotonic() if now is None else now
+        if self.state != 'running' or now < self.starts_at:
+            raise RaceError('The race is not running.')
+        if now >= self.ends_at:
+            raise RaceError('Time is up!')
+        player = self.players.get(user_id)
+        if player is None:
+            # Left (or never joined) while their answer was on its way: nothing to grade
+            raise RaceError('You are not in this race.')
+        correct = str(answer).strip() == self.problem(player.position)['answer']
+        if correct:
+            player.score += 1
+            player.position += 1
+        return correct, self.problem(player.position)['question']
+
+    def finish(self):
+        self.state = 'finished'
+        if self.end_timer is not None:
+            self.end_timer.cancel()
+            self.end_timer = None
+
+    def scoreboard(self):
+        players = sorted(self.players.values(), key=lambda p: -p.score)
+        return [{'username': p.username, 'score': p.score} for p in players]
+
+    def lobby_state(self):
+        host = self.players.get(self.host_id)
+        return {
+            'type': 'lobby',
+            'code': self.code,
+            'difficulty': self.difficulty,
+            'host': host.username if host else None,
+            'players': [p.username for p in self.players.values()],
+        }
+
+
+def join(code, user_id, username, difficulty='easy'):
+    """Join (creating it if needed) the room `code`. Returns the Room."""
+    room = ROOMS.get(code)
+    if room is None or room.state == 'finished':
+        room = ROOMS[code] = Room(code, difficulty)
+    room.join(user_id, username)
+    return room
+
+
+def leave(code, user_id):
+    """Drop a player; empty rooms are forgotten. Returns the room if it is still around."""
+    room = ROOMS.get(code)
+    if room is None:
+        return None
+    room.leave(user_id)
+    if not room.players:
+        room.finish()
+        ROOMS.pop(code, None)
+        return None
+    return room
+
+
+def save_results(room):
+    """The race's single database write: one SpeedRunAttempt per player."""
+    SpeedRunAttempt.objects.bulk_create([
+        SpeedRunAttempt(user_id=p.user_id, score=p.score) for p in room.players.values()
+    ])
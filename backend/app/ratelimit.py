@@ -0,0 +1,95 @@
+"""
+Token-bucket rate limiting for the answer-checking endpoints.
+
+Every limited view has up to three buckets, configured in
+settings.RATE_LIMITS as (capacity, tokens refilled per second):
+
+    'user'    one bucket per logged-in user (stops brute-forcing answers)
+    'ip'      one per client address (generous: a classroom shares one IP)
+    'global'  one for the whole process (sheds load before the DB is swamped)
+
+A request takes one token from each (the batch answer API takes one per
+answer, see limit_exceeded()). If any bucket is empty the view is
+not run at all, and no bucket is charged: the client gets a 429 with
+Retry-After straight away, so a flood costs a cache lookup instead of a
+Submission write.
+
+Buckets are (tokens, last refill time) pairs in the cache. The lock makes
+checking every bucket and then charging them atomic within a process,
+which is what the default local-memory cache needs.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+_lock = threading.Lock()
+
+
+def take_tokens(buckets, now=None, count=1):
+    """
+    Take `count` tokens from every bucket in {key: (capacity, refill rate)}, or
+    from none of them. Returns 0 if allowed, else seconds until they're all back.
+    """
+    now = time.time() if now is None else now
+    with _lock:
+        stored = cache.get_many(list(buckets))
+        tokens = {}
+        for key, (capacity, refill_rate) in buckets.items():
+            available, last = stored.get(key) or (capacity, now)
+            tokens[key] = min(capacity, available + (now - last) * refill_rate)
+        wait = max(
+            [(count - tokens[key]) / refill_rate for key, (_, refill_rate) in buckets.items() if tokens[key] < count],
+            default=0.0,
+        )
+        if wait:
+            # Nothing is taken, so a request turned away by one bucket doesn't drain the others
+            return wait
+        # Once a bucket has had time to fill up it's the same as no entry at all
+        timeout = max(math.ceil(capacity / refill_rate) + 1 for capacity, refill_rate in buckets.values())
+        cache.set_many({key: (tokens[key] - count, now) for key in buckets}, timeout=timeout)
+    return 0.0
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def limit_exceeded(request, name, count=1):
+    """Take `count` tokens from each of settings.RATE_LIMITS[name]'s buckets. Returns a 429 response or None."""
+    limits = settings.RATE_LIMITS.get(name, {})
+    idents = {
+        'user': request.user.pk if request.user.is_authenticated else None,
+        'ip': client_ip(request),
+        'global': '',
+    }
+    buckets = {
+        f'ratelimit:{name}:{scope}:{ident}': limits[scope]
+        for scope, ident in idents.items() if scope in limits and ident is not None
+    }
+    wait = take_tokens(buckets, count=count) if buckets else 0
+    return too_many_requests(wait) if wait else None
+
+
+def rate_limit(name):
+    """View decorator applying settings.RATE_LIMITS[name]. Put it below @login_required."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return limit_exceeded(request, name) or view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def too_many_requests(wait):
+    retry_after = max(1, math.ceil(wait))
+    response = JsonResponse(
+        {'error': f'Too many answers! Please wait {retry_after}s and try again.', 'retry_after': retry_after},
+        status=429,
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
@@ -0,0 +1,120 @@
+"""
+Spaced-repetition review queue (SM-2 style) built from wrong answers.
+
+A wrong Submission puts the problem in the user's queue (or sends it back to
+the start). Each later correct answer pushes the next review further out:
+1 day, 6 days, then the previous interval times the item's ease. The queue
+is the (user, due_at) index on ReviewItem, so "what is due now" is a single
+index range query.
+"""
+from datetime import timedelta
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ReviewItem, Submission
+
+MIN_EASE = 1.3
+EASE_PENALTY = 0.2  # Taken off the ease every time the answer is wrong
+MAX_INTERVAL_DAYS = 365
+
+
+def apply_answer(item, correct, when):
+    """Move one ReviewItem along the SM-2 schedule. Does not save it."""
+    if correct:
+        item.repetitions += 1
+        if item.repetitions == 1:
+            item.interval_days = 1
+        elif item.repetitions == 2:
+            item.interval_days = 6
+        else:
+            item.interval_days = min(round(item.interval_days * item.ease), MAX_INTERVAL_DAYS)
+    else:
+        item.repetitions = 0
+        item.interval_days = 1
+        item.lapses += 1
+        item.ease = max(MIN_EASE, item.ease - EASE_PENALTY)
+
+    item.last_reviewed_at = when
+    item.due_at = when + timedelta(days=item.interval_days)
+    return item
+
+
+def record_answer(user_id, problem_id, correct, when):
+    """Update the queue for one graded answer."""
+    if correct:
+        # Right answers only matter for problems already in the queue
+        item = ReviewItem.objects.filter(user_id=user_id, problem_id=problem_id).first()
+        if item is None:
+            return None
+    else:
+        item, _ = ReviewItem.objects.get_or_create(
+            user_id=user_id,
+            problem_id=problem_id,
+            defaults={'due_at': when, 'last_reviewed_at': when},
+        )
+    apply_answer(item, correct, when)
+    item.save()
+    return item
+
+
+def record_answers(user_id, answers):
+    """
+    record_answer() for several (problem id, correct, when) answers by one
+    user, in order (the batch check-answer API): one read, then one insert
+    for the new items and one update for the rest.
+    """
+    items = {
+        item.problem_id: item
+        for item in ReviewItem.objects.filter(user_id=user_id, problem_id__in={answer[0] for answer in answers})
+    }
+    existing = set(items)
+    changed = set()
+    for problem_id, correct, when in answers:
+        item = items.get(problem_id)
+        if item is None:
+            if correct:
+                continue
+            item = items[problem_id] = ReviewItem(
+                user_id=user_id, problem_id=problem_id, due_at=when, last_reviewed_at=when,
+            )
+        apply_answer(item, correct, when)
+        changed.add(problem_id)
+
+    fields = ['repetitions', 'interval_days', 'ease', 'lapses', 'due_at', 'last_reviewed_at']
+    new = [items[problem_id] for problem_id in changed - existing]
+    if new:
+        # If another request queued the same problem meanwhile, this answer's schedule wins, as with save()
+        ReviewItem.objects.bulk_create(new, update_conflicts=True, unique_fields=['user', 'problem'], update_fields=fields)
+    if changed & existing:
+        ReviewItem.objects.bulk_update([items[problem_id] for problem_id in changed & existing], fields)
+
+
+@receiver(post_save, sender=Submission)
+def schedule_review(sender, instance, created, **kwargs):
+    if created:
+        record_answer(instance.user_id, instance.problem_id, instance.was_correct, instance.submitted_at)
+
+
+def due_reviews(user, limit=20, now=None):
+    """The user's reviews that are due, oldest first."""
+    now = now or timezone.now()
+    return (
+        ReviewItem.objects
+        .filter(user=user, due_at__lte=now, problem__deleted_at__isnull=True)
+        .select_related('problem')
+        .order_by('due_at')[:limit]
+    )
+
+
+def next_due_at(user, now=None):
+    """When the next review that isn't due yet becomes due (or None)."""
+    now = now or timezone.now()
+    return (
+        ReviewItem.objects
+        .filter(user=user, due_at__gt=now)
+        .order_by('due_at')
+        .values_list('due_at', flat=True)
+        .first()
+    )
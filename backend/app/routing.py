@@ -0,0 +1,7 @@
+from django.urls import re_path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'^ws/race/(?P<code>[A-Za-z0-9_-]{1,32})/$', consumers.RaceConsumer.as_asgi()),
+]
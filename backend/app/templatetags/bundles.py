@@ -0,0 +1,89 @@
+"""
+{% bundle %} tag: inline <style>/<script> blocks that can be served as
+content-hashed static files.
+
+    {% load bundles %}
+    {% bundle "home.css" %}<style> ... </style>{% endbundle %}
+
+`python manage.py build_bundles` writes the block contents to
+app/static/app/bundles/ and records them in manifest.json. When the manifest
+has an up-to-date file for the block, the tag renders a <link>/<script src>
+to it; otherwise (no build yet, or the template was edited since) it renders
+the block inline exactly as written.
+"""
+import hashlib
+import json
+import re
+from pathlib import Path
+
+from django import template
+from django.template.base import TextNode
+from django.urls import reverse
+from django.utils.html import format_html
+
+register = template.Library()
+
+BUNDLE_DIR = Path(__file__).resolve().parent.parent / 'static' / 'app' / 'bundles'
+MANIFEST_PATH = BUNDLE_DIR / 'manifest.json'
+
+# Strips the outer <style>/<script> element, leaving the code inside it.
+ELEMENT_RE = re.compile(r'^\s*<(style|script)\b[^>]*>(.*)</\1>\s*$', re.S)
+
+_manifest = {'mtime': None, 'entries': {}}
+
+
+def source_digest(source):
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def load_manifest():
+    """Return the bundle manifest, re-reading it only when the file changes."""
+    try:
+        mtime = MANIFEST_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return {}
+    if mtime != _manifest['mtime']:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            _manifest['entries'] = json.load(f)
+        _manifest['mtime'] = mtime
+    return _manifest['entries']
+
+
+class BundleNode(template.Node):
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+        self.kind = name.rsplit('.', 1)[-1]
+
+        # Only plain text can be extracted; blocks with {{ }} or {% %} inside
+        # depend on the request and always render inline.
+        self.source = None
+        if all(isinstance(node, TextNode) for node in nodelist):
+            match = ELEMENT_RE.match(''.join(node.s for node in nodelist))
+            if match:
+                self.source = match.group(2)
+        self.digest = source_digest(self.source) if self.source is not None else None
+
+    def render(self, context):
+        entry = load_manifest().get(self.name) if self.digest else None
+        if not entry or entry['source'] != self.digest:
+            return self.nodelist.render(context)
+
+        url = reverse('static_bundle', args=[entry['file']])
+        if self.kind == 'css':
+            return format_html('<link rel="stylesheet" href="{}">', url)
+        return format_html('<script src="{}"></script>', url)
+
+
+@register.tag
+def bundle(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 2 or bits[1][0] not in '"\'' or bits[1][0] != bits[1][-1]:
+        raise template.TemplateSyntaxError('Usage: {% bundle "name.css" %}...{% endbundle %}')
+    name = bits[1][1:-1]
+    if not name.endswith(('.css', '.js')):
+        raise template.TemplateSyntaxError(f'Bundle name must end in .css or .js, got "{name}"')
+
+    nodelist = parser.parse(('endbundle',))
+    parser.delete_first_token()
+    return BundleNode(name, nodelist)
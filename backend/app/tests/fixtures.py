@@ -0,0 +1,135 @@
+"""
+A realistic data set for the query-budget tests, at any size.
+
+create_base() makes the handful of named objects the tests request pages
+for (ana the student, boss the admin, a group, today's challenge...).
+populate(n) then adds n rows of every kind around them - users, problems,
+submissions, solves, daily completions, reviews, group scores, jobs - with
+bulk_create, so 10,000 of everything takes a couple of seconds.
+"""
+import io
+import random
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+
+from .. import counters, groups, rollups
+from ..models import (DailyChallenge, GroupMembership, GroupScore, Job, MapCheckpoint, PendingDeletion,
+                      Problem, ReviewItem, SkillRating, SpeedRunAttempt, Submission, UserProfile, UserProgress)
+
+PASSWORD = 'pw'
+DIFFICULTIES = ['easy', 'medium', 'hard']
+CATEGORIES = [code for code, _ in Problem.CATEGORY_CHOICES]
+
+# Every cache alias as a private in-memory cache, for tests that clear the
+# caches between measurements: whatever backend the settings use (a shared
+# Redis, a directory on disk) is never wiped.
+TEST_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'pbmate-tests-{alias}',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+    for alias in settings.CACHES
+}
+
+
+def create_base():
+    """The named objects every test uses. Returns them in a dict."""
+    call_command('populate_pirate_map', stdout=io.StringIO())
+    ana = User.objects.create_user('ana', 'ana@example.com', PASSWORD)
+    boss = User.objects.create_superuser('boss', 'boss@example.com', PASSWORD)
+    victim = User.objects.create_user('victim', 'victim@example.com', PASSWORD)
+    problem = Problem.objects.create(question='12 + 30', answer='42', difficulty='hard', category='arithmetic')
+    challenge = DailyChallenge.objects.create(date=date.today(), problem=problem)
+    for category in CATEGORIES:
+        SkillRating.objects.create(user=ana, category=category, rating=950.0, attempts=30)
+    group = groups.create_group(ana, 'Class 7B')
+    groups.join_group(group, boss)
+    failed_job = Job.objects.create(command='create_daily_challenge', status='failed', attempts=3)
+    return {
+        'ana': ana, 'boss': boss, 'victim': victim, 'problem': problem,
+        'group': group, 'failed_job': failed_job,
+    }
+
+
+def populate(n, base, seed=0):
+    """Add n more rows of everything."""
+    rng = random.Random(seed)
+    offset = User.objects.count()
+    ana, group = base['ana'], base['group']
+    today_challenge = DailyChallenge.objects.get(date=date.today())
+    first_checkpoint = MapCheckpoint.objects.order_by('checkpoint_number').first()
+    now = timezone.now()
+
+    users = User.objects.bulk_create([
+        User(username=f'student{offset + i}', email=f'student{offset + i}@example.com', password='!')
+        for i in range(n)
+    ])
+    UserProfile.objects.bulk_create([UserProfile(user=user, points=rng.randint(0, 5000)) for user in users])
+    UserProgress.objects.bulk_create([UserProgress(user=user, current_checkpoint=first_checkpoint) for user in users])
+
+    problems = []
+    for i in range(n):
+        difficulty = DIFFICULTIES[i % 3]
+        rating = Problem.DIFFICULTY_RATINGS[difficulty] + rng.uniform(-150, 150)
+        a, b = rng.randint(1, 99), rng.randint(1, 99)
+        problems.append(Problem(
+            question=f'{a} + {b}', answer=str(a + b), difficulty=difficulty, category=CATEGORIES[i % 3],
+            rating=rating, rating_bucket=Problem.bucket_for(rating),
+        ))
+    problems = Problem.objects.bulk_create(problems)
+
+    Submission.objects.bulk_create(
+        [Submission(user=ana, problem=rng.choice(problems), submitted_answer='1', was_correct=i % 2 == 0)
+         for i in range(n)]
+        + [Submission(user=user, problem=rng.choice(problems), submitted_answer='1', was_correct=True)
+           for user in users]
+    )
+    solved = Problem.solved_by.through
+    solved.objects.bulk_create(
+        [solved(problem=problem, user=ana) for problem in problems[::2]]
+        + [solved(problem=rng.choice(problems), user=user) for user in users],
+        ignore_conflicts=True,
+    )
+
+    completed = DailyChallenge.completed_by.through
+    completed.objects.bulk_create([completed(dailychallenge=today_challenge, user=user) for user in users])
+    counters.increment(counters.completions_key(today_challenge.pk), len(users))
+    oldest = DailyChallenge.objects.order_by('date').values_list('date', flat=True).first()
+    DailyChallenge.objects.bulk_create([
+        DailyChallenge(date=oldest - timedelta(days=i + 1), problem=rng.choice(problems)) for i in range(n)
+    ])
+
+    SpeedRunAttempt.objects.bulk_create([SpeedRunAttempt(user=ana, score=rng.randint(0, 40)) for _ in range(n)])
+    ReviewItem.objects.bulk_create([
+        ReviewItem(user=ana, problem=problem, due_at=now - timedelta(hours=1), last_reviewed_at=now - timedelta(days=1))
+        for problem in problems[1::2]
+    ])
+
+    GroupMembership.objects.bulk_create([GroupMembership(group=group, user=user) for user in users])
+    GroupScore.objects.bulk_create([
+        GroupScore(group=group, user=user, period=period, points=rng.randint(0, 500))
+        for user in users for period in groups.current_periods()
+    ])
+
+    Job.objects.bulk_create([
+        Job(command='process_deletions', status='done', attempts=1, started_at=now, finished_at=now)
+        for _ in range(n)
+    ])
+    PendingDeletion.objects.bulk_create([
+        PendingDeletion(kind='problem', object_id=10 ** 9 + offset + i, label='old problem', finished_at=now)
+        for i in range(n)
+    ])
+
+    # Spread the new submissions over the last year, then roll them up
+    spread = [
+        Submission(id=pk, submitted_at=now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)))
+        for pk in Submission.objects.order_by('-id').values_list('id', flat=True)[:2 * n]
+    ]
+    Submission.objects.bulk_update(spread, ['submitted_at'], batch_size=1000)
+    for _ in rollups.catch_up(now - timedelta(days=366)):
+        pass
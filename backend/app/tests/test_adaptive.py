@@ -0,0 +1,83 @@
+"""
+Picking practice problems near the user's rating (adaptive.pick_problems).
+"""
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import adaptive
+from ..models import Problem
+
+WIDTH = Problem.RATING_BUCKET_WIDTH
+
+
+class PickProblemsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana', password='pw')  # No ratings yet: 1000, bucket 20
+        cls.target = Problem.bucket_for(adaptive.DEFAULT_RATING)
+        problems = []
+        for offset in range(-adaptive.MAX_BUCKET_SPREAD - 2, adaptive.MAX_BUCKET_SPREAD + 3):
+            rating = (cls.target + offset) * WIDTH + WIDTH / 2
+            for i in range(30):
+                problems.append(Problem(
+                    question=f'{i} + {offset}', answer='0', difficulty='medium',
+                    category='algebra' if i % 3 == 0 else 'arithmetic',
+                    rating=rating, rating_bucket=Problem.bucket_for(rating),
+                ))
+        Problem.objects.bulk_create(problems)
+
+    def in_bucket(self, offset):
+        return Problem.objects.filter(rating_bucket=self.target + offset)
+
+    def test_nearest_unsolved_first(self):
+        own = list(self.in_bucket(0))
+        self.ana.solved_problems.add(*own[:25])
+        own[25].is_quarantined = True
+        own[25].save()
+        Problem.objects.filter(pk=own[26].pk).update(deleted_at=timezone.now())
+
+        picked = adaptive.pick_problems(self.ana, count=10)
+        self.assertEqual(len(picked), 10)
+        self.assertEqual({p.id for p in picked[:3]}, {p.id for p in own[27:]})
+        self.assertTrue(all(abs(p.rating_bucket - self.target) == 1 for p in picked[3:]))
+        self.assertFalse(self.ana.solved_problems.filter(id__in=[p.id for p in picked]).exists())
+
+    def test_solved_problems_fill_in(self):
+        window = Problem.objects.filter(
+            rating_bucket__gte=self.target - adaptive.MAX_BUCKET_SPREAD,
+            rating_bucket__lte=self.target + adaptive.MAX_BUCKET_SPREAD,
+            category='algebra',
+        )
+        self.ana.solved_problems.add(*window[:len(window) - 4])
+        picked = adaptive.pick_problems(self.ana, count=10, category='algebra')
+        self.assertEqual(len(picked), 10)
+        self.assertEqual({p.id for p in picked[:4]}, {p.id for p in window[len(window) - 4:]})
+        self.assertTrue(all(p.category == 'algebra' for p in picked))
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+    def test_query_budget_and_plan(self):
+        """
+        A fixed number of queries, and the problem table is only read one
+        bucket at a time (or along the primary key, without sorting): ranking
+        the whole window in SQL took most of a second with a million problems.
+        """
+        self.ana.solved_problems.add(*self.in_bucket(0)[:5])
+        table = Problem._meta.db_table
+        for category in (None, 'algebra'):
+            with self.subTest(category=category), CaptureQueriesContext(connection) as captured:
+                adaptive.pick_problems(self.ana, count=10, category=category)
+                self.assertEqual(len(captured), 4)
+                for query in captured.captured_queries:
+                    with connection.cursor() as cursor:
+                        cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                        plan = [step for *_, step in cursor.fetchall()]
+                    for step in plan:
+                        if 'rating_bucket' in step:
+                            self.assertRegex(step, r'rating_bucket=\?', query['sql'])
+                    if any(step.startswith(f'SCAN {table}') for step in plan):
+                        self.assertFalse(any('TEMP B-TREE' in step for step in plan), query['sql'])
@@ -0,0 +1,125 @@
+"""
+Denormalised counters (counters.py): the per-problem catalog stats and the
+sharded daily challenge completion counters.
+"""
+from datetime import date
+from itertools import cycle
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from .. import counters
+from ..models import CounterShard, DailyChallenge, Problem, Submission
+
+
+class ProblemCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana', password='pw')
+        cls.ion = User.objects.create_user('ion', password='pw')
+        cls.one = Problem.objects.create(question='1 + 0', answer='1', difficulty='easy', category='arithmetic')
+        cls.two = Problem.objects.create(question='1 + 1', answer='2', difficulty='easy', category='arithmetic')
+
+    def counts(self, problem):
+        return Problem.objects.filter(pk=problem.pk).values_list(*counters.COUNTERS).get()
+
+    def solvers(self):
+        return [self.counts(problem)[2] for problem in (self.one, self.two)]
+
+    def test_submissions(self):
+        for answer, correct in [('3', False), ('2', True), ('2', True)]:
+            Submission.objects.create(user=self.ana, problem=self.two, submitted_answer=answer, was_correct=correct)
+        self.assertEqual(self.counts(self.two), (3, 2, 0))
+        self.assertEqual(self.counts(self.one), (0, 0, 0))
+
+    def test_solvers_from_both_sides(self):
+        self.ana.solved_problems.add(self.one, self.two)
+        self.assertEqual(self.solvers(), [1, 1])
+        self.one.solved_by.add(self.ion)
+        self.one.solved_by.add(self.ion)  # Already there: nothing inserted, nothing counted
+        self.assertEqual(self.solvers(), [2, 1])
+        self.one.solved_by.remove(self.ana)
+        self.assertEqual(self.solvers(), [1, 1])
+        self.ion.solved_problems.add(self.two)
+        self.ion.solved_problems.remove(self.one)
+        self.assertEqual(self.solvers(), [0, 2])
+
+    def test_clear_from_both_sides(self):
+        self.ana.solved_problems.add(self.one, self.two)
+        self.ion.solved_problems.add(self.two)
+        self.ana.solved_problems.clear()  # pre_clear remembers which problems lose a solver
+        self.assertEqual(self.solvers(), [0, 1])
+        self.ana.solved_problems.add(self.one)
+        self.two.solved_by.clear()
+        self.assertEqual(self.solvers(), [1, 0])
+
+    def test_reconcile_repairs_drift(self):
+        Submission.objects.create(user=self.ana, problem=self.one, submitted_answer='1', was_correct=True)
+        self.ana.solved_problems.add(self.one)
+        Problem.objects.filter(pk=self.one.pk).update(attempt_count=7, unique_solvers=0)
+
+        drift = counters.reconcile([self.one.pk, self.two.pk])
+        self.assertEqual(drift, {self.one.pk: {'attempt_count': (7, 1), 'unique_solvers': (0, 1)}})
+        self.assertEqual(self.counts(self.one), (1, 1, 1))
+        self.assertEqual(counters.reconcile([self.one.pk, self.two.pk]), {})
+
+
+class ShardedCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(name, password='pw') for name in ('ana', 'ion', 'eva')]
+        problem = Problem.objects.create(question='1 + 1', answer='2', difficulty='easy', category='arithmetic')
+        cls.challenge = DailyChallenge.objects.create(date=date(2025, 3, 1), problem=problem)
+        cls.key = counters.completions_key(cls.challenge.pk)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCounted(self):
+        self.assertEqual(counters.total(self.key, cache_seconds=0), self.challenge.completed_by.count())
+
+    def test_increment_spreads_over_stripes(self):
+        with mock.patch.object(counters.random, 'randrange', side_effect=cycle([0, 5, 9])):
+            for _ in range(7):
+                counters.increment('hits', 2)
+        stripes = dict(CounterShard.objects.filter(name='hits').values_list('shard', 'count'))
+        self.assertEqual(stripes, {0: 6, 5: 4, 9: 4})
+        self.assertEqual(counters.total('hits'), 14)
+
+    def test_total_is_cached(self):
+        counters.increment('hits')
+        self.assertEqual(counters.total('hits'), 1)
+        counters.increment('hits')
+        self.assertEqual(counters.total('hits'), 1)
+        self.assertEqual(counters.total('hits', cache_seconds=0), 2)
+
+    def test_completions_from_both_sides(self):
+        ana, ion, eva = self.users
+        self.challenge.completed_by.add(ana, ion)
+        self.assertCounted()
+        eva.completed_challenges.add(self.challenge)
+        self.challenge.completed_by.add(eva)  # Already there
+        self.assertCounted()
+        ion.completed_challenges.remove(self.challenge)
+        self.assertCounted()
+        ana.completed_challenges.clear()
+        self.assertCounted()
+        self.challenge.completed_by.add(ana)
+        self.challenge.completed_by.clear()
+        self.assertCounted()
+        self.assertEqual(counters.total(self.key, cache_seconds=0), 0)
+
+    def test_reconcile_completions(self):
+        self.challenge.completed_by.add(*self.users)
+        counters.increment(self.key, 5)  # Drift, e.g. rows deleted without the signals
+        self.assertEqual(counters.reconcile_completions(self.challenge), (8, 3))
+        self.assertCounted()
+        self.assertEqual(CounterShard.objects.filter(name=self.key).count(), 1)
+        self.assertIsNone(counters.reconcile_completions(self.challenge))
+
+    def test_deleting_the_challenge_drops_its_counter(self):
+        self.challenge.completed_by.add(*self.users)
+        self.challenge.delete()
+        self.assertFalse(CounterShard.objects.filter(name=self.key).exists())
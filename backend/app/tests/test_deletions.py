@@ -0,0 +1,55 @@
+"""
+Deleting users and problems in the background (deletions.py).
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import deletions, groups
+from ..models import GroupScore, Problem, StudyGroup
+
+
+class UserDeletionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('teacher', password='pw')
+        self.ana = User.objects.create_user('ana', password='pw')
+        self.ion = User.objects.create_user('ion', password='pw')
+
+    def delete_owner(self):
+        deletion = deletions.request_user_deletion(self.owner)
+        self.assertTrue(deletions.process(deletion))
+        self.assertFalse(User.objects.filter(pk=self.owner.pk).exists())
+
+    def test_groups_go_to_the_longest_standing_member(self):
+        group = groups.create_group(self.owner, 'Class 7B')
+        groups.join_group(group, self.ana)
+        groups.join_group(group, self.ion)
+        self.delete_owner()
+
+        group.refresh_from_db()
+        self.assertEqual(group.owner, self.ana)
+        self.assertEqual(set(group.members.all()), {self.ana, self.ion})
+        self.assertTrue(GroupScore.objects.filter(group=group, user=self.ion).exists())
+
+    def test_groups_nobody_else_is_in_are_deleted(self):
+        group = groups.create_group(self.owner, 'Just me')
+        self.delete_owner()
+        self.assertFalse(StudyGroup.objects.filter(pk=group.pk).exists())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ProblemDeletionTests(TestCase):
+    def test_deleted_problems_cannot_be_solved_on_the_map(self):
+        ana = User.objects.create_user('ana', password='pw')
+        problem = Problem.objects.create(question='1+1', answer='2', difficulty='easy', category='arithmetic')
+        deletions.request_problem_deletion(problem)
+
+        self.client.force_login(ana)
+        response = self.client.post(
+            reverse('solve_map_problem'), json.dumps({'problem_id': problem.id, 'answer': '2'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(problem.solved_by.exists())
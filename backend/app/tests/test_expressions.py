@@ -0,0 +1,46 @@
+"""
+Working out answers from question text, as verify_problems does for the problem bank.
+"""
+import ast
+import random
+from fractions import Fraction
+
+from django.test import SimpleTestCase
+
+from .. import expressions
+from ..problem_generator import generate_arithmetic_problem
+
+
+class SolveQuestionTests(SimpleTestCase):
+    def test_question_templates(self):
+        # The formats generate_ai_problems asks for, and the hand-written ones in the bank
+        cases = {
+            '5 * 8': 40,
+            'Solve for x: 2x + 4 = 10': 3,
+            'What is 3/4 * 8/9?': Fraction(2, 3),
+            'what is 3/4 ÷ 1/2?': Fraction(3, 2),
+            'Calculate (12 + 8) × (5 - 3)': 40,
+            'Calculate 1/3 + 1/6?': Fraction(1, 2),
+            '5 + 3 = ?': 8,
+        }
+        for question, answer in cases.items():
+            with self.subTest(question=question):
+                self.assertEqual(expressions.solve_question(question), answer)
+
+    def test_generated_problems(self):
+        rng = random.Random(7)
+        for difficulty in ('easy', 'medium', 'hard'):
+            for _ in range(50):
+                problem = generate_arithmetic_problem(difficulty, rng)
+                self.assertEqual(
+                    expressions.format_number(expressions.solve_question(problem['question'])), problem['answer'],
+                )
+
+    def test_word_problems_are_rejected(self):
+        with self.assertRaises(expressions.ExpressionError):
+            expressions.solve_question('What is half of 10?')
+
+    def test_literals_too_big_for_a_float(self):
+        # 1e400 is inf as a float; Fraction(inf) raises OverflowError, Fraction('inf') ValueError
+        with self.assertRaises(expressions.ExpressionError):
+            expressions._compile(ast.Constant(float('inf')), set())
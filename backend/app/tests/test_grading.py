@@ -0,0 +1,110 @@
+"""
+Grading several answers in one request (grading.py, the check_answer_batch view).
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import grading
+from ..models import Problem, ReviewItem, SkillRating, Submission, UserProfile
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CheckAnswerBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana', password='pw')
+        cls.easy = Problem.objects.create(question='1 + 1', answer='2', difficulty='easy', category='arithmetic')
+        cls.hard = Problem.objects.create(question='x + 1 = 3', answer='2', difficulty='hard', category='algebra')
+
+    def setUp(self):
+        cache.clear()  # Rate-limit buckets
+        self.client.force_login(self.ana)
+
+    def post(self, answers):
+        return self.client.post(
+            reverse('check_answer_batch'), json.dumps({'answers': answers}), content_type='application/json',
+        )
+
+    def test_one_result_per_answer(self):
+        response = self.post([
+            {'problem_id': self.easy.id, 'answer': '2'},
+            {'problem_id': self.hard.id, 'answer': '5'},
+            {'problem_id': self.easy.id},
+            {'problem_id': 999999, 'answer': '2'},
+            {'problem_id': 10 ** 30, 'answer': '2'},
+            'nonsense',
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['points_awarded'], grading.DIFFICULTY_POINTS['easy'])
+        self.assertEqual(data['results'], [
+            {'problem_id': self.easy.id, 'correct': True, 'message': '🎉 Correct!', 'correct_answer': None},
+            {'problem_id': self.hard.id, 'correct': False, 'message': '❌ Incorrect. Try again!', 'correct_answer': '2'},
+            {'error': 'Missing data'},
+            {'problem_id': 999999, 'error': 'Problem not found'},
+            {'problem_id': 10 ** 30, 'error': 'Problem not found'},
+            {'error': 'Missing data'},
+        ])
+        self.assertEqual(Submission.objects.filter(user=self.ana).count(), 2)
+        self.assertEqual(list(self.ana.solved_problems.all()), [self.easy])
+
+    def test_side_effects_match_check_answer(self):
+        self.post([
+            {'problem_id': self.easy.id, 'answer': '3'},
+            {'problem_id': self.easy.id, 'answer': '2'},
+            {'problem_id': self.hard.id, 'answer': '2'},
+        ])
+        self.easy.refresh_from_db()
+        self.assertEqual((self.easy.attempt_count, self.easy.solve_count, self.easy.unique_solvers), (2, 1, 1))
+        self.assertNotEqual(self.easy.rating, None)
+        self.assertEqual(self.easy.rating_bucket, Problem.bucket_for(self.easy.rating))
+        attempts = dict(SkillRating.objects.filter(user=self.ana).values_list('category', 'attempts'))
+        self.assertEqual(attempts, {'arithmetic': 2, 'algebra': 1})
+        # Wrong, then right: queued, then one correct review
+        item = ReviewItem.objects.get(user=self.ana)
+        self.assertEqual((item.problem_id, item.lapses, item.repetitions), (self.easy.id, 1, 1))
+
+    def test_a_problem_solved_twice_in_one_batch_counts_once(self):
+        response = self.post([{'problem_id': self.hard.id, 'answer': '2'}] * 2)
+        self.assertEqual(response.json()['points_awarded'], grading.DIFFICULTY_POINTS['hard'])
+        self.assertEqual(UserProfile.objects.get(user=self.ana).points, grading.DIFFICULTY_POINTS['hard'])
+        self.hard.refresh_from_db()
+        self.assertEqual((self.hard.attempt_count, self.hard.solve_count, self.hard.unique_solvers), (2, 2, 1))
+
+        # ...and so does solving it again in a later batch
+        self.assertEqual(self.post([{'problem_id': self.hard.id, 'answer': '2'}]).json()['points_awarded'], 0)
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        problems = Problem.objects.bulk_create(
+            Problem(question=f'{i} + 0', answer=str(i), difficulty='easy', category='fractions') for i in range(10)
+        )
+
+        def queries(answers):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.post(answers).status_code, 200)
+            return len(captured)
+
+        # A first answer in a category creates the ratings, so warm that up
+        self.post([{'problem_id': problems[0].id, 'answer': 'x'}])
+        few = queries([{'problem_id': p.id, 'answer': p.answer} for p in problems[1:3]])
+        many = queries([{'problem_id': p.id, 'answer': p.answer} for p in problems[3:10]])
+        self.assertEqual(few, many)
+
+    def test_too_many_answers(self):
+        response = self.post([{'problem_id': self.easy.id, 'answer': '2'}] * (grading.MAX_BATCH + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Submission.objects.exists())
+
+    @override_settings(RATE_LIMITS={'check_answer': {'user': (3, 0.001)}})
+    def test_each_answer_costs_a_rate_limit_token(self):
+        self.assertEqual(self.post([{'problem_id': self.easy.id, 'answer': '1'}] * 2).status_code, 200)
+        response = self.post([{'problem_id': self.easy.id, 'answer': '1'}] * 2)  # 1 token left
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(Submission.objects.count(), 2)
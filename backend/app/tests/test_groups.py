@@ -0,0 +1,54 @@
+"""
+Group leaderboards and membership (groups.py).
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase
+
+from .. import groups
+from ..models import GroupScore, StudyGroup
+
+
+class RankTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{i}', password='pw') for i in range(5)]
+        cls.group = groups.create_group(cls.users[0], 'Class 7B')
+        for user, points in zip(cls.users, [50, 30, 30, 10, 0]):
+            groups.join_group(cls.group, user)
+            GroupScore.objects.filter(group=cls.group, user=user, period='all').update(points=points)
+
+    def test_ties_share_a_rank(self):
+        self.assertEqual([groups.rank_of(self.group, user) for user in self.users],
+                         [(1, 50), (2, 30), (2, 30), (4, 10), (5, 0)])
+        self.assertEqual([rank for rank, _, _ in groups.leaderboard(self.group)], [1, 2, 2, 4, 5])
+
+    def test_no_score_this_period(self):
+        self.assertIsNone(groups.rank_of(self.group, self.users[0], 'week'))
+
+    def test_count_stops_at_the_limit(self):
+        with mock.patch.object(groups, 'RANK_COUNT_LIMIT', 3):
+            self.assertEqual(groups.rank_of(self.group, self.users[2]), (2, 30))
+            self.assertEqual(groups.rank_of(self.group, self.users[3]), (None, 10))  # Rank 4: outside the top 3
+            with self.assertNumQueries(2):
+                groups.rank_of(self.group, self.users[4])
+
+
+class CreateGroupTests(TestCase):
+    def test_join_code_collisions_are_retried(self):
+        owner = User.objects.create_user('teacher', password='pw')
+        with mock.patch.object(groups.secrets, 'token_hex', side_effect=['aaaa0000', 'aaaa0000', 'bbbb0000']):
+            first = groups.create_group(owner, 'Class 7A')
+            second = groups.create_group(owner, 'Class 7B')
+        self.assertEqual((first.join_code, second.join_code), ('AAAA0000', 'BBBB0000'))
+        self.assertTrue(second.members.filter(pk=owner.pk).exists())
+
+    def test_gives_up_eventually(self):
+        owner = User.objects.create_user('teacher', password='pw')
+        groups.create_group(owner, 'Class 7A')
+        code = StudyGroup.objects.get().join_code.lower()
+        with mock.patch.object(groups.secrets, 'token_hex', return_value=code), self.assertRaises(IntegrityError):
+            groups.create_group(owner, 'Class 7B')
+        self.assertEqual(StudyGroup.objects.count(), 1)
@@ -0,0 +1,107 @@
+"""
+The database job queue (jobs.py) that run_workers processes drain.
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import jobs
+from ..models import Job
+
+PERIODIC_JOBS = {
+    'streaks': {'command': 'update_streaks', 'at': '00:05'},
+    'rollups': {'command': 'update_rollups', 'every': 300},
+}
+
+
+class ClaimTests(TestCase):
+    def test_oldest_due_job_first(self):
+        now = timezone.now()
+        later = jobs.enqueue('update_streaks', run_at=now - timedelta(minutes=1))
+        first = jobs.enqueue('update_streaks', run_at=now - timedelta(minutes=5))
+        jobs.enqueue('update_streaks', run_at=now + timedelta(minutes=5))  # Not due yet
+
+        self.assertEqual(jobs.claim('a', now), first)
+        self.assertEqual(jobs.claim('b', now), later)
+        self.assertIsNone(jobs.claim('c', now))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.worker, first.attempts), ('running', 'a', 1))
+
+    @mock.patch.object(connection.features, 'has_select_for_update_skip_locked', False)
+    def test_losing_a_claim_race(self):
+        """Another worker takes the job between our SELECT and UPDATE: we move on to the next one."""
+        now = timezone.now()
+        taken = jobs.enqueue('update_streaks', run_at=now - timedelta(minutes=2))
+        free = jobs.enqueue('update_streaks', run_at=now - timedelta(minutes=1))
+        update = QuerySet.update
+
+        def other_worker_first(queryset, **kwargs):
+            if queryset.model is Job and not Job.objects.filter(worker='other').exists():
+                update(Job.objects.filter(pk=taken.pk), status='running', worker='other')
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', other_worker_first):
+            self.assertEqual(jobs.claim('me', now), free)
+        taken.refresh_from_db()
+        self.assertEqual((taken.worker, taken.attempts), ('other', 0))  # Our UPDATE changed nothing
+
+
+class RetryTests(TestCase):
+    def test_backoff_then_failure(self):
+        job = jobs.enqueue('no_such_command', max_attempts=3)
+        now = timezone.now()
+        for attempt, delay in [(1, jobs.RETRY_DELAY), (2, jobs.RETRY_DELAY * 2)]:
+            job = jobs.run(jobs.claim('a', now))
+            self.assertEqual((job.status, job.attempts), ('queued', attempt))
+            self.assertAlmostEqual(job.run_at, timezone.now() + delay, delta=timedelta(seconds=5))
+            self.assertIsNone(jobs.claim('a', now))  # Not due again yet
+            now = job.run_at
+
+        job = jobs.run(jobs.claim('a', now))
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIn('no_such_command', job.error)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(jobs.claim('a', now + timedelta(days=1)))
+
+        jobs.retry(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ('queued', 0, ''))
+
+    def test_stale_jobs_are_requeued(self):
+        now = timezone.now()
+        old = now - jobs.STALE_AFTER - timedelta(minutes=1)
+        orphan = Job.objects.create(command='update_streaks', status='running', started_at=old, attempts=1)
+        spent = Job.objects.create(command='update_streaks', status='running', started_at=old, attempts=3)
+        busy = Job.objects.create(command='update_streaks', status='running', started_at=now, attempts=1)
+
+        self.assertEqual(jobs.requeue_stale(now), 1)
+        for job in (orphan, spent, busy):
+            job.refresh_from_db()
+        self.assertEqual((orphan.status, orphan.worker, orphan.run_at), ('queued', '', now))
+        self.assertEqual(spent.status, 'failed')
+        self.assertEqual(busy.status, 'running')
+
+
+@override_settings(PERIODIC_JOBS=PERIODIC_JOBS)
+class PeriodicJobTests(TestCase):
+    def test_one_open_job_per_schedule(self):
+        self.assertEqual(jobs.schedule_periodic(), 2)
+        self.assertEqual(jobs.schedule_periodic(), 0)
+
+        # Two workers that both saw nothing waiting: the second one's inserts hit the constraint
+        with mock.patch.object(Job.objects, 'filter', return_value=Job.objects.none()):
+            self.assertEqual(jobs.schedule_periodic(), 0)
+        self.assertEqual(Job.objects.filter(periodic='streaks').count(), 1)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(command='update_streaks', periodic='streaks')
+
+    def test_next_run_once_the_last_is_done(self):
+        jobs.schedule_periodic()
+        Job.objects.filter(periodic='rollups').update(status='done')
+        self.assertEqual(jobs.schedule_periodic(), 1)
+        self.assertEqual(Job.objects.filter(periodic='rollups').count(), 2)
@@ -0,0 +1,77 @@
+"""
+Memory budgets for the list pages.
+
+Each page is requested with SMALL rows of everything - enough to fill every
+page - and then with LARGE more (fixtures.py), under tracemalloc. A page fails if its peak allocation is over
+its budget, or if the peak grows by more than GROWTH_KB between the two sizes
+- the sign of a page that loads every row (or every column of a big table)
+instead of one page of just the fields it shows.
+
+LARGE is 10,000 by default. Before changing one of these views, run the suite
+once with 100,000:
+
+    PBMATE_MEMORY_ROWS=100000 python manage.py test app.tests.test_memory
+"""
+import os
+import tracemalloc
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import fixtures
+
+SMALL = 200  # More than the biggest page (ADMIN_PAGE_SIZE), so growth past it is a leak
+LARGE = int(os.environ.get('PBMATE_MEMORY_ROWS', '10000'))
+GROWTH_KB = 256  # Allowed growth of the peak from SMALL to LARGE rows
+
+# url name -> (who asks, peak allocation budget in KB). Most of a peak is the
+# rendered HTML being joined together, not the rows themselves.
+PAGES = {
+    'admin': ('boss', 2560),
+    'admin_problem_list': ('boss', 1536),
+    'my_history': ('ana', 512),
+    'problems': ('ana', 1536),
+}
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], PROFILE_SAMPLE_RATE=0, CACHES=fixtures.TEST_CACHES)
+class MemoryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.base = fixtures.create_base()
+        fixtures.populate(SMALL, cls.base)
+
+    def peak_kb(self, name):
+        """Peak KB allocated while rendering one (uncached) request for `name`."""
+        who, _ = PAGES[name]
+        self.client.force_login(self.base[who])
+        url = reverse(name)
+        self.client.get(url)  # Warm up: template compilation and URL resolving only happen once
+        for alias in caches:
+            caches[alias].clear()
+        tracemalloc.start()
+        try:
+            response = self.client.get(url)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(response.status_code, 200, f'{name} as {who} failed')
+        return peak / 1024
+
+    def test_memory_budgets(self):
+        small = {name: self.peak_kb(name) for name in PAGES}
+        fixtures.populate(LARGE, self.base, seed=1)
+        large = {name: self.peak_kb(name) for name in PAGES}
+
+        for name, (who, budget_kb) in PAGES.items():
+            with self.subTest(url=name):
+                self.assertLessEqual(
+                    large[name], budget_kb,
+                    f'{name} peaked at {large[name]:.0f} KB with {LARGE} rows, budget is {budget_kb} KB',
+                )
+                self.assertLessEqual(
+                    large[name] - small[name], GROWTH_KB,
+                    f'{name} peaked at {small[name]:.0f} KB with {SMALL} rows but {large[name]:.0f} KB '
+                    f'with {LARGE}: is it loading every row?',
+                )
@@ -0,0 +1,48 @@
+"""
+Profiling live requests (profiling.py) under both WSGI and ASGI.
+"""
+import pstats
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import profiling
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], PROFILE_SAMPLE_RATE=0)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = User.objects.create_user('boss', password='pw', is_staff=True)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(PROFILE_DIR=self.directory))
+
+    def profiled_functions(self, response):
+        stats = pstats.Stats(str(self.directory / response['X-Profile-Id']))
+        return {name for _, _, name in stats.stats}
+
+    def test_wsgi(self):
+        self.client.force_login(self.boss)
+        response = self.client.get(reverse('profile'), headers={'X-Profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('profile_view', self.profiled_functions(response))
+
+    async def test_asgi_sees_the_sync_view(self):
+        await self.async_client.aforce_login(self.boss)
+        response = await self.async_client.get(reverse('profile'), headers={'X-Profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('profile_view', self.profiled_functions(response))
+
+    async def test_only_staff_can_ask(self):
+        await self.async_client.aforce_login(await User.objects.acreate_user('ana', password='pw'))
+        response = await self.async_client.get(reverse('profile'), headers={'X-Profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profiling.samples(), {})
@@ -0,0 +1,178 @@
+"""
+Query-count and response-time budgets for every URL in app/urls.py.
+
+Each page is requested as an anonymous visitor, a student and an admin,
+first with 10 rows of everything and then with 10,000 more (fixtures.py).
+A page fails if it runs more queries than its budget, if its query count
+changes between the two sizes (an N+1 or an unbounded loop somewhere), or
+if it's slower than its time budget. Failures list the SQL that ran.
+
+When a page legitimately needs another query, raise its budget here in the
+same commit, so the reviewer sees it.
+"""
+import json
+import time
+
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from . import fixtures
+
+SMALL = 10
+LARGE = 10_000
+DEFAULT_MS = 500  # Generous: the test database runs in memory, but CI machines are slow
+
+ROLES = ['anonymous', 'student', 'admin']
+
+# url name -> how to request it and the most queries it may run as
+# (anonymous, student, admin). Logged-in requests pay 2 for the session and
+# the user; anonymous visitors to login-only pages just get redirected. Cache
+# version counters (cache_versions.py) are read cold here: one query for the
+# ones a page needs, plus one to start any that don't exist yet, and each
+# bump is one upsert.
+# An 'ms' key overrides DEFAULT_MS for a page that's slow on purpose.
+ENDPOINTS = {
+    'home': {'queries': (0, 3, 3)},
+    'signup': {'queries': (0, 3, 3)},
+    'signup_success': {'queries': (0, 3, 3)},
+    'login': {'queries': (0, 3, 3)},
+    'logout': {'queries': (0, 4, 4)},
+    'problems': {'queries': (4, 8, 8)},
+    'practice': {'queries': (0, 4, 4)},
+    'speed_run': {'queries': (0, 4, 4)},
+    'speed_run_race': {'queries': (0, 3, 3)},
+    'get_generated_problem_api': {'queries': (0, 3, 3)},
+    'save_speed_run': {'method': 'post', 'json': {'score': 12}, 'queries': (0, 4, 4)},
+    'check_answer': {
+        'method': 'post', 'json': lambda base: {'problem_id': base['problem'].id, 'answer': '42'},
+        'queries': (0, 25, 28),
+    },
+    'pirate_map': {'queries': (0, 11, 11)},
+    'check_answer_batch': {
+        'method': 'post',
+        'json': lambda base: {'answers': [
+            {'problem_id': base['problem'].id, 'answer': '42'},
+            {'problem_id': base['problem'].id, 'answer': '41'},
+            {'problem_id': 0, 'answer': '1'},
+        ]},
+        'queries': (0, 28, 30),  # Per answer only the rating, counter and review updates repeat
+    },
+    'solve_map_problem': {
+        'method': 'post', 'json': lambda base: {'problem_id': base['problem'].id, 'answer': '42'},
+        'queries': (0, 19, 22),
+    },
+    'advance_checkpoint': {'method': 'post', 'json': {}, 'queries': (0, 4, 4)},
+    'daily_challenge': {'queries': (0, 8, 8)},
+    'check_daily_challenge': {'method': 'post', 'json': {'answer': '42'}, 'queries': (0, 32, 35)},
+    'leaderboard': {'queries': (0, 9, 9)},
+    'live_events': {'kwargs': {'feed': 'leaderboard'}, 'queries': (0, 3, 3)},  # The WSGI snapshot
+    'profile': {'queries': (0, 3, 3)},
+    'edit_profile': {'queries': (0, 3, 3)},
+    'problem_history': {'queries': (2, 6, 6)},
+    'my_history': {'queries': (0, 5, 4)},
+    'review': {'queries': (0, 4, 5)},
+    'groups': {'queries': (0, 4, 4)},
+    'group_detail': {'kwargs': lambda base: {'group_id': base['group'].id}, 'queries': (0, 7, 7)},
+    'admin': {'queries': (0, 2, 7)},
+    'edit_user': {'kwargs': lambda base: {'user_id': base['victim'].id}, 'queries': (0, 2, 4)},
+    'promote_admin': {'method': 'post', 'kwargs': lambda base: {'user_id': base['victim'].id}, 'queries': (0, 2, 6)},
+    'demote_admin': {'method': 'post', 'kwargs': lambda base: {'user_id': base['victim'].id}, 'queries': (0, 2, 6)},
+    'delete_user': {'method': 'post', 'kwargs': lambda base: {'user_id': base['victim'].id}, 'queries': (0, 2, 14)},
+    'admin_problem_list': {'queries': (0, 2, 5)},
+    'admin_problem_add': {'queries': (0, 2, 3)},
+    'admin_problem_edit': {'kwargs': lambda base: {'problem_id': base['problem'].id}, 'queries': (0, 2, 4)},
+    'admin_problem_delete': {
+        'method': 'post', 'kwargs': lambda base: {'problem_id': base['problem'].id}, 'queries': (0, 2, 13),
+    },
+    'export_data': {'queries': (0, 2, 2)},  # Streamed; measured up to the first byte
+    'admin_jobs': {'queries': (0, 2, 6)},
+    'admin_job_retry': {
+        'method': 'post', 'kwargs': lambda base: {'job_id': base['failed_job'].id}, 'queries': (0, 2, 4),
+    },
+    'admin_profiles': {'queries': (0, 2, 3)},
+    'admin_analytics': {'queries': (0, 2, 7)},
+    'static_bundle': {'kwargs': {'filename': 'missing.css'}, 'queries': (0, 0, 0)},
+}
+
+
+def _resolve(value, base):
+    return value(base) if callable(value) else value
+
+
+def _format_queries(queries):
+    return '\n'.join(f'  {i}. {query["sql"]}' for i, query in enumerate(queries, 1))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], PROFILE_SAMPLE_RATE=0, CACHES=fixtures.TEST_CACHES)
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.base = fixtures.create_base()
+        fixtures.populate(SMALL, cls.base)
+
+    def login(self, role):
+        self.client.logout()
+        if role == 'student':
+            self.client.force_login(self.base['ana'])
+        elif role == 'admin':
+            self.client.force_login(self.base['boss'])
+
+    def measure(self, name, role):
+        """(status code, queries, milliseconds) for one request, rolled back afterwards."""
+        spec = ENDPOINTS[name]
+        url = reverse(name, kwargs=_resolve(spec.get('kwargs'), self.base))
+        self.login(role)
+        for alias in caches:
+            caches[alias].clear()
+        with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            if spec.get('method') == 'post':
+                body = _resolve(spec.get('json'), self.base)
+                if body is None:
+                    response = self.client.post(url)
+                else:
+                    response = self.client.post(url, json.dumps(body), content_type='application/json')
+            else:
+                response = self.client.get(url)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+        return response.status_code, captured.captured_queries, elapsed_ms
+
+    def measure_all(self):
+        return {(name, role): self.measure(name, role) for name in ENDPOINTS for role in ROLES}
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in get_resolver('app.urls').url_patterns}
+        self.assertEqual(names - set(ENDPOINTS), set(), 'Add the new URLs to ENDPOINTS')
+        self.assertEqual(set(ENDPOINTS) - names, set(), 'Remove the old URLs from ENDPOINTS')
+
+    def test_query_and_time_budgets(self):
+        small = self.measure_all()
+        fixtures.populate(LARGE, self.base, seed=1)
+        large = self.measure_all()
+
+        for (name, role), (status, queries, elapsed_ms) in large.items():
+            spec = ENDPOINTS[name]
+            with self.subTest(url=name, role=role):
+                self.assertLess(status, 500, f'{name} as {role} crashed')
+                budget = spec['queries'][ROLES.index(role)]
+                small_queries = small[name, role][1]
+                self.assertLessEqual(
+                    len(queries), budget,
+                    f'{name} as {role} ran {len(queries)} queries, budget is {budget}:\n{_format_queries(queries)}',
+                )
+                self.assertEqual(
+                    len(small_queries), len(queries),
+                    f'{name} as {role} ran {len(small_queries)} queries with {SMALL} rows '
+                    f'but {len(queries)} with {LARGE}:\n{_format_queries(queries)}',
+                )
+                time_budget = spec.get('ms', DEFAULT_MS)
+                self.assertLessEqual(
+                    elapsed_ms, time_budget,
+                    f'{name} as {role} took {elapsed_ms:.0f} ms, budget is {time_budget} ms:\n'
+                    f'{_format_queries(queries)}',
+                )
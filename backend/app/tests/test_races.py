@@ -0,0 +1,162 @@
+import asyncio
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import TestCase, TransactionTestCase
+
+from .. import consumers, races, routing
+from ..models import SpeedRunAttempt
+
+
+class RaceRoomTests(TestCase):
+    """The in-memory room, without any networking."""
+
+    def test_same_seed_gives_every_player_the_same_problems(self):
+        room = races.Room('abc', 'medium', seed=42)
+        room.join(1, 'ana')
+        room.join(2, 'ion')
+        room.start(1, now=0)
+        t = races.COUNTDOWN_SECONDS + 1
+
+        for position in range(5):
+            room.answer(1, room.problem(position)['answer'], now=t)
+        room.answer(2, room.problem(0)['answer'], now=t)
+
+        replay = races.Room('xyz', 'medium', seed=42)
+        self.assertEqual(
+            [p['question'] for p in room.problems],
+            [replay.problem(i)['question'] for i in range(len(room.problems))],
+        )
+        self.assertEqual(room.scoreboard(), [{'username': 'ana', 'score': 5}, {'username': 'ion', 'score': 1}])
+
+    def test_grading_and_rules(self):
+        room = races.Room('abc', seed=1)
+        room.join(1, 'ana')
+        room.join(2, 'ion')
+        with self.assertRaises(races.RaceError):
+            room.start(2)  # Not the host
+        room.start(1, now=0)
+        with self.assertRaises(races.RaceError):
+            room.answer(1, '1', now=0)  # Still counting down
+        with self.assertRaises(races.RaceError):
+            room.join(3, 'new')  # Already running
+
+        t = races.COUNTDOWN_SECONDS
+        question = room.problem(0)['question']
+        self.assertEqual(room.answer(1, 'nope', now=t), (False, question))
+        self.assertEqual(room.players[1].score, 0)
+        with self.assertRaises(races.RaceError):
+            room.answer(3, '1', now=t)  # Never joined (or already left)
+        with self.assertRaises(races.RaceError):
+            room.answer(1, room.problem(0)['answer'], now=room.ends_at)
+
+    def test_host_moves_on_and_empty_rooms_are_dropped(self):
+        races.join('gone', 1, 'ana')
+        races.join('gone', 2, 'ion')
+        self.assertEqual(races.leave('gone', 1).host_id, 2)
+        self.assertIsNone(races.leave('gone', 2))
+        self.assertNotIn('gone', races.ROOMS)
+
+    def test_thousands_of_rooms(self):
+        start = time.perf_counter()
+        for i in range(5000):
+            room = races.join(f'load-{i}', 1, 'ana')
+            room.join(2, 'ion')
+            room.start(1, now=0)
+            room.answer(1, room.problem(0)['answer'], now=races.COUNTDOWN_SECONDS)
+        elapsed = time.perf_counter() - start
+        for i in range(5000):
+            races.ROOMS.pop(f'load-{i}')
+        self.assertLess(elapsed, 5)
+
+
+@mock.patch.object(races, 'COUNTDOWN_SECONDS', 0)
+@mock.patch.object(races, 'RACE_SECONDS', 0.5)
+class RaceConsumerTests(TransactionTestCase):
+    """Whole races over the in-process channel layer."""
+
+    def setUp(self):
+        self.ana = User.objects.create_user('ana', password='pw')
+        self.ion = User.objects.create_user('ion', password='pw')
+        self.application = URLRouter(routing.websocket_urlpatterns)
+
+    def communicator(self, user, code):
+        communicator = WebsocketCommunicator(self.application, f'/ws/race/{code}/?difficulty=easy')
+        communicator.scope['user'] = user
+        return communicator
+
+    async def receive_until(self, communicator, message_type):
+        while True:
+            message = await communicator.receive_json_from(timeout=2)
+            if message['type'] == message_type:
+                return message
+
+    def test_race(self):
+        async_to_sync(self.race)()
+        self.assertEqual(
+            sorted(SpeedRunAttempt.objects.values_list('user__username', 'score')),
+            [('ana', 2), ('ion', 0)],
+        )
+
+    async def race(self):
+        ana, ion = self.communicator(self.ana, 'room1'), self.communicator(self.ion, 'room1')
+        self.assertTrue((await ana.connect())[0])
+        self.assertTrue((await ion.connect())[0])
+        lobby = await self.receive_until(ion, 'lobby')
+        self.assertEqual((lobby['host'], lobby['players']), ('ana', ['ana', 'ion']))
+
+        await ion.send_json_to({'type': 'start'})
+        self.assertEqual((await self.receive_until(ion, 'error'))['message'], 'Only the host can start the race.')
+
+        await ana.send_json_to({'type': 'start'})
+        started = [await self.receive_until(c, 'start') for c in (ana, ion)]
+        self.assertEqual(started[0]['question'], started[1]['question'])
+
+        room = races.ROOMS['room1']
+        for position in range(2):
+            await ana.send_json_to({'type': 'answer', 'answer': room.problem(position)['answer']})
+            result = await self.receive_until(ana, 'result')
+            self.assertTrue(result['correct'])
+            self.assertEqual(result['question'], room.problem(position + 1)['question'])
+        progress = await self.receive_until(ion, 'progress')
+        self.assertEqual(progress['players'][0]['username'], 'ana')
+
+        finished = [await self.receive_until(c, 'finished') for c in (ana, ion)]
+        self.assertEqual(finished[0]['results'], [{'username': 'ana', 'score': 2}, {'username': 'ion', 'score': 0}])
+        self.assertNotIn('room1', races.ROOMS)
+        await ana.disconnect()
+        await ion.disconnect()
+
+    def test_finishing_keeps_a_newer_room_with_the_same_code(self):
+        old = races.join('reused', self.ana.id, 'ana')
+        old.start(self.ana.id, now=0)
+        newer = races.ROOMS['reused'] = races.Room('reused')  # Code reused while the results were saved
+        async_to_sync(consumers.finish_race)(old)
+        self.assertIs(races.ROOMS.pop('reused'), newer)
+
+    def test_anonymous_users_are_rejected(self):
+        async def connect():
+            communicator = WebsocketCommunicator(self.application, '/ws/race/room2/')
+            communicator.scope['user'] = AnonymousUser()
+            return await communicator.connect()
+
+        connected, code = async_to_sync(connect)()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    def test_many_concurrent_rooms(self):
+        async def run():
+            communicators = [self.communicator(self.ana, f'many-{i}') for i in range(300)]
+            await asyncio.gather(*(c.connect() for c in communicators))
+            await asyncio.gather(*(c.send_json_to({'type': 'start'}) for c in communicators))
+            finished = await asyncio.gather(*(self.receive_until(c, 'finished') for c in communicators))
+            await asyncio.gather(*(c.disconnect() for c in communicators))
+            return finished
+
+        finished = async_to_sync(run)()
+        self.assertEqual(len(finished), 300)
+        self.assertEqual(SpeedRunAttempt.objects.count(), 300)  # One row per player, one write per race
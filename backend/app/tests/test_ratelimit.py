@@ -0,0 +1,65 @@
+"""
+Token-bucket rate limiting (ratelimit.py).
+"""
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import ratelimit
+
+
+class TakeTokensTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tokens(self, key):
+        return cache.get(key)[0]
+
+    def test_refill(self):
+        bucket = {'b': (5, 0.5)}
+        self.assertEqual(ratelimit.take_tokens(bucket, now=100, count=4), 0)
+        self.assertEqual(self.tokens('b'), 1)
+        self.assertEqual(ratelimit.take_tokens(bucket, now=100, count=3), 4.0)  # 2 missing at 0.5 a second
+        self.assertEqual(ratelimit.take_tokens(bucket, now=104, count=3), 0)
+        self.assertEqual(self.tokens('b'), 0)
+        # Never more than the capacity, however long it's been
+        self.assertEqual(ratelimit.take_tokens(bucket, now=1000, count=1), 0)
+        self.assertEqual(self.tokens('b'), 4)
+
+    def test_all_or_nothing(self):
+        buckets = {'roomy': (10, 1.0), 'tight': (1, 0.1)}
+        self.assertEqual(ratelimit.take_tokens(buckets, now=100), 0)
+        self.assertEqual(ratelimit.take_tokens(buckets, now=100), 10.0)
+        # Turned away by 'tight', so 'roomy' wasn't charged for it
+        self.assertEqual(self.tokens('roomy'), 9)
+        self.assertEqual(self.tokens('tight'), 0)
+
+    def test_wait_is_the_slowest_bucket(self):
+        buckets = {'a': (2, 1.0), 'b': (2, 0.25)}
+        ratelimit.take_tokens(buckets, now=100, count=2)
+        self.assertEqual(ratelimit.take_tokens(buckets, now=100, count=1), 4.0)
+
+
+@override_settings(RATE_LIMITS={'check_answer': {'user': (3, 0.4), 'ip': (100, 10.0)}})
+class LimitExceededTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def request(self, user=None):
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_batch_count_and_retry_after(self):
+        user = User(pk=1, username='ana')
+        self.assertIsNone(ratelimit.limit_exceeded(self.request(user), 'check_answer', count=2))
+        response = ratelimit.limit_exceeded(self.request(user), 'check_answer', count=2)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3')  # 1 token missing at 0.4 a second: 2.5s, rounded up
+        self.assertIsNone(ratelimit.limit_exceeded(self.request(user), 'check_answer', count=1))
+        # The IP bucket paid for the two allowed requests only
+        self.assertAlmostEqual(cache.get('ratelimit:check_answer:ip:10.0.0.1')[0], 97, delta=0.5)
+
+    def test_anonymous_requests_skip_the_user_bucket(self):
+        for _ in range(5):
+            self.assertIsNone(ratelimit.limit_exceeded(self.request(), 'check_answer'))
@@ -0,0 +1,117 @@
+"""
+Hourly and daily submission rollups (rollups.py), in TIME_ZONE (Europe/Bucharest).
+"""
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import rollups
+from ..models import Problem, Submission, SubmissionRollup
+
+
+def local(*args, **kwargs):
+    return timezone.make_aware(datetime(*args, **kwargs))
+
+
+@override_settings(TIME_ZONE='Europe/Bucharest')
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana', password='pw')
+        cls.ion = User.objects.create_user('ion', password='pw')
+        cls.sum = Problem.objects.create(question='1 + 1', answer='2', difficulty='easy', category='arithmetic')
+        cls.eq = Problem.objects.create(question='x + 1 = 3', answer='2', difficulty='hard', category='algebra')
+
+    def submit(self, when, user=None, problem=None, correct=True):
+        submission = Submission.objects.create(
+            user=user or self.ana, problem=problem or self.sum, submitted_answer='2', was_correct=correct,
+        )
+        Submission.objects.filter(pk=submission.pk).update(submitted_at=when)  # Past auto_now_add
+
+    def totals(self, period):
+        return {
+            row.start: (row.submissions, row.correct, row.unique_users)  # UTC, so both 03:00s of a fall-back differ
+            for row in SubmissionRollup.objects.filter(period=period, category='', difficulty='')
+        }
+
+    def test_bucket_boundaries(self):
+        self.submit(local(2025, 5, 6, 10, 59, 59, 999999))
+        self.submit(local(2025, 5, 6, 11, 0), user=self.ion, correct=False)
+        self.submit(local(2025, 5, 6, 23, 59, 59, 999999))
+        self.submit(local(2025, 5, 7, 0, 0))  # The end of the range: not rolled up
+        rollups.recompute(local(2025, 5, 6), local(2025, 5, 7))
+
+        self.assertEqual(self.totals('day'), {local(2025, 5, 6): (3, 2, 2)})
+        self.assertEqual(self.totals('hour'), {
+            local(2025, 5, 6, 10): (1, 1, 1),
+            local(2025, 5, 6, 11): (1, 0, 1),
+            local(2025, 5, 6, 23): (1, 1, 1),
+        })
+
+    def test_breakdown_rows(self):
+        self.submit(local(2025, 5, 6, 9))
+        self.submit(local(2025, 5, 6, 9, 30), user=self.ion)
+        self.submit(local(2025, 5, 6, 10), problem=self.eq, correct=False)
+        rollups.recompute(local(2025, 5, 6), local(2025, 5, 7))
+
+        days = SubmissionRollup.objects.filter(period='day').exclude(category='')
+        self.assertEqual(
+            {(row.category, row.difficulty): (row.submissions, row.correct, row.unique_users) for row in days},
+            {('arithmetic', 'easy'): (2, 2, 2), ('algebra', 'hard'): (1, 0, 1)},
+        )
+        self.assertEqual(self.totals('day'), {local(2025, 5, 6): (3, 2, 2)})  # ana counted once
+        self.assertEqual(
+            rollups.breakdown('category', local(2025, 5, 1)),
+            [{'category': 'arithmetic', 'submissions': 2, 'correct': 2},
+             {'category': 'algebra', 'submissions': 1, 'correct': 0}],
+        )
+
+    def test_dst_days(self):
+        # 30 March 2025 has 23 hours (03:00 doesn't exist), 26 October 25 (03:00 happens twice)
+        self.submit(local(2025, 3, 30, 0, 30))
+        self.submit(local(2025, 3, 30, 23, 30))
+        fall_back = local(2025, 10, 26, 3, 30, fold=0)  # The first 03:30, still summer time
+        self.submit(fall_back)
+        self.submit(fall_back + timedelta(hours=1))  # The second 03:30
+        rollups.recompute(local(2025, 3, 30), local(2025, 3, 31))
+        rollups.recompute(local(2025, 10, 26), local(2025, 10, 27))
+
+        self.assertEqual(self.totals('day'), {local(2025, 3, 30): (2, 2, 1), local(2025, 10, 26): (2, 2, 1)})
+        self.assertEqual(len(self.totals('hour')), 4)  # Both 03:30s have an hour of their own
+
+        spring = rollups.series('hour', local(2025, 3, 30), until=local(2025, 3, 30, 23))
+        self.assertEqual(len(spring), 23)
+        self.assertEqual([point['submissions'] for point in spring if point['submissions']], [1, 1])
+        autumn = rollups.series('hour', local(2025, 10, 26), until=local(2025, 10, 26, 23))
+        self.assertEqual(len(autumn), 25)
+        self.assertEqual([point['submissions'] for point in autumn if point['submissions']], [1, 1])
+
+        days = rollups.series('day', local(2025, 10, 25), until=local(2025, 10, 27))
+        self.assertEqual([point['start'] for point in days],
+                         [local(2025, 10, 25), local(2025, 10, 26), local(2025, 10, 27)])
+        self.assertEqual([point['submissions'] for point in days], [0, 2, 0])
+
+    def test_reruns_are_idempotent(self):
+        self.submit(local(2025, 5, 6, 9))
+        self.submit(local(2025, 5, 8, 9), user=self.ion)
+        now = local(2025, 5, 8, 12)
+        with mock.patch.object(rollups.timezone, 'now', return_value=now):
+            chunks = list(rollups.catch_up(chunk_days=1))
+            self.assertEqual([(start, stop) for start, stop, _ in chunks],
+                             [(local(2025, 5, 6), local(2025, 5, 7)), (local(2025, 5, 7), local(2025, 5, 8)),
+                              (local(2025, 5, 8), local(2025, 5, 9))])
+            first = self.totals('hour'), SubmissionRollup.objects.count()
+
+            # Again from the start, and from where it left off: nothing is counted twice
+            list(rollups.catch_up(since=local(2025, 5, 6)))
+            list(rollups.catch_up())
+            self.assertEqual((self.totals('hour'), SubmissionRollup.objects.count()), first)
+
+            # An answer committed late into an hour already rolled up is picked up
+            self.submit(local(2025, 5, 8, 9, 30))
+            list(rollups.catch_up())
+        self.assertEqual(self.totals('hour')[local(2025, 5, 8, 9)], (2, 2, 2))
+        self.assertEqual(self.totals('day')[local(2025, 5, 6)], (1, 1, 1))
@@ -0,0 +1,72 @@
+"""
+The streamed responses: live Server-Sent Events feeds and the staff export.
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import live
+from ..models import Problem, Submission, UserProfile
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class LiveEventsTests(TestCase):
+    def test_anonymous_visitors_are_sent_to_login(self):
+        response = self.client.get(reverse('live_events', args=['leaderboard']))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+    async def test_asgi_gets_the_stream(self):
+        await self.async_client.aforce_login(await User.objects.acreate_user('ana', password='pw'))
+        response = await self.async_client.get(reverse('live_events', args=['leaderboard']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.streaming)
+
+    def test_wsgi_gets_one_event(self):
+        """An endless stream would pin a WSGI worker; EventSource polls instead."""
+        ana = User.objects.create_user('ana', password='pw')
+        UserProfile.objects.filter(user=ana).update(points=7)
+        self.client.force_login(ana)
+        response = self.client.get(reverse('live_events', args=['leaderboard']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertFalse(response.streaming)
+        retry, event = response.content.decode().split('\n\n', 1)
+        self.assertEqual(retry, f'retry: {live.SNAPSHOT_RETRY_MS}')
+        self.assertIn('event: leaderboard\ndata: ', event)
+        self.assertIn('"points": 7', event)
+
+    def test_unknown_feeds_are_404(self):
+        self.client.force_login(User.objects.create_user('ana', password='pw'))
+        self.assertEqual(self.client.get(reverse('live_events', args=['nope'])).status_code, 404)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ExportStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = User.objects.create_user('boss', password='pw', is_staff=True)
+        problem = Problem.objects.create(question='1+1', answer='2', difficulty='easy', category='arithmetic')
+        Submission.objects.create(user=cls.boss, problem=problem, submitted_answer='2', was_correct=True)
+
+    def check_csv(self, body):
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 2)  # Header and the one submission
+        self.assertIn('boss', lines[1])
+
+    async def test_asgi_gets_an_async_stream(self):
+        """A sync generator would be read into memory whole by the ASGI handler."""
+        await self.async_client.aforce_login(self.boss)
+        response = await self.async_client.get(reverse('export_data'), {'dataset': 'submissions', 'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.check_csv(b''.join([chunk async for chunk in response.streaming_content]))
+
+    def test_wsgi_gets_a_sync_stream(self):
+        """An async iterator would be read into memory whole by the WSGI handler."""
+        self.client.force_login(self.boss)
+        response = self.client.get(reverse('export_data'), {'dataset': 'submissions', 'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        self.check_csv(b''.join(response.streaming_content))
@@ -0,0 +1,47 @@
+"""
+Recording anonymised traffic (traffic.py) under both WSGI and ASGI.
+"""
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import traffic
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], PROFILE_SAMPLE_RATE=0, TRAFFIC_CAPTURE=True)
+class TrafficCaptureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana', password='pw')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(TRAFFIC_DIR=self.directory))
+        self.enterContext(mock.patch.object(traffic, 'FLUSH_EVERY', 1))  # Write every line straight away
+
+    def recorded(self):
+        return traffic.read(traffic.trace_files())
+
+    def test_wsgi(self):
+        self.client.force_login(self.ana)
+        self.client.get(reverse('profile'), {'page': '2', 'email': 'ana@example.com'})
+        [line] = self.recorded()
+        self.assertEqual((line['view'], line['status'], line['query']), ('profile', 200, {'page': '2', 'email': ''}))
+        self.assertEqual(line['user'], traffic.user_bucket(self.ana))
+
+    async def test_asgi(self):
+        await self.async_client.aforce_login(self.ana)
+        await self.async_client.get(reverse('profile'))
+        [line] = self.recorded()
+        self.assertEqual((line['view'], line['status']), ('profile', 200))
+        self.assertEqual(line['user'], traffic.user_bucket(self.ana))
+
+    def test_replays_are_not_recorded(self):
+        self.client.get(reverse('login'), headers={'X-Traffic-Replay': '1'})
+        self.assertEqual(self.recorded(), [])
@@ -0,0 +1,200 @@
+"""
+Recording real traffic so `manage.py replay_traffic` can play it back.
+
+TrafficCaptureMiddleware (on when settings.TRAFFIC_CAPTURE is set) writes one
+JSON line per request to hourly gzip files in TRAFFIC_DIR:
+
+    {"t": 1718000000.123, "view": "check_answer", "method": "POST",
+     "path": "/api/check-answer/", "query": {}, "body": {"problem_id": 812, "answer": "<str:3>"},
+     "user": "student:17", "status": 200, "ms": 14.2}
+
+Nothing in it identifies a person:
+
+    - users are reduced to a role and one of TRAFFIC_USER_BUCKETS buckets
+      (a keyed hash of the id), which is enough to replay one user's
+      requests on one session without knowing who they were
+    - JSON bodies keep their shape: numbers and booleans stay (problem ids,
+      scores), strings become "<str:N>"; form bodies are dropped
+    - query values outside SAFE_QUERY_KEYS and user ids in the path are blanked
+
+Lines are buffered and appended in batches, so a request pays for a
+json.dumps() and nothing else. Under ASGI the batch is written from a
+worker thread, off the event loop. Replayed requests carry REPLAY_HEADER
+and aren't recorded again.
+"""
+import atexit
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import NoReverseMatch, reverse
+
+REPLAY_HEADER = 'HTTP_X_TRAFFIC_REPLAY'
+SKIP_PREFIXES = ('/static/', '/bundles/', '/admin/')
+SAFE_QUERY_KEYS = {'difficulty', 'category', 'page', 'status', 'view', 'project', 'dataset', 'format'}
+PRIVATE_KWARGS = {'user_id'}
+FLUSH_EVERY = 200  # lines
+FLUSH_SECONDS = 5.0
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()  # One append at a time, or two batches could interleave in the gzip stream
+_buffer = []
+_last_flush = time.monotonic()
+
+
+def user_bucket(user):
+    if not user.is_authenticated:
+        return 'anonymous'
+    role = 'staff' if user.is_staff or user.is_superuser else 'student'
+    digest = hmac.new(settings.SECRET_KEY.encode(), str(user.pk).encode(), hashlib.sha256).digest()
+    return f'{role}:{int.from_bytes(digest[:4], "big") % settings.TRAFFIC_USER_BUCKETS}'
+
+
+def body_shape(value):
+    """The value with every string replaced by its length."""
+    if isinstance(value, dict):
+        return {str(key): body_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [body_shape(item) for item in value]
+    if isinstance(value, str):
+        return f'<str:{len(value)}>'
+    return value  # Numbers, booleans, None
+
+
+def anonymous_path(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not PRIVATE_KWARGS & set(match.kwargs):
+        return request.path
+    kwargs = {key: 0 if key in PRIVATE_KWARGS else value for key, value in match.kwargs.items()}
+    try:
+        return reverse(match.view_name, kwargs=kwargs)
+    except NoReverseMatch:
+        return request.path
+
+
+def trace(request, user, response, elapsed_ms):
+    body = None
+    if request.method == 'POST' and request.content_type == 'application/json':
+        try:
+            body = body_shape(json.loads(request.body or b'null'))
+        except ValueError:
+            body = '<invalid>'
+    match = getattr(request, 'resolver_match', None)
+    return {
+        't': round(time.time(), 3),
+        'view': match.view_name if match else 'unresolved',
+        'method': request.method,
+        'path': anonymous_path(request),
+        'query': {key: value if key in SAFE_QUERY_KEYS else '' for key, value in request.GET.items()},
+        'body': body,
+        'form': request.method == 'POST' and body is None,
+        'user': user_bucket(user),
+        'status': response.status_code,
+        'ms': round(elapsed_ms, 2),
+    }
+
+
+class TrafficCaptureMiddleware:
+    """Put it after AuthenticationMiddleware. Removes itself when TRAFFIC_CAPTURE is off."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_CAPTURE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        atexit.register(flush)  # Don't lose the last few seconds on shutdown
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if skip(request):
+            return self.get_response(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        lines = record(trace(request, request.user, response, (time.perf_counter() - start) * 1000))
+        write(lines)
+        return response
+
+    async def __acall__(self, request):
+        if skip(request):
+            return await self.get_response(request)
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        lines = record(trace(request, await request.auser(), response, elapsed_ms))
+        if lines:
+            await sync_to_async(write, thread_sensitive=False)(lines)
+        return response
+
+
+def skip(request):
+    return request.META.get(REPLAY_HEADER) or request.path.startswith(SKIP_PREFIXES)
+
+
+def record(line):
+    """Buffer one line. Returns the lines to write() when it's time to flush, else []."""
+    global _last_flush
+    text = json.dumps(line, separators=(',', ':'))
+    with _lock:
+        _buffer.append(text)
+        if len(_buffer) < FLUSH_EVERY and time.monotonic() - _last_flush < FLUSH_SECONDS:
+            return []
+        lines = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    return lines
+
+
+def flush():
+    with _lock:
+        lines = _buffer[:]
+        _buffer.clear()
+    write(lines)
+
+
+def write(lines):
+    """
+    Append to this hour's file for this process, so two processes never write
+    into the same gzip stream (members can be concatenated, interleaved bytes
+    can't), and drop files older than TRAFFIC_KEEP_HOURS.
+    """
+    if not lines:
+        return
+    with _write_lock:
+        directory = Path(settings.TRAFFIC_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{time.strftime("traffic-%Y%m%d-%H")}-{os.getpid()}.jsonl.gz'
+        with gzip.open(path, 'at', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+    cutoff = time.time() - settings.TRAFFIC_KEEP_HOURS * 3600
+    for old in directory.glob('traffic-*.jsonl.gz'):
+        try:
+            if old.stat().st_mtime < cutoff:
+                old.unlink()
+        except FileNotFoundError:
+            pass  # Another process pruned it first
+
+
+def read(paths):
+    """Every recorded request in `paths`, oldest first."""
+    lines = []
+    for path in paths:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines.extend(json.loads(line) for line in f if line.strip())
+    return sorted(lines, key=lambda line: line['t'])
+
+
+def trace_files():
+    return sorted(Path(settings.TRAFFIC_DIR).glob('traffic-*.jsonl.gz'))
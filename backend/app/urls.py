@@ -12,11 +12,13 @@ urlpatterns = [
     
     # --- SPEED RUN ---
     path('speed-run/', views.speed_run_view, name='speed_run'),
+    path('speed-run/race/', views.speed_run_race_view, name='speed_run_race'),
     path('api/get-generated-problem/', views.get_generated_problem_api, name='get_generated_problem_api'),
     path('api/save-speed-run/', views.save_speed_run_view, name='save_speed_run'),
     # --------------------------------------
 
     path('api/check-answer/', views.check_answer, name='check_answer'), # Checks DB problems
+    path('api/check-answers/', views.check_answer_batch, name='check_answer_batch'), # Several at once
     
     # Pirate Map Journey
     path('pirate-map/', views.pirate_map_view, name='pirate_map'),
@@ -26,10 +28,14 @@ urlpatterns = [
     path('daily-challenge/', views.daily_challenge_view, name='daily_challenge'),
     path('api/check-daily-challenge/', views.check_daily_challenge, name='check_daily_challenge'),
     path('leaderboard/', views.leaderboard_view, name = 'leaderboard'),
+    path('live/<str:feed>/', views.live_events, name='live_events'),
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.edit_profile_view, name='edit_profile'),
     path('problem-history/', views.problem_history_view, name='problem_history'),
     path('my-history/', views.my_history_view, name='my_history'),
+    path('review/', views.review_view, name='review'),
+    path('groups/', views.groups_view, name='groups'),
+    path('groups/<int:group_id>/', views.group_detail_view, name='group_detail'),
     
     path('admin-dashboard/', views.admin_view, name='admin'),
     path('manage/edit/<int:user_id>/', views.edit_user, name='edit_user'),
@@ -42,4 +48,12 @@ urlpatterns = [
     path('dashboard/problems/add/', views.admin_problem_add, name='admin_problem_add'),
     path('dashboard/problems/edit/<int:problem_id>/', views.admin_problem_edit, name='admin_problem_edit'),
     path('dashboard/problems/delete/<int:problem_id>/', views.admin_problem_delete, name='admin_problem_delete'),
+    path('dashboard/export/', views.export_data, name='export_data'),
+    path('dashboard/jobs/', views.admin_jobs, name='admin_jobs'),
+    path('dashboard/jobs/<int:job_id>/retry/', views.admin_job_retry, name='admin_job_retry'),
+    path('dashboard/profiles/', views.admin_profiles, name='admin_profiles'),
+    path('dashboard/analytics/', views.admin_analytics, name='admin_analytics'),
+
+    # Hashed CSS/JS bundles (see build_bundles)
+    path('bundles/<str:filename>', views.static_bundle, name='static_bundle'),
 ]
\ No newline at end of file
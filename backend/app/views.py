@@ -3,17 +3,46 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User as AuthUser
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_http_methods
 from datetime import date, timedelta # Import timedelta
 import json
 
 from .forms import LoginForm, UserRegistrationForm, ProblemForm
 # --- IMPORT SpeedRunAttempt ---
-from .models import Problem, Submission, DailyChallenge, UserProfile, SpeedRunAttempt, MapCheckpoint, UserProgress
+from .models import (
+    Problem, Submission, DailyChallenge, UserProfile, SpeedRunAttempt, MapCheckpoint, UserProgress,
+    StudyGroup, GroupMembership, Job, PendingDeletion,
+)
 # --- NEW: Import the generator ---
 from . import problem_generator 
+from . import adaptive
+from . import cache_versions
+from . import counters
+from . import deletions
+from . import exports
+from . import expressions
+from . import grading
+from . import groups
+from . import jobs
+from . import live
+from . import profiling
+from . import races
+from . import reviews
+from . import rollups
+from .cache_versions import conditional_page
+from .ratelimit import limit_exceeded, rate_limit
+from .templatetags import bundles
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.connection import ConnectionProxy
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 
 # Andi
@@ -54,8 +83,8 @@ def daily_challenge_view(request):
         submitted_at__date=date.today()
     ).order_by('-submitted_at')
 
-    # Calculate stats
-    total_completions = today_challenge.completed_by.count()
+    # Calculate stats (sharded counter, so the morning rush doesn't COUNT on every view)
+    total_completions = counters.total(counters.completions_key(today_challenge.pk))
     
     # --- NEW: Get current streak ---
     current_streak = 0
@@ -79,6 +108,7 @@ def daily_challenge_view(request):
 
 @login_required
 @require_http_methods(["POST"])
+@rate_limit('check_daily_challenge')
 def check_daily_challenge(request):
     """AJAX endpoint to check daily challenge answer"""
     try:
@@ -95,28 +125,8 @@ def check_daily_challenge(request):
         already_completed = today_challenge.is_completed_by(request.user)
 
         # --- FIX: Safe Answer Checking ---
-        # The 'answer' field is a string like "579". Just cast to int.
-        try:
-            correct_answer = int(problem.answer)
-        except ValueError:
-            # --- FALLBACK FOR NON-INT ANSWERS (like fractions) ---
-            try:
-                # Try float
-                correct_answer = float(problem.answer)
-            except ValueError:
-                # Fallback to string
-                correct_answer = str(problem.answer)
-
-
-        try:
-            user_answer_value = int(user_answer)
-        except ValueError:
-             try:
-                 user_answer_value = float(user_answer)
-             except ValueError:
-                 user_answer_value = str(user_answer)
-
-        is_correct = (user_answer_value == correct_answer)
+        # Exact comparison, so fraction answers work too (see expressions.py)
+        is_correct, correct_answer = expressions.check_answer(user_answer, problem.answer)
 
         # Save submission
         Submission.objects.create(
@@ -131,14 +141,14 @@ def check_daily_challenge(request):
         if is_correct and not already_completed:
             today_challenge.completed_by.add(request.user)
             # Avoid adding points if already solved via normal problems view
-            if request.user not in problem.solved_by.all():
+            if not problem.solved_by.filter(pk=request.user.pk).exists():
                  problem.solved_by.add(request.user)
 
             # --- NEW: Award Bonus Points & Update Streak ---
             try:
                 profile = request.user.userprofile
                 bonus_points_awarded = today_challenge.bonus_points
-                profile.points += bonus_points_awarded
+                profile.add_points(bonus_points_awarded)
                 
                 # --- Streak Logic (UNCOMMENTED AND IMPLEMENTED) ---
                 today = date.today()
@@ -150,7 +160,7 @@ def check_daily_challenge(request):
                     profile.current_streak = 1
                 
                 profile.last_daily_challenge_date = today
-                profile.save()
+                profile.save(update_fields=['current_streak', 'last_daily_challenge_date'])
                 
             except UserProfile.DoesNotExist:
                 pass # User profile not found, just skip
@@ -285,40 +295,131 @@ def edit_profile_view(request):
 # ... (rest of the views remain the same) ...
 
 # --- NEW FEATURE: My History View ---
+HISTORY_PAGE_SIZE = 50
+HISTORY_FIELDS = ('submitted_at', 'was_correct', 'submitted_answer', 'problem__id', 'problem__question')
+
 @login_required
 def my_history_view(request):
     """Show a list of the current user's past submissions."""
     submissions = Submission.objects.filter(
         user=request.user
-    ).select_related('problem').order_by('-submitted_at')
-    
+    ).select_related('problem').order_by('-submitted_at').only(*HISTORY_FIELDS)
+    page = Paginator(submissions, HISTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+
     context = {
-        'submissions': submissions
+        'submissions': page,
+        'page_obj': page,
     }
     return render(request, 'app/my_history.html', context)
 
 
+# --- NEW FEATURE: Spaced-repetition review mode ---
+REVIEW_BATCH_SIZE = 20 # Reviews shown at once on the review page
+
+@login_required
+def review_view(request):
+    """Problems the user got wrong earlier that are due for review now."""
+    due_items = list(reviews.due_reviews(request.user, limit=REVIEW_BATCH_SIZE))
+    context = {
+        'due_items': due_items,
+        'next_due_at': None if due_items else reviews.next_due_at(request.user),
+    }
+    return render(request, 'app/review.html', context)
+
+
+# --- NEW FEATURE: Class / team leaderboards ---
+@login_required
+def groups_view(request):
+    """The user's groups, plus forms to create one or join one with a code."""
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'create':
+            name = request.POST.get('name', '').strip()
+            kind = request.POST.get('kind', 'class')
+            if not name or kind not in dict(StudyGroup.KIND_CHOICES):
+                messages.error(request, 'Please give the group a name.')
+            else:
+                group = groups.create_group(request.user, name[:100], kind)
+                messages.success(request, f'Group "{group.name}" created! Share the code {group.join_code} to invite people.')
+                return redirect('group_detail', group_id=group.id)
+        elif action == 'join':
+            code = request.POST.get('join_code', '').strip().upper()
+            group = StudyGroup.objects.filter(join_code=code).first()
+            if group is None:
+                messages.error(request, 'No group with that code.')
+            else:
+                if groups.join_group(group, request.user):
+                    messages.success(request, f'Welcome to {group.name}!')
+                return redirect('group_detail', group_id=group.id)
+        return redirect('groups')
+
+    context = {
+        'groups': request.user.study_groups.order_by('name'),
+        'kind_choices': StudyGroup.KIND_CHOICES,
+    }
+    return render(request, 'app/groups.html', context)
+
+
+@login_required
+def group_detail_view(request, group_id):
+    """One group's leaderboard for the chosen period (?period=week|month|all)."""
+    group = get_object_or_404(StudyGroup, id=group_id)
+    is_member = GroupMembership.objects.filter(group=group, user=request.user).exists()
+    if not (is_member or is_admin(request.user)):
+        raise Http404
+
+    if request.method == 'POST' and request.POST.get('action') == 'leave' and is_member:
+        groups.leave_group(group, request.user)
+        messages.success(request, f'You left {group.name}.')
+        return redirect('groups')
+
+    period = request.GET.get('period', 'week')
+    if period not in dict(groups.PERIOD_CHOICES):
+        period = 'week'
+    context = {
+        'group': group,
+        'period': period,
+        'period_choices': groups.PERIOD_CHOICES,
+        'board': groups.leaderboard(group, period),
+        'my_rank': groups.rank_of(group, request.user, period) if is_member else None,
+        'rank_limit': groups.RANK_COUNT_LIMIT,
+        'is_member': is_member,
+    }
+    return render(request, 'app/group_detail.html', context)
+
+
 # Casi
 from django.contrib.auth.decorators import login_required, user_passes_test
 
 
 def is_admin(user):
     return user.is_staff or user.is_superuser
+
+
+# How long page data keyed by a cache_versions counter is kept. Old keys are
+# never read again once the counter moves, so this only bounds memory use.
+PAGE_DATA_CACHE_TIMEOUT = 60 * 60
+page_cache = ConnectionProxy(caches, 'pages')  # Not caches['pages']: follows CACHES overrides in tests
+@conditional_page('history')
 def problem_history_view(request):
     """Global history of solved problems (no answers shown).
     Shows one row per (user, problem) with the latest solve time.
     """
-    # Filter only correct submissions
-    solved_qs = Submission.objects.filter(was_correct=True)
-    # Reduce to one entry per (user, problem) by taking latest submitted_at
-    # Using values + annotate for portability across SQLite/Postgres
-    from django.db.models import Max
-    aggregated = (
-        solved_qs
-        .values('user__id', 'user__username', 'problem__id', 'problem__question')
-        .annotate(latest_solved_at=Max('submitted_at'))
-        .order_by('-latest_solved_at')[:50] # Limit to latest 50 for performance
-    )
+    key = f"problem_history:{cache_versions.get_version('history')}"
+    aggregated = page_cache.get(key)
+    if aggregated is None:
+        # Filter only correct submissions
+        solved_qs = Submission.objects.filter(was_correct=True)
+        # Reduce to one entry per (user, problem) by taking latest submitted_at
+        # Using values + annotate for portability across SQLite/Postgres
+        from django.db.models import Max
+        aggregated = list(
+            solved_qs
+            .values('user__id', 'user__username', 'problem__id', 'problem__question')
+            .annotate(latest_solved_at=Max('submitted_at'))
+            .order_by('-latest_solved_at')[:50] # Limit to latest 50 for performance
+        )
+        page_cache.set(key, aggregated, PAGE_DATA_CACHE_TIMEOUT)
 
     context = {
         'entries': aggregated,
@@ -326,14 +427,36 @@ def problem_history_view(request):
     return render(request, 'app/problem_history.html', context)
 
 
+ADMIN_PAGE_SIZE = 100
+# Only what the admin tables show; anything else would be one query per row
+ADMIN_USER_FIELDS = ('id', 'username', 'email', 'is_staff', 'is_superuser', 'is_active', 'date_joined')
+ADMIN_PROBLEM_FIELDS = ('id', 'question', 'answer', 'difficulty', 'category', 'created_at')
+
+
 @login_required
 @user_passes_test(is_admin)
 def admin_view(request):
-    users = AuthUser.objects.all()
-    total_users = users.count()
+    # Users queued for deletion are already gone as far as the dashboard is concerned
+    users = AuthUser.objects.exclude(id__in=deletions.pending_user_ids())
+    stats = users.aggregate(
+        total=Count('id'),
+        admins=Count('id', filter=Q(is_staff=True) | Q(is_superuser=True)),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+    query = request.GET.get('q', '').strip()
+    if query:
+        users = users.filter(Q(username__icontains=query) | Q(email__icontains=query))
+    # Just the columns the table shows (no password hashes, no last_login...)
+    rows = users.order_by('id').only(*ADMIN_USER_FIELDS)
+    page = Paginator(rows, ADMIN_PAGE_SIZE).get_page(request.GET.get('page'))
     return render(request, 'app/admin.html', {
-        'users': users,
-        'total_users': total_users
+        'users': page,
+        'page_obj': page,
+        'query': query,
+        'total_users': stats['total'],
+        'admin_count': stats['admins'],
+        'active_count': stats['active'],
+        'open_deletions': PendingDeletion.objects.filter(finished_at__isnull=True).count(),
     })
 
 
@@ -345,7 +468,8 @@ def delete_user(request, user_id):
     try:
         user_to_delete = AuthUser.objects.get(id=user_id)
         if user_to_delete != request.user:  # Prevent self-deletion
-            user_to_delete.delete()
+            # Deactivated now, rows removed in the background by process_deletions
+            deletions.request_user_deletion(user_to_delete, requested_by=request.user)
             messages.success(request, f'User {user_to_delete.username} has been deleted.')
         else:
             messages.error(request, 'You cannot delete your own account.')
@@ -420,67 +544,138 @@ def demote_user(request, user_id):
 
 
 @login_required
+@conditional_page('leaderboard')
 def leaderboard_view(request):
-    # --- FIX: Efficient Leaderboard Query ---
-    # Get top 100 users ordered by points
-    leaderboard_profiles = UserProfile.objects.select_related('user').order_by('-points')[:100]
-
-    # Get stats
-    total_users = AuthUser.objects.count()
-    total_problems = Problem.objects.count()
-    # Total solved (sum of all points) isn't as useful as total correct submissions
-    total_solved = Submission.objects.filter(was_correct=True).count()
-
-    return render(request, 'app/leaderboard.html', {
-        'leaderboard': leaderboard_profiles, # Pass UserProfile objects
-        'total_users': total_users,
-        'total_problems': total_problems,
-        'total_solved': total_solved
-    })
+    key = f"leaderboard:{cache_versions.get_version('leaderboard')}"
+    context = page_cache.get(key)
+    if context is None:
+        # --- FIX: Efficient Leaderboard Query ---
+        # Get top 100 users ordered by points
+        leaderboard_profiles = list(
+            UserProfile.objects.select_related('user').filter(user__is_active=True).order_by('-points')[:100]
+        )
+
+        # Get stats
+        total_users = AuthUser.objects.count()
+        total_problems = Problem.objects.count()
+        # Total solved (sum of all points) isn't as useful as total correct submissions
+        total_solved = Submission.objects.filter(was_correct=True).count()
+
+        context = {
+            'leaderboard': leaderboard_profiles, # Pass UserProfile objects
+            'total_users': total_users,
+            'total_problems': total_problems,
+            'total_solved': total_solved
+        }
+        page_cache.set(key, context, PAGE_DATA_CACHE_TIMEOUT)
+
+    return render(request, 'app/leaderboard.html', context)
+
+
+@login_required  # Same audience as the leaderboard and daily challenge pages
+async def live_events(request, feed):
+    """Server-Sent Events stream of a live feed (leaderboard, daily). One event under WSGI (see live.py)."""
+    if feed not in live.FEEDS:
+        raise Http404
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(live.event_stream(feed), content_type='text/event-stream')
+    else:
+        response = HttpResponse(await sync_to_async(live.snapshot)(feed), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
 
 
 # Codrin
 
+CATALOG_PAGE_SIZE = 60
+CATALOG_FIELDS = ('id', 'question', 'answer', 'difficulty', 'category', 'attempt_count', 'solve_count', 'unique_solvers')
+CATALOG_SORTS = {
+    'popular': ('-attempt_count', 'id'),  # problem_popularity_idx
+    'solved': ('-unique_solvers', 'id'),  # problem_solvers_idx
+}
+
+
+def catalog_problems(difficulty_filter, category_filter, page_number=1, sort=None):
+    """
+    One page of the filtered problem list, cached until the catalog or its
+    stats change (see counters.py). Returns (catalog version, page).
+    """
+    catalog_version = cache_versions.get_version('catalog')
+    stats_version = cache_versions.get_version('catalog_stats')
+    key = f'catalog:{catalog_version}:{stats_version}:{difficulty_filter}:{category_filter}:{sort}:{page_number}'
+    cached = page_cache.get(key)
+    if cached is None:
+        problems_qs = Problem.objects.filter(is_quarantined=False, deleted_at__isnull=True)
+        if difficulty_filter:
+            problems_qs = problems_qs.filter(difficulty__iexact=difficulty_filter)
+        if category_filter:
+            problems_qs = problems_qs.filter(category__iexact=category_filter)
+        ordering = CATALOG_SORTS.get(sort, ('id',))
+        problems_qs = problems_qs.order_by(*ordering).only(*CATALOG_FIELDS)  # Also keeps the cached pages small
+        page = Paginator(problems_qs, CATALOG_PAGE_SIZE).get_page(page_number) # Order after filtering
+        cached = (list(page.object_list), page.number, page.paginator.count)
+        page_cache.set(key, cached, PAGE_DATA_CACHE_TIMEOUT)
+    problems, number, count = cached
+    # The links only need the total, so a range() stands in for the rows here
+    page = Paginator(range(count), CATALOG_PAGE_SIZE).page(number)
+    page.object_list = problems
+    return catalog_version, page
+
+
 # --- MODIFIED: Added Category Filtering ---
+@conditional_page('catalog', 'catalog_stats')
 def problems_view(request):
-    problems_qs = Problem.objects.all()
-    
     # --- Get all categories for filter bar ---
     all_categories = Problem.CATEGORY_CHOICES
     
     # Filter by difficulty
     difficulty_filter = request.GET.get('difficulty', None)
     valid_difficulties = ['easy', 'medium', 'hard']
-    if difficulty_filter and difficulty_filter.lower() in valid_difficulties:
-        problems_qs = problems_qs.filter(difficulty__iexact=difficulty_filter)
+    if not (difficulty_filter and difficulty_filter.lower() in valid_difficulties):
+        difficulty_filter = None
 
     # --- NEW: Filter by category ---
     category_filter = request.GET.get('category', None)
     valid_categories = [c[0] for c in all_categories]
-    if category_filter and category_filter.lower() in valid_categories:
-        problems_qs = problems_qs.filter(category__iexact=category_filter)
-        
-    problems = problems_qs.order_by('id') # Order after filtering
+    if not (category_filter and category_filter.lower() in valid_categories):
+        category_filter = None
+
+    sort = request.GET.get('sort')
+    if sort not in CATALOG_SORTS:
+        sort = None
 
-    # Get solved problem IDs for the current user
-    solved_ids = []
+    try:
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page_number = 1
+    catalog_version, page = catalog_problems(difficulty_filter, category_filter, page_number, sort)
+    problems = page.object_list
+
+    # Get solved problem IDs for the current user. This is the only per-user
+    # part of the page; the cards themselves are cached template fragments.
+    solved_ids = set()
     if request.user.is_authenticated:
-        solved_ids = list(request.user.solved_problems.filter(
-            # Only consider problems in the current filtered list for solved status
-            id__in=[p.id for p in problems] 
+        solved_ids = set(request.user.solved_problems.filter(
+            id__in=[problem.id for problem in problems]
         ).values_list('id', flat=True))
 
     return render(request, 'app/problems.html', {
         'problems': problems,
-        'solved_ids': solved_ids,
+        'page_obj': page,
+        'cards': [(problem, problem.id in solved_ids) for problem in problems],
+        'catalog_version': catalog_version,
         'current_difficulty': difficulty_filter,
         'all_categories': all_categories,         # <-- Pass categories
         'current_category': category_filter,      # <-- Pass current category
+        'current_sort': sort,
+        'max_batch': grading.MAX_BATCH,
     })
 
 
 @require_http_methods(["POST"])
 @login_required # Require login to check answers on the main page
+@rate_limit('check_answer')
 def check_answer(request):
     """AJAX endpoint to check if submitted answer is correct"""
     # (Rest of the check_answer function remains the same as previous version)
@@ -493,26 +688,12 @@ def check_answer(request):
         if not problem_id or not user_answer:
             return JsonResponse({'error': 'Missing data'}, status=400)
 
-        problem = Problem.objects.get(id=problem_id)
+        problem = Problem.objects.get(id=problem_id, deleted_at__isnull=True)
 
         # --- FIX: Safe Answer Checking ---
-        try:
-            # Attempt to convert both to integers for comparison
-            correct_answer = int(problem.answer)
-            user_answer_value = int(user_answer)
-            is_correct = (user_answer_value == correct_answer)
-        except ValueError:
-             # If conversion fails, try floats
-             try:
-                correct_answer = float(problem.answer)
-                user_answer_value = float(user_answer)
-                is_correct = (user_answer_value == correct_answer)
-             except ValueError:
-                # Fallback to string comparison (handles fractions like '2/3')
-                correct_answer_str = str(problem.answer).strip()
-                is_correct = (user_answer == correct_answer_str)
-                correct_answer = correct_answer_str # Ensure correct_answer sent back matches comparison type
-            
+        # Exact comparison, so '1.5', '3/2' and '6/4' are all right for '3/2'
+        is_correct, correct_answer = expressions.check_answer(user_answer, problem.answer)
+
         # Save submission if user is authenticated (already checked by decorator)
         Submission.objects.create(
             user=request.user,
@@ -522,24 +703,15 @@ def check_answer(request):
         )
 
         # Add user to solved_by list if correct and not already there
-        if is_correct and request.user not in problem.solved_by.all():
+        if is_correct and not problem.solved_by.filter(pk=request.user.pk).exists():
             problem.solved_by.add(request.user)
             
-            # --- NEW: Award Points Based on Difficulty ---
-            points_to_add = 0
-            # Use lower() for case-insensitive comparison
-            if problem.difficulty.lower() == 'easy':
-                points_to_add = 5
-            elif problem.difficulty.lower() == 'medium':
-                points_to_add = 10
-            elif problem.difficulty.lower() == 'hard':
-                points_to_add = 20
-            
+            # --- NEW: Award Points Based on Difficulty (or calibration, see grading.py) ---
+            points_to_add = grading.points_for(problem)
             if points_to_add > 0:
                 try:
                     profile, created = UserProfile.objects.get_or_create(user=request.user) # Use get_or_create
-                    profile.points += points_to_add
-                    profile.save()
+                    profile.add_points(points_to_add)
                 except Exception as e: # Catch potential errors during profile update
                     print(f"Error updating profile points for {request.user.username}: {e}")
                     # Decide if you want to inform the user or just log
@@ -559,6 +731,32 @@ def check_answer(request):
         traceback.print_exc() 
         return JsonResponse({'error': 'An unexpected error occurred. Please try again.'}, status=500)
 
+
+@require_http_methods(["POST"])
+@login_required
+def check_answer_batch(request):
+    """
+    Grade up to grading.MAX_BATCH answers at once:
+    {"answers": [{"problem_id": 12, "answer": "42"}, ...]} ->
+    {"results": [one check_answer-style result per answer, same order], "points_awarded": N}
+    """
+    try:
+        answers = json.loads(request.body).get('answers')
+    except (ValueError, AttributeError):
+        answers = None
+    if not isinstance(answers, list) or not answers:
+        return JsonResponse({'error': 'Missing data'}, status=400)
+    if len(answers) > grading.MAX_BATCH:
+        return JsonResponse({'error': f'At most {grading.MAX_BATCH} answers at once'}, status=400)
+
+    # Same buckets as check_answer, one token per answer, so batching doesn't lift the limit
+    limited = limit_exceeded(request, 'check_answer', count=len(answers))
+    if limited:
+        return limited
+
+    results, points = grading.grade_batch(request.user, [grading.parse_item(item) for item in answers])
+    return JsonResponse({'results': results, 'points_awarded': points})
+
 # --- NEW: Practice View using Generator ---
 @login_required # Or remove if you want anonymous users to practice
 def practice_view(request):
@@ -566,7 +764,8 @@ def practice_view(request):
     Displays dynamically generated problems for practice.
     Does not save submissions or award points.
     """
-    difficulty = request.GET.get('difficulty', 'easy') # Default to easy
+    # Default to the user's own level (see adaptive.py)
+    difficulty = request.GET.get('difficulty') or adaptive.difficulty_for(request.user, 'arithmetic')
     valid_difficulties = ['easy', 'medium', 'hard']
     if difficulty.lower() not in valid_difficulties:
         difficulty = 'easy' # Fallback to easy if invalid difficulty provided
@@ -600,15 +799,29 @@ def speed_run_view(request):
     }
     return render(request, 'app/speed_run.html', context)
 
+@login_required
+def speed_run_race_view(request):
+    """
+    Multiplayer Speed Run. The race itself runs over a WebSocket
+    (consumers.RaceConsumer); ?room=<code> pre-fills the room to join.
+    """
+    context = {
+        'room': request.GET.get('room', '')[:32],
+        'difficulties': races.DIFFICULTIES,
+        'race_seconds': races.RACE_SECONDS,
+    }
+    return render(request, 'app/speed_run_race.html', context)
+
 @login_required
 @require_http_methods(["GET"])
 def get_generated_problem_api(request):
     """
-    API endpoint to fetch a single, dynamically generated 'easy' problem.
+    API endpoint to fetch a single, dynamically generated problem at the user's level.
     """
     try:
-        # We use 'easy' for speed run mode
-        problem_data = problem_generator.generate_arithmetic_problem('easy')
+        problem_data = problem_generator.generate_arithmetic_problem(
+            adaptive.difficulty_for(request.user, 'arithmetic')
+        )
         return JsonResponse(problem_data)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -647,8 +860,9 @@ def save_speed_run_view(request):
 @user_passes_test(is_admin)
 def admin_problem_list(request):
     """Lists all problems for admin management."""
-    problems = Problem.objects.order_by('-created_at')
-    context = {'problems': problems}
+    problems = Problem.objects.filter(deleted_at__isnull=True).order_by('-created_at').only(*ADMIN_PROBLEM_FIELDS)
+    page = Paginator(problems, ADMIN_PAGE_SIZE).get_page(request.GET.get('page'))
+    context = {'problems': page, 'page_obj': page}
     return render(request, 'app/admin_problem_list.html', context)
 
 @login_required
@@ -696,12 +910,133 @@ def admin_problem_delete(request, problem_id):
     problem = get_object_or_404(Problem, id=problem_id)
     try:
         problem_question = problem.question # Get question before deleting
-        problem.delete()
+        deletions.request_problem_deletion(problem, requested_by=request.user)  # Hidden now, removed in the background
         messages.success(request, f'Problem "{problem_question}" deleted successfully!')
     except Exception as e:
         messages.error(request, f'Error deleting problem: {e}')
     return redirect('admin_problem_list')
 
+
+@login_required
+@user_passes_test(is_admin)
+def export_data(request):
+    """
+    Streams a dataset as a file download, e.g.
+    /dashboard/export/?dataset=submissions&format=csv&date_from=2025-01-01&category=fractions&users=ana,ion
+    """
+    dataset = request.GET.get('dataset', 'submissions')
+    fmt = request.GET.get('format', 'csv')
+    users = [name.strip() for name in request.GET.get('users', '').split(',') if name.strip()]
+    try:
+        content = exports.stream_export(
+            dataset, fmt,
+            date_from=exports.parse_day(request.GET.get('date_from')),
+            date_to=exports.parse_day(request.GET.get('date_to')),
+            category=request.GET.get('category') or None,
+            users=users,
+        )
+    except exports.ExportError as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain')
+
+    if isinstance(request, ASGIRequest):
+        content = exports.stream_async(content)  # See exports.py: ASGI buffers sync generators
+    response = StreamingHttpResponse(content, content_type=exports.FORMATS[fmt][0])
+    response['Content-Disposition'] = f'attachment; filename="{exports.export_filename(dataset, fmt)}"'
+    return response
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_jobs(request):
+    """Background job queue: counts, upcoming periodic runs and the latest jobs (?status= to filter)."""
+    status = request.GET.get('status', '')
+    recent = Job.objects.all()
+    if status:
+        recent = recent.filter(status=status)
+    counts = dict(Job.objects.order_by().values_list('status').annotate(total=Count('id')))
+    context = {
+        'counts': [(value, label, counts.get(value, 0)) for value, label in Job.STATUS_CHOICES],
+        'status': status,
+        'periodic': Job.objects.filter(status__in=['queued', 'running']).exclude(periodic='').order_by('run_at'),
+        'jobs': recent.defer('output')[:100],
+    }
+    return render(request, 'app/admin_jobs.html', context)
+
+
+@login_required
+@user_passes_test(is_admin)
+@require_http_methods(["POST"])
+def admin_job_retry(request, job_id):
+    job = get_object_or_404(Job, id=job_id)
+    jobs.retry(job)
+    messages.success(request, f'Job #{job.id} ({job.command}) queued again.')
+    return redirect('admin_jobs')
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_profiles(request):
+    """Saved request profiles: per-view timings, and the top functions of one view (?view=)."""
+    view = request.GET.get('view', '')
+    project_only = request.GET.get('project') == '1'
+    context = {
+        'views': profiling.summary(),
+        'view': view,
+        'project_only': project_only,
+        'functions': profiling.top_functions(view, project_only=project_only) if view else [],
+        'sample_rate': settings.PROFILE_SAMPLE_RATE,
+    }
+    return render(request, 'app/admin_profiles.html', context)
+
+
+ANALYTICS_RANGES = [7, 30, 90, 365]  # Days the analytics page can show
+
+
+def _bars(points):
+    """Adds bar/correct-share heights in percent to rollup series points."""
+    tallest = max((point['submissions'] for point in points), default=0) or 1
+    for point in points:
+        point['height'] = point['submissions'] * 100 / tallest
+        point['correct_height'] = point['correct'] * 100 / point['submissions'] if point['submissions'] else 0
+    return points
+
+
+@login_required
+@user_passes_test(is_admin)
+def admin_analytics(request):
+    """Submission charts from the hourly/daily rollups (app/rollups.py), ?days= for the range."""
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in ANALYTICS_RANGES:
+        days = 30
+    now = timezone.now()
+    since = rollups.day_start(now) - timedelta(days=days - 1)
+    daily = _bars(rollups.series('day', since, now))
+    hourly = _bars(rollups.series('hour', rollups.hour_start(now) - timedelta(hours=47), now))
+
+    breakdowns = {}
+    for field in ('category', 'difficulty'):
+        breakdowns[field] = rollups.breakdown(field, since)
+        for row in breakdowns[field]:
+            row['accuracy'] = row['correct'] * 100 / row['submissions'] if row['submissions'] else 0
+
+    submissions = sum(point['submissions'] for point in daily)
+    context = {
+        'days': days,
+        'ranges': ANALYTICS_RANGES,
+        'daily': daily,
+        'hourly': hourly,
+        'categories': breakdowns['category'],
+        'difficulties': breakdowns['difficulty'],
+        'total_submissions': submissions,
+        'total_correct': sum(point['correct'] for point in daily),
+        'accuracy': sum(point['correct'] for point in daily) * 100 / submissions if submissions else 0,
+        'busiest_day': max(daily, key=lambda point: point['unique_users'], default=None),
+    }
+    return render(request, 'app/admin_analytics.html', context)
+
 # ========================================
 # PIRATE MAP JOURNEY FEATURE
 # ========================================
@@ -714,7 +1049,7 @@ def pirate_map_view(request):
     # Get or create user progress
     user_progress, created = UserProgress.objects.get_or_create(
         user=request.user,
-        defaults={'current_checkpoint': MapCheckpoint.objects.filter(checkpoint_number=1).first()}
+        defaults={'current_checkpoint_id': MapCheckpoint.first_id},  # Only looked up when creating
     )
     
     # Get all checkpoints
@@ -736,19 +1071,10 @@ def pirate_map_view(request):
             'is_completed': is_completed,
         })
     
-    # Get available problems for current checkpoint (filter by difficulty)
+    # Get available problems for current checkpoint, rated near the user's level
     current_problems = []
     if user_progress.current_checkpoint:
-        # Map difficulty level to problem difficulty
-        difficulty_map = {
-            1: 'easy',
-            2: 'easy',
-            3: 'medium',
-            4: 'medium',
-            5: 'hard',
-        }
-        target_difficulty = difficulty_map.get(user_progress.current_checkpoint.difficulty_level, 'easy')
-        current_problems = Problem.objects.filter(difficulty=target_difficulty).order_by('?')[:10]
+        current_problems = adaptive.pick_problems(request.user, count=10)
     
     context = {
         'user_progress': user_progress,
@@ -766,6 +1092,7 @@ def pirate_map_view(request):
 
 @login_required
 @require_http_methods(["POST"])
+@rate_limit('solve_map_problem')
 def solve_map_problem(request):
     """
     AJAX endpoint to check answer for a problem in the pirate map journey.
@@ -779,26 +1106,11 @@ def solve_map_problem(request):
         if not problem_id or not user_answer:
             return JsonResponse({'error': 'Missing data'}, status=400)
         
-        problem = Problem.objects.get(id=problem_id)
+        problem = Problem.objects.get(id=problem_id, deleted_at__isnull=True)
         user_progress = UserProgress.objects.get(user=request.user)
         
-        # Evaluate the correct answer
-        try:
-            correct_answer = eval(problem.answer, {"__builtins__": None}, {})
-        except:
-            correct_answer = int(problem.answer)
-        
-        # Evaluate user answer
-        try:
-            user_answer_value = int(user_answer)
-        except ValueError:
-            return JsonResponse({
-                'correct': False,
-                'message': 'Please enter a valid number',
-                'correct_answer': correct_answer
-            })
-        
-        is_correct = (user_answer_value == correct_answer)
+        # Grade exactly (fractions, ×/÷...) without eval - see expressions.py
+        is_correct, correct_answer = expressions.check_answer(user_answer, problem.answer)
         
         # Save submission
         Submission.objects.create(
@@ -817,7 +1129,7 @@ def solve_map_problem(request):
         
         if is_correct:
             # Add to solved problems if not already there
-            if request.user not in problem.solved_by.all():
+            if not problem.solved_by.filter(pk=request.user.pk).exists():
                 problem.solved_by.add(request.user)
             
             # Record progress
@@ -891,3 +1203,19 @@ def advance_checkpoint(request):
         return JsonResponse({'error': 'User progress not found'}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+
+# ========================================
+# STATIC BUNDLES (built by manage.py build_bundles)
+# ========================================
+
+@cache_control(public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+def static_bundle(request, filename):
+    """
+    Serves a content-hashed CSS/JS bundle. The hash changes with the content,
+    so browsers may keep the file for a year without revalidating.
+    """
+    if filename not in {entry['file'] for entry in bundles.load_manifest().values()}:
+        raise Http404('Unknown bundle')
+    content_type = 'text/css' if filename.endswith('.css') else 'text/javascript'
+    return FileResponse(open(bundles.BUNDLE_DIR / filename, 'rb'), content_type=content_type)